@@ -1,70 +1,234 @@
-import sqlite3
-from app.habit import Habit
+from datetime import date
+from app.bitmaps import read_bitmap
+from app.habit import HabitCollection
+from app.cache import get_habit_cache
+from app.database import get_database
+from app.habit_manager import HabitManager, ITER_BATCH_SIZE
+from app.dates import day_to_week, to_day
+from app.streaks import current_streaks
+from app.tenants import get_shard_map
 
-# Calculates the longest streak for both daily and weekly habits from the database.
-# Returns the longest streaks with their habit names.
-def longest_streak():
-    with sqlite3.connect('habits.db') as conn:
-        cursor = conn.cursor()
+# Calculates the longest streak of every habit in a single scan of the completion table.
+# Daily habits count consecutive days, weekly habits consecutive weeks starting on Monday (ISO weeks).
+# The current streaks are added by current_streaks, which only reads the latest run of every habit.
+# Returns the habits keyed by periodicity, ordered by longest streak.
+def streak_leaderboard(database=None, today=None):
+    today = today or date.today()
 
-        # Query for the longest daily streak
+    with (database or get_database()).connection() as conn:
+        cursor = conn.cursor()
         cursor.execute('''
-            SELECT h.name, MAX(streak) AS longest_streak
-            FROM (
-                SELECT habit_id, COUNT(*) AS streak
+            WITH periods AS (
+                SELECT DISTINCT c.habit_id,
+                       CASE h.periodicity
+                           WHEN 'weekly' THEN (c.completion_day - 1) / 7
+                           ELSE c.completion_day
+                       END AS period
+                FROM completion c
+                JOIN habits h ON h.id = c.habit_id
+            ),
+            runs AS (
+                SELECT habit_id, COUNT(*) AS length
                 FROM (
-                    SELECT habit_id, completion_date,
-                           ROW_NUMBER() OVER (PARTITION BY habit_id ORDER BY completion_date) -
-                           CAST(strftime('%s', completion_date) / 86400 AS INTEGER) AS group_id
-                    FROM completion
-                    JOIN habits h ON completion.habit_id = h.id
-                    WHERE h.periodicity = 'daily'
+                    SELECT habit_id, period,
+                           period - ROW_NUMBER() OVER (PARTITION BY habit_id ORDER BY period) AS run_id
+                    FROM periods
                 )
-                GROUP BY habit_id, group_id
-            ) streaks
-            JOIN habits h ON streaks.habit_id = h.id
+                GROUP BY habit_id, run_id
+            )
+            SELECT h.id, h.name, h.periodicity, COALESCE(MAX(r.length), 0) AS longest_streak
+            FROM habits h
+            LEFT JOIN runs r ON r.habit_id = h.id
+            GROUP BY h.id, h.name, h.periodicity
+            ORDER BY longest_streak DESC, h.name ASC
         ''')
-        daily_result = cursor.fetchone()
+        rows = cursor.fetchall()
+        current = current_streaks(conn, today)
+
+    leaderboard = {"daily": [], "weekly": []}
+    for habit_id, name, periodicity, longest in rows:
+        leaderboard[periodicity].append({"id": habit_id, "name": name, "longest": longest,
+                                         "current": current.get(habit_id, 0)})
+    return leaderboard
+
+# Calculates the longest streak for both daily and weekly habits from the database.
+# Returns the longest streaks with their habit names.
+def longest_streak(database=None):
+    leaderboard = streak_leaderboard(database)
+
+    result = {}
+    for periodicity, habits in leaderboard.items():
+        if habits and habits[0]["longest"] > 0:
+            result[periodicity] = {"name": habits[0]["name"], "streak": habits[0]["longest"]}
+        else:
+            result[periodicity] = {"name": "None", "streak": 0}
+    return result
 
-        # Query for the longest weekly streak
+# Calculates the longest daily and weekly streak over all tenants, scanning the shards in parallel.
+# Returns the longest streaks with their habit names and tenant ids.
+def global_longest_streak(shard_map=None, max_workers=None):
+    results = (shard_map or get_shard_map()).map(longest_streak, max_workers=max_workers)
+
+    best = {periodicity: {"tenant": None, "name": "None", "streak": 0} for periodicity in ("daily", "weekly")}
+    for tenant_id, streaks in sorted(results.items()):
+        for periodicity, streak in streaks.items():
+            if streak["streak"] > best[periodicity]["streak"]:
+                best[periodicity] = {"tenant": tenant_id, **streak}
+    return best
+
+# The following analytics read the rollup tables completion_weekly and completion_monthly instead of the
+# completion table. Windows are given as ISO dates or date objects, the end date is included.
+
+# Returns the bit mask of the weekdays from first_weekday to last_weekday (0 = Monday).
+def _weekday_mask(first_weekday, last_weekday):
+    return (1 << (last_weekday + 1)) - (1 << first_weekday)
+
+# Returns the SQL parameters of a window: its first and last week and the masks of the weekdays
+# of these weeks that lie inside the window.
+def _window(start, end):
+    start_day, end_day = to_day(start), to_day(end)
+    if start_day > end_day:
+        raise ValueError("The start of the window must not be after its end.")
+    first_week, last_week = day_to_week(start_day), day_to_week(end_day)
+    first_mask = _weekday_mask((start_day - 1) % 7, 6)
+    last_mask = _weekday_mask(0, (end_day - 1) % 7)
+    if first_week == last_week:
+        first_mask = last_mask = first_mask & last_mask
+    return {"first_week": first_week, "last_week": last_week, "first_mask": first_mask, "last_mask": last_mask,
+            "days": end_day - start_day + 1, "weeks": last_week - first_week + 1}
+
+# Calculates the completion rate of every habit in a window: the share of days (daily habits) or
+# weeks (weekly habits) with a completion. Returns dicts ordered by habit name.
+# The rollup rows of all weeks touched by the window are summed up in SQL, the completions on
+# days of the first and last week outside the window are then subtracted using the weekday masks.
+def completion_rates(start, end=None, database=None):
+    window = _window(start, end or date.today())
+
+    with (database or get_database()).connection() as conn:
+        cursor = conn.cursor()
         cursor.execute('''
-            SELECT h.name, MAX(streak) AS longest_streak
-            FROM (
-                SELECT habit_id, COUNT(*) AS streak
-                FROM (
-                    SELECT habit_id, completion_date,
-                           ROW_NUMBER() OVER (PARTITION BY habit_id ORDER BY completion_date) -
-                           CAST(strftime('%s', completion_date) / 604800 AS INTEGER) AS group_id
-                    FROM completion
-                    JOIN habits h ON completion.habit_id = h.id
-                    WHERE h.periodicity = 'weekly'
-                )
-                GROUP BY habit_id, group_id
-            ) streaks
-            JOIN habits h ON streaks.habit_id = h.id
-        ''')
-        weekly_result = cursor.fetchone()
+            SELECT h.id, h.name, h.periodicity, COALESCE(SUM(r.completions), 0), COUNT(r.week)
+            FROM habits h
+            LEFT JOIN completion_weekly r ON r.habit_id = h.id AND r.week BETWEEN :first_week AND :last_week
+            GROUP BY h.id, h.name, h.periodicity
+            ORDER BY h.name
+        ''', window)
+        rows = cursor.fetchall()
+        cursor.execute('''
+            SELECT r.habit_id, r.week, r.weekday_mask
+            FROM habits h
+            JOIN completion_weekly r ON r.habit_id = h.id AND r.week IN (:first_week, :last_week)
+        ''', window)
+        edge_weeks = cursor.fetchall()
 
-    # Extract results
-    daily_name, daily_streak = daily_result if daily_result and daily_result[0] else ("None", 0)
-    weekly_name, weekly_streak = weekly_result if weekly_result and weekly_result[0] else ("None", 0)
+    # Days and weeks to subtract per habit because they lie outside the window.
+    outside = {}
+    for habit_id, week, weekday_mask in edge_weeks:
+        inside_mask = weekday_mask & (window["first_mask"] if week == window["first_week"] else window["last_mask"])
+        days, weeks = outside.get(habit_id, (0, 0))
+        outside[habit_id] = (days + bin(weekday_mask & ~inside_mask).count("1"), weeks + (inside_mask == 0))
 
-    return {
-        "daily": {"name": daily_name, "streak": daily_streak},
-        "weekly": {"name": weekly_name, "streak": weekly_streak},
-    }
+    rates = []
+    for habit_id, name, periodicity, completed_days, completed_weeks in rows:
+        outside_days, outside_weeks = outside.get(habit_id, (0, 0))
+        if periodicity == "weekly":
+            completed, periods = completed_weeks - outside_weeks, window["weeks"]
+        else:
+            completed, periods = completed_days - outside_days, window["days"]
+        rates.append({"id": habit_id, "name": name, "periodicity": periodicity, "completed": completed,
+                      "periods": periods, "rate": completed / periods})
+    return rates
 
-# Filters habits based on their periodicity (daily or weekly) from the database.
-# Returns a list of Habit objects matching the periodicity.
-def filter_by_periodicity(periodicity):
-    with sqlite3.connect('habits.db') as conn:
+# Returns the habit with the lowest completion rate in a window or None if there are no habits.
+def most_struggled_habit(start, end=None, database=None):
+    rates = completion_rates(start, end, database)
+    return min(rates, key=lambda habit: habit["rate"]) if rates else None
+
+# Calculates the completion rate of one habit in a window like completion_rates, counting the completed
+# days or weeks with one popcount over its completion bitmap. Raises a ValueError for unknown habits.
+def habit_completion_rate(habit_id, start, end=None, database=None):
+    window = _window(start, end or date.today())
+    start_day, end_day = to_day(start), to_day(end or date.today())
+
+    conn = (database or get_database()).connection()
+    habit = conn.execute("SELECT name, periodicity FROM habits WHERE id = ?", (habit_id,)).fetchone()
+    if habit is None:
+        raise ValueError(f"No habit found with ID {habit_id}.")
+    bitmap = read_bitmap(conn, habit_id)
+
+    name, periodicity = habit
+    completed = bitmap.count(start_day, end_day, periodicity)
+    periods = window["weeks"] if periodicity == "weekly" else window["days"]
+    return {"id": habit_id, "name": name, "periodicity": periodicity, "completed": completed,
+            "periods": periods, "rate": completed / periods}
+
+# Counts the completions per weekday (Monday first) in a window, of one habit or of all habits.
+def weekday_heatmap(start, end=None, habit_id=None, database=None):
+    window = _window(start, end or date.today())
+    window["habit_id"] = habit_id
+    habit_condition = "AND habit_id = :habit_id" if habit_id is not None else ""
+
+    with (database or get_database()).connection() as conn:
         cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT weekday_mask & CASE week WHEN :first_week THEN :first_mask WHEN :last_week THEN :last_mask ELSE 127 END,
+                   COUNT(*)
+            FROM completion_weekly
+            WHERE week BETWEEN :first_week AND :last_week {habit_condition}
+            GROUP BY 1
+        ''', window)
+        masks = cursor.fetchall()
 
-        cursor.execute('''
-            SELECT id, name, description, periodicity, creation_date
-            FROM habits
-            WHERE periodicity = ?
-        ''', (periodicity,))
-        habits = cursor.fetchall()
+    heatmap = [0] * 7
+    for weekday_mask, weeks in masks:
+        for weekday in range(7):
+            if weekday_mask >> weekday & 1:
+                heatmap[weekday] += weeks
+    return heatmap
+
+# Returns the number of completions per month for the last months up to today, oldest month first,
+# of one habit or of all habits. Months without completions are included with 0.
+def monthly_trend(months=12, habit_id=None, today=None, database=None):
+    today = today or date.today()
+    last_month = today.year * 12 + today.month - 1
+    first_month = last_month - months + 1
+    habit_condition = "AND habit_id = ?" if habit_id is not None else ""
+
+    with (database or get_database()).connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT month, SUM(completions)
+            FROM completion_monthly
+            WHERE month BETWEEN ? AND ? {habit_condition}
+            GROUP BY month
+        ''', (first_month, last_month) + ((habit_id,) if habit_id is not None else ()))
+        counts = dict(cursor.fetchall())
+
+    return [{"month": f"{month // 12:04d}-{month % 12 + 1:02d}", "completions": counts.get(month, 0)}
+            for month in range(first_month, last_month + 1)]
+
+# Filters habits based on their periodicity (daily or weekly) from the database.
+# Returns a HabitCollection of the habits matching the periodicity.
+def filter_by_periodicity(periodicity, database=None):
+    database = database or get_database()
+    conn = database.connection()
+    cache = get_habit_cache(database)
+    cache.validate(conn)
+    habits = cache.get_list(periodicity)
+    if habits is not None:
+        return habits
+
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT id, name, description, periodicity, creation_date
+        FROM habits
+        WHERE periodicity = ?
+    ''', (periodicity,))
+    habits = HabitCollection.from_cursor(cursor, database=database)
+    cache.put_list(periodicity, habits)
+    return habits
 
-    return [Habit.from_database(row) for row in habits]
\ No newline at end of file
+# Streams the habits of a periodicity in batches without loading them all, see HabitManager.iter_habits.
+def iter_by_periodicity(periodicity, order_by="id", limit=None, after=None, batch_size=ITER_BATCH_SIZE, database=None):
+    return HabitManager(database).iter_habits(periodicity, order_by=order_by, limit=limit, after=after,
+                                              batch_size=batch_size)
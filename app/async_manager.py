@@ -0,0 +1,205 @@
+import asyncio
+import queue
+import sqlite3
+import threading
+from app import analytics
+from app.database import is_locked_error, retry_on_locked, INSERT_COMPLETION_SQL
+from app.dates import completion_values
+from app.habit_manager import HabitManager
+from app.bitmaps import load_bitmap, store_bitmap
+from app.streaks import record_completion
+
+# Maximum number of queued completions written in one shared transaction.
+MAX_BATCH_SIZE = 500
+
+# Kinds of queued requests: completions are coalesced into shared transactions, calls run one by one.
+_COMPLETION = "completion"
+_CALL = "call"
+
+# Queued to stop the database thread.
+_STOP = object()
+
+# Sets the result or the error of a future unless its coroutine was cancelled in the meantime.
+def _set_future(future, result, error):
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+# Hands the outcome of a request from the database thread back to the event loop of its coroutine.
+def _resolve(loop, future, result=None, error=None):
+    try:
+        loop.call_soon_threadsafe(_set_future, future, result, error)
+    except RuntimeError:
+        # The event loop was closed before the request finished.
+        pass
+
+# Asyncio interface of HabitManager and the analytics functions.
+# All database work runs on one dedicated thread, so coroutines never block the event loop.
+# Requests are processed in the order they were made; completions that are queued at the same time
+# are written in one shared transaction, with a savepoint per completion so a failing one does not
+# affect the others.
+class AsyncHabitManager:
+    def __init__(self, database=None):
+        self._manager = HabitManager(database)
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+        # Number of transactions written for coalesced completions.
+        self.batches = 0
+
+    # Returns the database pool used by this manager.
+    @property
+    def database(self):
+        return self._manager.database
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    # Starts the database thread on first use.
+    def _start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="habit-db", daemon=True)
+                self._thread.start()
+
+    # Queues a request for the database thread and returns a future for its result.
+    def _submit(self, kind, payload):
+        self._start()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.put((kind, payload, loop, future))
+        return future
+
+    # Runs a blocking function on the database thread.
+    async def _call(self, func, *args, **kwargs):
+        return await self._submit(_CALL, (func, args, kwargs))
+
+    # Stops the database thread after all queued requests are processed.
+    async def close(self):
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            await asyncio.to_thread(thread.join)
+
+    # Main loop of the database thread.
+    def _run(self):
+        pending = None
+        while True:
+            request = pending or self._queue.get()
+            pending = None
+            if request is _STOP:
+                break
+
+            kind, payload, loop, future = request
+            if kind == _CALL:
+                func, args, kwargs = payload
+                try:
+                    _resolve(loop, future, result=func(*args, **kwargs))
+                except Exception as e:
+                    _resolve(loop, future, error=e)
+                continue
+
+            # Collect the completions that are already waiting, a call or the stop request ends the batch.
+            batch = [request]
+            while len(batch) < MAX_BATCH_SIZE:
+                try:
+                    request = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if request is _STOP or request[0] != _COMPLETION:
+                    pending = request
+                    break
+                batch.append(request)
+            self._write_completions(batch)
+
+    # Writes a batch of completions and resolves their futures.
+    def _write_completions(self, batch):
+        conn = self.database.connection()
+        try:
+            results = self._insert_completions(conn, [request[1] for request in batch])
+        except Exception as e:
+            for _, _, loop, future in batch:
+                _resolve(loop, future, error=e)
+            return
+        self.batches += 1
+        self._manager._after_write(conn)
+
+        for (_, _, loop, future), (inserted, error) in zip(batch, results):
+            _resolve(loop, future, result=inserted, error=error)
+
+    # Inserts (habit_id, completion_date, completion_day) rows in one transaction and returns
+    # (inserted, error) for every row. Like HabitManager.mark_habit_completed it updates the streak summaries
+    # and the bitmaps; the bitmap of every habit is read once before the inserts and written once after them.
+    @retry_on_locked
+    def _insert_completions(self, conn, completions):
+        results = []
+        added_days = {}
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            bitmaps = {habit_id: load_bitmap(conn, habit_id) for habit_id in {row[0] for row in completions}}
+            for habit_id, completion_date, completion_day in completions:
+                conn.execute("SAVEPOINT completion")
+                try:
+                    cursor = conn.execute(INSERT_COMPLETION_SQL, (habit_id, completion_date, completion_day))
+                    inserted = cursor.rowcount > 0
+                    if inserted:
+                        record_completion(conn, habit_id, completion_date)
+                    conn.execute("RELEASE completion")
+                    if inserted:
+                        added_days.setdefault(habit_id, []).append(completion_day)
+                    results.append((inserted, None))
+                except sqlite3.Error as e:
+                    # A locked database fails the whole transaction, which is then retried.
+                    if is_locked_error(e):
+                        raise
+                    conn.execute("ROLLBACK TO completion")
+                    conn.execute("RELEASE completion")
+                    results.append((False, e))
+            # The inserts dropped the stored bitmaps (triggers of migration 5), so they are written back.
+            for habit_id, days in added_days.items():
+                if bitmaps[habit_id] is not None:
+                    store_bitmap(conn, habit_id, bitmaps[habit_id].with_days(days))
+        return results
+
+    # Creates a new habit and saves it to the database.
+    async def create_habit(self, name, description, periodicity):
+        return await self._call(self._manager.create_habit, name, description, periodicity)
+
+    # Marks a habit as completed on a given date in the database.
+    # Returns False if the habit was already marked as completed on that date, like HabitManager.mark_habit_completed.
+    async def mark_habit_completed(self, habit_id, completion_date):
+        # Raises a ValueError for dates that are not in YYYY-MM-DD format.
+        completion_date, completion_day = completion_values(completion_date)
+
+        inserted = await self._submit(_COMPLETION, (habit_id, completion_date, completion_day))
+        if not inserted:
+            print(f"Habit with ID {habit_id} is already marked as completed on {completion_date}.")
+        return inserted
+
+    # Checks the status of all habits for a specific date with details.
+    async def check_habits_status(self, date):
+        return await self._call(self._manager.check_habits_status, date)
+
+    # Fetches all habits that are pending for the specified date, considering their periodicity.
+    async def get_pending_habits(self, date, limit=None, after_name=None):
+        return await self._call(self._manager.get_pending_habits, date, limit=limit, after_name=after_name)
+
+    # Calculates the longest and the current streak of every habit, see analytics.streak_leaderboard.
+    async def streak_leaderboard(self, today=None):
+        return await self._call(analytics.streak_leaderboard, self.database, today)
+
+    # Calculates the longest streak for both daily and weekly habits, see analytics.longest_streak.
+    async def longest_streak(self):
+        return await self._call(analytics.longest_streak, self.database)
+
+    # Filters habits based on their periodicity, see analytics.filter_by_periodicity.
+    async def filter_by_periodicity(self, periodicity):
+        return await self._call(analytics.filter_by_periodicity, periodicity, self.database)
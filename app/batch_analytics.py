@@ -0,0 +1,131 @@
+# Nightly reporting over many habit databases (e.g. the per-tenant shards).
+# Every file is analyzed in a worker process (map) and the per-file results are merged (reduce).
+# Run from the project root: python -m app.batch_analytics shards --workers 8 --json report.json
+import argparse
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from app.analytics import streak_leaderboard
+from app.database import Database, migrate_database
+from app.dates import period_of, to_day
+from app.streaks import PERIOD_SQL
+
+# Number of files handed to a worker process at once.
+BATCH_CHUNK_SIZE = 16
+
+# Returns {habit_id: (completed periods, first completion day)} up to today for all habits of a database.
+def _completed_periods(conn, today):
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        SELECT h.id, COUNT(DISTINCT {PERIOD_SQL.format('h.periodicity')}), MIN(c.completion_day)
+        FROM habits h
+        LEFT JOIN completion c ON c.habit_id = h.id AND c.completion_day <= ?
+        GROUP BY h.id
+    ''', (to_day(today),))
+    return {habit_id: (completed, first_day) for habit_id, completed, first_day in cursor.fetchall()}
+
+# Map step: computes the longest and current streak and the completion rate of every habit in one database file.
+# The completion rate is the share of periods (days or weeks) with a completion since the habit was
+# created or first completed. Files created by older versions of the app are migrated to the current schema first.
+# Errors are reported in the result instead of stopping the whole batch.
+def analyze_file(path, today=None):
+    today = today or date.today()
+    start = time.perf_counter()
+    result = {"path": path, "habits": [], "error": None}
+
+    database = Database(path)
+    try:
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"Database file '{path}' not found.")
+        migrate_database(database)
+        conn = database.connection()
+        creation_dates = dict(conn.execute("SELECT id, creation_date FROM habits").fetchall())
+        completed_periods = _completed_periods(conn, today)
+
+        for periodicity, habits in streak_leaderboard(database, today).items():
+            for habit in habits:
+                completed, first_day = completed_periods[habit["id"]]
+                first_day = min(to_day(creation_dates[habit["id"]][:10]), first_day or float("inf"))
+                elapsed = period_of(today, periodicity) - period_of(date.fromordinal(first_day), periodicity) + 1
+                result["habits"].append({**habit, "periodicity": periodicity, "completed_periods": completed,
+                                         "completion_rate": completed / elapsed if elapsed > 0 else 0.0})
+    except (sqlite3.Error, OSError, ValueError) as e:
+        result["error"] = str(e)
+    finally:
+        database.close()
+
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+# Reduce step: merges the per-file results into one report with the longest streaks over all files,
+# the average completion rate per periodicity and the timing of every file.
+def merge_results(results):
+    report = {
+        "files": len(results),
+        "failed": [],
+        "habits": 0,
+        "longest": {periodicity: {"path": None, "name": "None", "streak": 0} for periodicity in ("daily", "weekly")},
+        "completion_rate": {},
+        "seconds": {},
+    }
+    rates = {"daily": [], "weekly": []}
+
+    for result in results:
+        report["seconds"][result["path"]] = result["seconds"]
+        if result["error"] is not None:
+            report["failed"].append({"path": result["path"], "error": result["error"]})
+            continue
+        report["habits"] += len(result["habits"])
+        for habit in result["habits"]:
+            periodicity = habit["periodicity"]
+            rates[periodicity].append(habit["completion_rate"])
+            if habit["longest"] > report["longest"][periodicity]["streak"]:
+                report["longest"][periodicity] = {"path": result["path"], "name": habit["name"],
+                                                  "streak": habit["longest"]}
+
+    for periodicity, values in rates.items():
+        report["completion_rate"][periodicity] = sum(values) / len(values) if values else 0.0
+    return report
+
+# Analyzes all files in worker processes and returns the merged report and the per-file results.
+def run_batch(paths, max_workers=None, today=None, chunksize=BATCH_CHUNK_SIZE):
+    paths = list(paths)
+    today = today or date.today()
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(analyze_file, paths, [today] * len(paths), chunksize=chunksize))
+    return merge_results(results), results
+
+# Expands the command line arguments: directories stand for all .db files in them.
+def collect_paths(arguments):
+    paths = []
+    for argument in arguments:
+        if os.path.isdir(argument):
+            paths.extend(sorted(os.path.join(argument, name) for name in os.listdir(argument) if name.endswith(".db")))
+        else:
+            paths.append(argument)
+    return paths
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyze many habit databases in parallel.")
+    parser.add_argument("paths", nargs="+", help="database files or directories with database files")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes (default: CPU count)")
+    parser.add_argument("--json", help="write the report and the per-file results as JSON to this file")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    report, results = run_batch(collect_paths(args.paths), max_workers=args.workers)
+    seconds = time.perf_counter() - started
+
+    print(f"Analyzed {report['files']} files with {report['habits']} habits in {seconds:.2f} s.")
+    for periodicity, streak in report["longest"].items():
+        print(f"Longest {periodicity} streak: {streak['streak']} on habit '{streak['name']}' in {streak['path']}.")
+        print(f"Average {periodicity} completion rate: {report['completion_rate'][periodicity]:.1%}.")
+    for failure in report["failed"]:
+        print(f"Failed: {failure['path']}: {failure['error']}")
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump({"report": report, "results": results}, file, indent=2)
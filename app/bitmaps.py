@@ -0,0 +1,255 @@
+from app.dates import day_to_date, day_to_week, to_day, week_bounds
+from app.database import get_database
+
+# Bitmap index of the completions of every habit, stored in the completion_bitmap table.
+# Bit i of days is set if the habit was completed on day base_day + i, bit w of weeks if it was completed
+# in week base_week + w. base_day is the Monday of the week of the creation date (or of the first completion
+# if that is earlier), so every 7 day bits belong to one week bit. Both bitmaps are little-endian BLOBs
+# without trailing zero bytes, so the last completion is found in the last byte.
+# Every change of the completions of a habit deletes its bitmap (triggers of migration 5), HabitManager and
+# AsyncHabitManager write the updated bitmap in the same transaction; bulk writes skip the trigger and add their
+# completions to the stored bitmaps once per chunk (add_to_bitmaps). Missing bitmaps are stored again on the
+# next write of the habit (or by rebuild_bitmaps) and built in memory on reads, so writes outside of
+# HabitManager never leave a stale bitmap behind.
+
+# Returns the Monday of the week of a day ordinal.
+def _monday(day):
+    return week_bounds(day)[0]
+
+# Returns an integer bitset as little-endian bytes without trailing zero bytes.
+def _to_bytes(bits):
+    return bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+
+# Maps the bytes 0 and 1 to the digits "0" and "1".
+_BIT_DIGITS = bytes.maketrans(b"\x00\x01", b"01")
+
+# Returns an integer bitset with the bits at the given indexes set. The indexes are marked in a byte array,
+# which is then parsed as one binary number, so every index costs one item assignment instead of a big
+# integer operation.
+def _bits(indexes):
+    indexes = list(indexes)
+    if not indexes:
+        return 0
+    flags = bytearray(max(indexes) + 1)
+    for index in indexes:
+        flags[index] = 1
+    return int(flags[::-1].translate(_BIT_DIGITS), 2)
+
+# Returns True if bit index is set in a little-endian byte string.
+def _test(data, index):
+    return 0 <= index < len(data) * 8 and (data[index >> 3] >> (index & 7)) & 1 == 1
+
+# Returns the number of set bits from index first to index last (inclusive), indexes below 0 are skipped.
+def _count_range(bits, first, last):
+    first = max(first, 0)
+    if last < first:
+        return 0
+    return (bits >> first & ((1 << (last - first + 1)) - 1)).bit_count()
+
+# Returns the length of the longest run of consecutive set bits in O(log run) big integer operations:
+# runs[k] marks the bits starting a run of at least 2^k bits, the longest run is then assembled from them.
+def longest_run(bits):
+    if not bits:
+        return 0
+    runs = [bits]
+    length = 1
+    while True:
+        longer = runs[-1] & (runs[-1] >> length)
+        if not longer:
+            break
+        runs.append(longer)
+        length *= 2
+
+    starts = runs[-1]
+    for k in range(len(runs) - 2, -1, -1):
+        step = 1 << k
+        extended = starts & (runs[k] >> length)
+        if extended:
+            starts = extended
+            length += step
+    return length
+
+# Returns the first and last bit index of the run ending at the highest set bit.
+def latest_run(bits):
+    last = bits.bit_length() - 1
+    gaps = ~bits & ((1 << last) - 1)
+    return gaps.bit_length(), last
+
+# Completions of one habit as a day and a week bitmap.
+class CompletionBitmap:
+    __slots__ = ("base_day", "days", "weeks")
+
+    def __init__(self, base_day, days=b"", weeks=b""):
+        self.base_day = base_day
+        self.days = days
+        self.weeks = weeks
+
+    # Returns the week number of base_day.
+    @property
+    def base_week(self):
+        return day_to_week(self.base_day)
+
+    # Returns True if the habit was completed on a day ordinal.
+    def has_day(self, day):
+        return _test(self.days, day - self.base_day)
+
+    # Returns True if the habit was completed in a week number.
+    def has_week(self, week):
+        return _test(self.weeks, week - self.base_week)
+
+    # Returns True if the habit was completed in the period (day or week) of a day ordinal.
+    def has_period(self, day, periodicity):
+        return self.has_week(day_to_week(day)) if periodicity == "weekly" else self.has_day(day)
+
+    # Returns the day ordinal of the last completion or None.
+    def last_day(self):
+        if not self.days:
+            return None
+        return self.base_day + (len(self.days) - 1) * 8 + self.days[-1].bit_length() - 1
+
+    # Returns the bitmap of the periods (days or weeks) and the period number of its first bit.
+    def periods(self, periodicity):
+        if periodicity == "weekly":
+            return int.from_bytes(self.weeks, "little"), self.base_week
+        return int.from_bytes(self.days, "little"), self.base_day
+
+    # Returns a copy with a completion added on a day ordinal, moving base_day back for earlier days.
+    def with_day(self, day):
+        base_day = min(self.base_day, _monday(day))
+        shift = self.base_day - base_day
+        days = int.from_bytes(self.days, "little") << shift | 1 << (day - base_day)
+        weeks = int.from_bytes(self.weeks, "little") << (shift // 7) | 1 << ((day - base_day) // 7)
+        return CompletionBitmap(base_day, _to_bytes(days), _to_bytes(weeks))
+
+    # Returns a copy with completions added on several day ordinals. The new bits are collected in one bitset
+    # (see _bits), so adding many days costs one pass over the bitmap instead of one per day.
+    def with_days(self, days):
+        days = list(days)
+        if not days:
+            return self
+        base_day = min(self.base_day, _monday(min(days)))
+        shift = self.base_day - base_day
+        day_bits = int.from_bytes(self.days, "little") << shift | _bits(day - base_day for day in days)
+        week_bits = int.from_bytes(self.weeks, "little") << (shift // 7) | _bits({(day - base_day) // 7 for day in days})
+        return CompletionBitmap(base_day, _to_bytes(day_bits), _to_bytes(week_bits))
+
+    # Returns a copy without the completion on a day ordinal. The week bit is cleared with the last day of the week.
+    def without_day(self, day):
+        if not self.has_day(day):
+            return self
+        index = day - self.base_day
+        days = int.from_bytes(self.days, "little") & ~(1 << index)
+        weeks = int.from_bytes(self.weeks, "little")
+        week_index = index // 7
+        if not (days >> (week_index * 7)) & 0x7F:
+            weeks &= ~(1 << week_index)
+        return CompletionBitmap(self.base_day, _to_bytes(days), _to_bytes(weeks))
+
+    # Returns the number of completed periods from first_day to last_day (day ordinals, inclusive) with popcounts.
+    # Like analytics.completion_rates, a week only counts if it has a completion on a day inside the window.
+    def count(self, first_day, last_day, periodicity="daily"):
+        days = int.from_bytes(self.days, "little")
+        if periodicity != "weekly":
+            return _count_range(days, first_day - self.base_day, last_day - self.base_day)
+
+        first_week, last_week = day_to_week(first_day), day_to_week(last_day)
+        if first_week == last_week:
+            return int(_count_range(days, first_day - self.base_day, last_day - self.base_day) > 0)
+        # The first and last week may be cut by the window, so their days are checked; the weeks in between are counted.
+        first_end = week_bounds(first_day)[1]
+        last_start = week_bounds(last_day)[0]
+        return (int(_count_range(days, first_day - self.base_day, first_end - self.base_day) > 0)
+                + _count_range(int.from_bytes(self.weeks, "little"), first_week + 1 - self.base_week,
+                               last_week - 1 - self.base_week)
+                + int(_count_range(days, last_start - self.base_day, last_day - self.base_day) > 0))
+
+    # Returns (longest, current_start, current_end) like streak_engine.summarize_periods:
+    # the longest run of periods and the first and last period of the latest run.
+    def summarize(self, periodicity):
+        bits, base = self.periods(periodicity)
+        if not bits:
+            return 0, None, None
+        first, last = latest_run(bits)
+        return longest_run(bits), base + first, base + last
+
+# Returns the bitmap of a habit built from its completions, or None if the habit does not exist.
+def build_bitmap(conn, habit_id):
+    cursor = conn.cursor()
+    cursor.execute("SELECT creation_date FROM habits WHERE id = ?", (habit_id,))
+    result = cursor.fetchone()
+    if not result:
+        return None
+    cursor.execute("SELECT completion_day FROM completion WHERE habit_id = ? AND completion_day IS NOT NULL",
+                   (habit_id,))
+    completion_days = [row[0] for row in cursor.fetchall()]
+
+    base_day = _monday(min([to_day(result[0][:10]), *completion_days]))
+    return CompletionBitmap(base_day).with_days(completion_days)
+
+# Writes the bitmap of a habit. Runs in the transaction of the caller.
+def store_bitmap(conn, habit_id, bitmap):
+    conn.execute('''
+        INSERT OR REPLACE INTO completion_bitmap (habit_id, base_day, days, weeks)
+        VALUES (?, ?, ?, ?)
+    ''', (habit_id, bitmap.base_day, bitmap.days, bitmap.weeks))
+
+# Returns the bitmap of a habit, building and storing it first if it does not exist yet.
+# Runs in the transaction of the caller; returns None if the habit does not exist.
+def load_bitmap(conn, habit_id):
+    row = conn.execute("SELECT base_day, days, weeks FROM completion_bitmap WHERE habit_id = ?",
+                       (habit_id,)).fetchone()
+    if row:
+        return CompletionBitmap(*row)
+    bitmap = build_bitmap(conn, habit_id)
+    if bitmap is not None:
+        store_bitmap(conn, habit_id, bitmap)
+    return bitmap
+
+# Returns the bitmap of a habit without writing to the database: the stored one, or one built from the
+# completions if it is missing. Used on read paths, which must not take the write lock. None for unknown habits.
+def read_bitmap(conn, habit_id):
+    row = conn.execute("SELECT base_day, days, weeks FROM completion_bitmap WHERE habit_id = ?",
+                       (habit_id,)).fetchone()
+    return CompletionBitmap(*row) if row else build_bitmap(conn, habit_id)
+
+# Adds the completions with an id above after_id to the stored bitmaps of their habits, with one update per habit.
+# Used by database.bulk_writes, which turns the bitmap_insert trigger off; habits without a stored bitmap keep none.
+# Runs in the transaction of the caller.
+def add_to_bitmaps(conn, after_id):
+    added_days = {}
+    cursor = conn.execute("SELECT habit_id, completion_day FROM completion WHERE id > ? AND completion_day IS NOT NULL",
+                          (after_id,))
+    for habit_id, day in cursor:
+        added_days.setdefault(habit_id, []).append(day)
+    for habit_id, days in added_days.items():
+        row = conn.execute("SELECT base_day, days, weeks FROM completion_bitmap WHERE habit_id = ?",
+                           (habit_id,)).fetchone()
+        if row:
+            store_bitmap(conn, habit_id, CompletionBitmap(*row).with_days(days))
+
+# Builds the bitmaps of all habits that have none, e.g. after a bulk import, in one transaction.
+# Returns the number of built bitmaps.
+def ensure_bitmaps(conn):
+    missing = [row[0] for row in conn.execute(
+        "SELECT id FROM habits WHERE id NOT IN (SELECT habit_id FROM completion_bitmap)").fetchall()]
+    if missing:
+        with conn:
+            for habit_id in missing:
+                load_bitmap(conn, habit_id)
+    return len(missing)
+
+# Drops and rebuilds the bitmaps of all habits, returns their number.
+def rebuild_bitmaps(database=None):
+    conn = (database or get_database()).connection()
+    with conn:
+        conn.execute("DELETE FROM completion_bitmap")
+    return ensure_bitmaps(conn)
+
+# Returns the ISO date of the last completion in a bitmap or None.
+def last_completion_date(bitmap):
+    last_day = bitmap.last_day()
+    return day_to_date(last_day) if last_day is not None else None
+
+if __name__ == "__main__":
+    count = rebuild_bitmaps()
+    print(f"Bitmaps of {count} habits rebuilt successfully.")
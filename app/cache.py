@@ -0,0 +1,126 @@
+import threading
+from collections import OrderedDict
+
+# Maximum number of habits kept by a HabitCache. Lists of habits (all habits or one periodicity)
+# are only cached while they are not longer than this either.
+DEFAULT_MAX_ENTRIES = 10000
+
+# In-process read-through cache of Habit objects for one database.
+# Single habits are kept by id and name with LRU eviction, full lists per periodicity are kept as buckets.
+# Before every read the cache compares the data version of the calling thread's connection with the last
+# version it has seen there; writes by other connections or processes (PRAGMA data_version), schema changes
+# made through the pool (Database.generation) and writes on the same connection (total_changes) drop all entries.
+# HabitManager invalidates the affected entries itself and then acknowledges its own write with sync().
+class HabitCache:
+    def __init__(self, database=None, max_entries=DEFAULT_MAX_ENTRIES):
+        self.database = database
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._habits = OrderedDict()
+        self._ids_by_name = {}
+        self._lists = {}
+
+    # Returns the data version seen by a connection.
+    def _version(self, conn):
+        data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        return data_version, getattr(self.database, 'generation', 0), conn.total_changes
+
+    # Drops all entries if the database changed since this thread last looked at it.
+    def validate(self, conn):
+        version = self._version(conn)
+        if getattr(self._local, 'conn', None) is not conn or self._local.version != version:
+            self.clear()
+            self._local.conn = conn
+            self._local.version = version
+
+    # Accepts the writes made on the connection since the last check without dropping entries,
+    # used after writes whose effect on the cache has already been invalidated.
+    # Changes by other connections are still detected and drop all entries.
+    def sync(self, conn):
+        version = self._version(conn)
+        if getattr(self._local, 'conn', None) is not conn or self._local.version[:2] != version[:2]:
+            self.clear()
+        self._local.conn = conn
+        self._local.version = version
+
+    # Returns a cached habit by id or None.
+    def get(self, habit_id):
+        with self._lock:
+            habit = self._habits.get(habit_id)
+            if habit is None:
+                self.misses += 1
+                return None
+            self._habits.move_to_end(habit_id)
+            self.hits += 1
+            return habit
+
+    # Returns a cached habit by name or None.
+    def get_by_name(self, name):
+        with self._lock:
+            habit_id = self._ids_by_name.get(name)
+            if habit_id is None:
+                self.misses += 1
+                return None
+            return self.get(habit_id)
+
+    # Adds a habit, evicting the least recently used habits beyond max_entries.
+    def put(self, habit):
+        with self._lock:
+            self._habits[habit.id] = habit
+            self._habits.move_to_end(habit.id)
+            self._ids_by_name[habit.name] = habit.id
+            while len(self._habits) > self.max_entries:
+                _, evicted = self._habits.popitem(last=False)
+                self._ids_by_name.pop(evicted.name, None)
+
+    # Returns a cached list of habits (key "all" or a periodicity) or None.
+    def get_list(self, key):
+        with self._lock:
+            habits = self._lists.get(key)
+            if habits is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return habits
+
+    # Caches a list of habits if it is not longer than max_entries.
+    # The list is shared with every caller, so it must not be modified (e.g. a HabitCollection).
+    def put_list(self, key, habits):
+        if len(habits) > self.max_entries:
+            return
+        with self._lock:
+            self._lists[key] = habits
+
+    # Removes a habit and all cached lists, because they may contain it.
+    def invalidate(self, habit_id=None, name=None):
+        with self._lock:
+            if habit_id is None and name is not None:
+                habit_id = self._ids_by_name.get(name)
+            habit = self._habits.pop(habit_id, None)
+            if habit is not None:
+                self._ids_by_name.pop(habit.name, None)
+            if name is not None:
+                self._ids_by_name.pop(name, None)
+            self._lists.clear()
+
+    # Removes all entries.
+    def clear(self):
+        with self._lock:
+            self._habits.clear()
+            self._ids_by_name.clear()
+            self._lists.clear()
+
+_caches_lock = threading.Lock()
+
+# Returns the cache of a database pool, creating it on first use.
+def get_habit_cache(database):
+    cache = getattr(database, '_habit_cache', None)
+    if cache is None:
+        with _caches_lock:
+            cache = getattr(database, '_habit_cache', None)
+            if cache is None:
+                cache = database._habit_cache = HabitCache(database)
+    return cache
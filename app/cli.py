@@ -3,6 +3,9 @@ from app.analytics import longest_streak, filter_by_periodicity
 from database_seeder.seeder import seed_database
 from app.database import reset_database, initialize_database
 
+# Number of habits shown per page by "View Habits".
+VIEW_PAGE_SIZE = 20
+
 # Displays the main menu of the Habit Tracking App
 def display_menu():
     manager = HabitManager()
@@ -28,15 +31,7 @@ def display_menu():
             manager.create_habit(name, description, periodicity)
             print(f"Habit '{name}' created successfully.")
         elif choice == "2":
-            habits = manager.list_habits_with_details()
-            if habits:
-                for habit in habits:
-                    habit_id, name, description, periodicity, last_completed = habit
-                    print(f"- {name} ({periodicity})")
-                    print(f"  Description: {description}")
-                    print(f"  Last Completed: {last_completed}")
-            else:
-                print("No habits found.")
+            view_habits(manager)
         elif choice == "3":
             habit_name = input("Name of the Habit to Edit: ")
             new_name = input("New name (leave blank if it shouldn´t be updated): ") or None
@@ -67,6 +62,22 @@ def display_menu():
         else:
             print("Invalid Option.")
 
+# Shows all habits with details, VIEW_PAGE_SIZE habits at a time.
+# The habits are streamed from the database, so large tables are never loaded at once.
+def view_habits(manager):
+    shown = 0
+    for habit_id, name, description, periodicity, last_completed in manager.iter_habits_with_details():
+        if shown and shown % VIEW_PAGE_SIZE == 0:
+            if input("Press Enter to show more habits or 'q' to stop: ").lower() == "q":
+                return
+        print(f"- {name} ({periodicity})")
+        print(f"  Description: {description}")
+        print(f"  Last Completed: {last_completed}")
+        shown += 1
+
+    if not shown:
+        print("No habits found.")
+
 # Rebuilds the database: Drops all tables and recreates them
 def rebuild_database():
     confirm = input("Are you sure you want to rebuild the database? All data will be lost! (yes/no): ")
@@ -1,60 +1,590 @@
 import sqlite3
+import contextlib
+import functools
 import os
+import random
+import threading
+import time
+from app.dates import DAY_ORDINAL_SQL
 
-DB_FILE = 'habits.db'
+# Path of the SQLite database file, can be overridden with the HABITS_DB environment variable.
+DB_FILE = os.environ.get('HABITS_DB', 'habits.db')
 
-# Initializes the SQLite database with required tables.
-def initialize_database():
-    db_path = os.path.abspath(DB_FILE)
-    # print(f"Initializing database at: {db_path}")
+# Number of prepared statements every pooled connection keeps in its cache.
+STATEMENT_CACHE_SIZE = 256
+
+# Enables the concurrency mode for the shared pool if the HABITS_DB_CONCURRENT environment variable is set to 1.
+DB_CONCURRENT = os.environ.get('HABITS_DB_CONCURRENT') == '1'
+
+# Runs the shared pool on the in-memory engine (app.memory_engine) if HABITS_DB_MEMORY is set to 1.
+DB_MEMORY = os.environ.get('HABITS_DB_MEMORY') == '1'
+
+# PRAGMAs applied once when a pooled connection is opened.
+# foreign_keys makes deleting a habit cascade to its completions, streak summary and bitmap.
+CONNECTION_PRAGMAS = (
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA foreign_keys = ON",
+)
+
+# Additional PRAGMAs of the concurrency mode. WAL lets readers continue while one process writes
+# and synchronous=NORMAL only syncs the WAL at checkpoints instead of on every commit.
+CONCURRENT_PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",
+)
+
+# Class of the pooled connections, replaced by app.instrumentation while it is enabled.
+CONNECTION_FACTORY = sqlite3.Connection
+
+# Milliseconds a connection waits for a lock held by another connection before failing.
+BUSY_TIMEOUT = 5000
+CONCURRENT_BUSY_TIMEOUT = 30000
+
+# Attempts and first delay in seconds of retry_on_locked.
+RETRY_ATTEMPTS = 8
+RETRY_BASE_DELAY = 0.01
+
+# Thread-safe connection pool for one SQLite database file.
+# Every thread gets its own connection, which is opened on first use and reused afterwards.
+# With concurrent=True the pool switches the file to WAL mode for many processes writing at the same time.
+class Database:
+    # True if path is an SQLite URI ("file:...") instead of a file name.
+    uri = False
+
+    def __init__(self, path=DB_FILE, concurrent=False):
+        self.path = path
+        self.concurrent = concurrent
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._connections = []
+        self._pid = os.getpid()
+        # Incremented on schema changes made through this pool, so caches can detect them.
+        self.generation = 0
+
+    # Opens a new connection with statement caching and applies the PRAGMA setup.
+    def _connect(self):
+        busy_timeout = CONCURRENT_BUSY_TIMEOUT if self.concurrent else BUSY_TIMEOUT
+        conn = sqlite3.connect(self.path, timeout=busy_timeout / 1000, factory=CONNECTION_FACTORY, uri=self.uri,
+                               cached_statements=STATEMENT_CACHE_SIZE, check_same_thread=False)
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        if self.concurrent:
+            # The journal mode is stored in the file, so it only has to be switched once.
+            if conn.execute("PRAGMA journal_mode").fetchone()[0] != "wal":
+                retry_on_locked(conn.execute)("PRAGMA journal_mode = WAL")
+            for pragma in CONCURRENT_PRAGMAS:
+                conn.execute(pragma)
+        return conn
+
+    # Returns the connection of the calling thread.
+    def connection(self):
+        # Connections must not be shared with a forked child process.
+        if self._pid != os.getpid():
+            self._reset_after_fork()
+
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    # Forgets the connections inherited from the parent process without closing them.
+    def _reset_after_fork(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._connections = []
+        self._pid = os.getpid()
+
+    # Closes all connections opened by this pool.
+    def close(self):
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+            self._local = threading.local()
 
+_default_database = None
+_default_lock = threading.Lock()
+
+# Creates a pool for a database file, a MemoryDatabase if memory is True.
+def _create_database(path, concurrent, memory):
+    if memory:
+        # Imported here, because the memory engine builds on this module.
+        from app.memory_engine import MemoryDatabase
+        return MemoryDatabase(path)
+    return Database(path, concurrent=concurrent)
+
+# Returns the shared database pool, creating it on first use.
+def get_database():
+    global _default_database
+    if _default_database is None:
+        with _default_lock:
+            if _default_database is None:
+                _default_database = _create_database(DB_FILE, DB_CONCURRENT, DB_MEMORY)
+    return _default_database
+
+# Points the shared database pool to another database file, optionally in concurrency mode or
+# loaded into memory. A replaced in-memory pool keeps running until it is stopped or the process exits.
+def configure_database(path=DB_FILE, concurrent=DB_CONCURRENT, memory=DB_MEMORY):
+    global _default_database
+    with _default_lock:
+        if _default_database is not None:
+            _default_database.close()
+        _default_database = _create_database(path, concurrent, memory)
+    return _default_database
+
+# Context manager pointing the shared pool to another database file for the duration of the block, e.g. a
+# temporary file for benchmarks. Yields the new pool, which is closed afterwards; the previous pool is restored
+# unchanged, so a path configured by the caller (e.g. main.py --db) stays in effect.
+@contextlib.contextmanager
+def using_database(path, concurrent=DB_CONCURRENT, memory=DB_MEMORY):
+    global _default_database
+    database = _create_database(path, concurrent, memory)
+    with _default_lock:
+        previous, _default_database = _default_database, database
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
+        yield database
+    finally:
+        with _default_lock:
+            _default_database = previous
+        database.close()
+
+# Streams the rows of an executed cursor, fetching batch_size rows at a time.
+def iter_rows(cursor, batch_size):
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        yield from rows
+
+# Returns True for the errors SQLite raises when another connection holds a conflicting lock.
+def is_locked_error(error):
+    message = str(error)
+    return isinstance(error, sqlite3.OperationalError) and ("locked" in message or "busy" in message)
+
+# Decorator retrying a write with exponential backoff and jitter while the database is locked.
+# The wrapped function has to run its writes in one transaction (e.g. "with conn:"), which is
+# rolled back on the error, so it can simply be called again.
+def retry_on_locked(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        for attempt in range(RETRY_ATTEMPTS):
+            try:
+                return func(*args, **kwargs)
+            except sqlite3.OperationalError as e:
+                if not is_locked_error(e) or attempt == RETRY_ATTEMPTS - 1:
+                    raise
+                time.sleep(RETRY_BASE_DELAY * 2 ** attempt * random.uniform(0.5, 1.5))
+    return wrapper
+
+# Returns the pooled connection of the calling thread for the shared database.
+def get_connection():
+    return get_database().connection()
+
+# Migration 1: removes duplicate completions and adds a covering UNIQUE(habit_id, completion_date) index.
+def _migration_completion_index(cursor):
+    cursor.execute('''
+        DELETE FROM completion
+        WHERE id NOT IN (
+            SELECT MIN(id) FROM completion GROUP BY habit_id, completion_date
+        )
+    ''')
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_completion_habit_date
+        ON completion (habit_id, completion_date)
+    ''')
+
+# Migration 2: adds the habit_streaks summary table. Rows are filled on first read or by app.streaks.rebuild_streaks.
+def _migration_habit_streaks(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS habit_streaks (
+            habit_id INTEGER PRIMARY KEY,
+            current_start INTEGER,
+            current_end INTEGER,
+            longest_streak INTEGER NOT NULL DEFAULT 0,
+            last_completion TEXT,
+            FOREIGN KEY (habit_id) REFERENCES habits (id) ON DELETE CASCADE
+        )
+    ''')
+
+# Migration 3: stores completion dates as integer day ordinals next to the ISO string, with a derived week number.
+# The UNIQUE(habit_id, completion_day) index replaces the one on the date string, so a single index serves both
+# the duplicate check on insert and the range scans. Completions inserted without a day ordinal (e.g. by external
+# writers) get it from a trigger.
+def _migration_completion_day(cursor):
+    cursor.execute("ALTER TABLE completion ADD COLUMN completion_day INTEGER")
+    cursor.execute(f"UPDATE completion SET completion_day = {DAY_ORDINAL_SQL.format('completion_date')}")
+    cursor.execute('''
+        ALTER TABLE completion
+        ADD COLUMN completion_week INTEGER GENERATED ALWAYS AS ((completion_day - 1) / 7) VIRTUAL
+    ''')
+    # Date strings in different formats can name the same day.
+    cursor.execute('''
+        DELETE FROM completion
+        WHERE completion_day IS NOT NULL AND id NOT IN (
+            SELECT MIN(id) FROM completion GROUP BY habit_id, completion_day
+        )
+    ''')
+    cursor.execute("DROP INDEX IF EXISTS idx_completion_habit_date")
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_completion_habit_day
+        ON completion (habit_id, completion_day)
+    ''')
+    # The index can only reject a duplicate written without a day ordinal once the trigger below sets it, which
+    # INSERT OR IGNORE would skip and leave the row without one. Such duplicates are dropped up front instead.
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS completion_day_duplicate
+        BEFORE INSERT ON completion
+        WHEN NEW.completion_day IS NULL AND EXISTS (
+            SELECT 1 FROM completion
+            WHERE habit_id = NEW.habit_id AND completion_day = {DAY_ORDINAL_SQL.format('NEW.completion_date')}
+        )
+        BEGIN
+            SELECT RAISE(IGNORE);
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS completion_day_insert
+        AFTER INSERT ON completion
+        WHEN NEW.completion_day IS NULL
+        BEGIN
+            UPDATE completion SET completion_day = {DAY_ORDINAL_SQL.format('NEW.completion_date')} WHERE id = NEW.id;
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS completion_day_update
+        AFTER UPDATE OF completion_date ON completion
+        BEGIN
+            UPDATE completion SET completion_day = {DAY_ORDINAL_SQL.format('NEW.completion_date')} WHERE id = NEW.id;
+        END
+    ''')
+
+# SQL expressions of the rollup keys of a completion row (prefix "NEW." or "OLD." in triggers).
+ROLLUP_WEEK_SQL = "({0}completion_day - 1) / 7"
+ROLLUP_WEEKDAY_BIT_SQL = "(1 << (({0}completion_day - 1) % 7))"
+ROLLUP_MONTH_SQL = ("(CAST(strftime('%Y', {0}completion_day + 1721424.5) AS INTEGER) * 12"
+                    " + CAST(strftime('%m', {0}completion_day + 1721424.5) AS INTEGER) - 1)")
+
+# Adds the completions with an id above after_id to the rollup tables with one upsert per habit and week or month
+# instead of one per row. The rows are read and grouped by habit, week and month once into the temporary table
+# rollup_delta, both rollups are then summed up from these groups. The month is grouped as YYYYMM, which takes one
+# strftime call per row instead of the two of ROLLUP_MONTH_SQL. Runs in the transaction of the caller.
+def add_to_rollups(cursor, after_id=0):
+    cursor.execute('''
+        CREATE TEMP TABLE IF NOT EXISTS rollup_delta (
+            habit_id INTEGER NOT NULL,
+            week INTEGER NOT NULL,
+            year_month INTEGER NOT NULL,
+            completions INTEGER NOT NULL,
+            weekday_mask INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute(f'''
+        INSERT INTO rollup_delta (habit_id, week, year_month, completions, weekday_mask)
+        SELECT habit_id, {ROLLUP_WEEK_SQL.format('')}, CAST(strftime('%Y%m', completion_day + 1721424.5) AS INTEGER),
+               COUNT(*), SUM({ROLLUP_WEEKDAY_BIT_SQL.format('')})
+        FROM completion
+        WHERE id > ? AND completion_day IS NOT NULL
+        GROUP BY 1, 2, 3
+    ''', (after_id,))
+    # The days of a week that is split between two months are disjoint, so summing their masks combines them.
+    cursor.execute('''
+        INSERT INTO completion_weekly (habit_id, week, completions, weekday_mask)
+        SELECT habit_id, week, SUM(completions), SUM(weekday_mask)
+        FROM rollup_delta
+        WHERE true
+        GROUP BY 1, 2
+        ON CONFLICT (habit_id, week) DO UPDATE
+        SET completions = completions + excluded.completions, weekday_mask = weekday_mask | excluded.weekday_mask
+    ''')
+    cursor.execute('''
+        INSERT INTO completion_monthly (habit_id, month, completions)
+        SELECT habit_id, year_month / 100 * 12 + year_month % 100 - 1, SUM(completions)
+        FROM rollup_delta
+        WHERE true
+        GROUP BY 1, 2
+        ON CONFLICT (habit_id, month) DO UPDATE SET completions = completions + excluded.completions
+    ''')
+    cursor.execute("DELETE FROM rollup_delta")
 
-        # Table: Habits
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS habits (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL UNIQUE,
-                description TEXT,
-                periodicity TEXT CHECK(periodicity IN ('daily', 'weekly')) NOT NULL,
-                creation_date TEXT NOT NULL
-            )
-        ''')
-
-        # Table: Completion
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS completion (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                habit_id INTEGER NOT NULL,
-                completion_date TEXT NOT NULL,
-                FOREIGN KEY (habit_id) REFERENCES habits (id) ON DELETE CASCADE
-            )
-        ''')
+# Triggers on inserts into completion that bulk_writes turns off.
+BULK_SKIPPED_TRIGGERS = ("completion_day_duplicate", "completion_day_insert", "rollup_insert", "bitmap_insert")
 
+# Context manager for bulk inserts into completion, which runs in the transaction of the caller (or starts one).
+# Each of the insert triggers costs about a microsecond per row even if its WHEN clause is false, so they are
+# dropped for the block and created again from their stored SQL before the transaction commits; other connections
+# never see the schema without them. The inserted rows are then added to the rollups with one upsert per week and
+# month and to the stored bitmaps once per habit. Rows inserted in the block must set completion_day and handle
+# duplicates themselves (like INSERT_COMPLETION_SQL). Yields the highest completion id before the inserts,
+# all rows inserted in the block have a higher one.
+@contextlib.contextmanager
+def bulk_writes(conn):
+    # Imported here, because app.bitmaps builds on this module.
+    from app.bitmaps import add_to_bitmaps
+
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+    after_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM completion").fetchone()[0]
+    placeholders = ", ".join("?" * len(BULK_SKIPPED_TRIGGERS))
+    triggers = conn.execute(f"SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name IN ({placeholders})",
+                            BULK_SKIPPED_TRIGGERS).fetchall()
+    for name, _ in triggers:
+        conn.execute(f"DROP TRIGGER {name}")
+    try:
+        yield after_id
+    finally:
+        # A failed statement may have rolled the transaction back, which already restored the triggers.
+        if conn.in_transaction:
+            for _, sql in triggers:
+                conn.execute(sql)
+    add_to_rollups(conn, after_id)
+    add_to_bitmaps(conn, after_id)
+
+# Migration 4: adds rollup tables with the number of completions per habit and week (plus a bit mask of the
+# completed weekdays, bit 0 = Monday) and per habit and month. Triggers keep them up to date on single writes,
+# bulk writes update them once per chunk (see bulk_writes), so analytics over long periods read one row per
+# week or month instead of every completion.
+def _migration_rollups(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS completion_weekly (
+            habit_id INTEGER NOT NULL,
+            week INTEGER NOT NULL,
+            completions INTEGER NOT NULL,
+            weekday_mask INTEGER NOT NULL,
+            PRIMARY KEY (habit_id, week)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS completion_monthly (
+            habit_id INTEGER NOT NULL,
+            month INTEGER NOT NULL,
+            completions INTEGER NOT NULL,
+            PRIMARY KEY (habit_id, month)
+        ) WITHOUT ROWID
+    ''')
+    add_to_rollups(cursor)
+
+    add = f'''
+        INSERT INTO completion_weekly (habit_id, week, completions, weekday_mask)
+        VALUES (NEW.habit_id, {ROLLUP_WEEK_SQL.format('NEW.')}, 1, {ROLLUP_WEEKDAY_BIT_SQL.format('NEW.')})
+        ON CONFLICT (habit_id, week) DO UPDATE
+        SET completions = completions + 1, weekday_mask = weekday_mask | excluded.weekday_mask;
+        INSERT INTO completion_monthly (habit_id, month, completions)
+        VALUES (NEW.habit_id, {ROLLUP_MONTH_SQL.format('NEW.')}, 1)
+        ON CONFLICT (habit_id, month) DO UPDATE SET completions = completions + 1;
+    '''
+    remove = f'''
+        UPDATE completion_weekly
+        SET completions = completions - 1, weekday_mask = weekday_mask & ~{ROLLUP_WEEKDAY_BIT_SQL.format('OLD.')}
+        WHERE habit_id = OLD.habit_id AND week = {ROLLUP_WEEK_SQL.format('OLD.')};
+        DELETE FROM completion_weekly
+        WHERE habit_id = OLD.habit_id AND week = {ROLLUP_WEEK_SQL.format('OLD.')} AND completions <= 0;
+        UPDATE completion_monthly SET completions = completions - 1
+        WHERE habit_id = OLD.habit_id AND month = {ROLLUP_MONTH_SQL.format('OLD.')};
+        DELETE FROM completion_monthly
+        WHERE habit_id = OLD.habit_id AND month = {ROLLUP_MONTH_SQL.format('OLD.')} AND completions <= 0;
+    '''
+    # Rows inserted without a day ordinal are counted when the completion_day_insert trigger sets it.
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS rollup_insert
+        AFTER INSERT ON completion
+        WHEN NEW.completion_day IS NOT NULL
+        BEGIN {add} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS rollup_delete
+        AFTER DELETE ON completion
+        WHEN OLD.completion_day IS NOT NULL
+        BEGIN {remove} END
+    ''')
+    # A changed completion is removed from its old week and month before it is added to the new ones.
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS rollup_update
+        AFTER UPDATE OF habit_id, completion_day ON completion
+        WHEN OLD.completion_day IS NOT NULL AND NEW.completion_day IS NOT NULL
+        BEGIN {remove} {add} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS rollup_update_add
+        AFTER UPDATE OF habit_id, completion_day ON completion
+        WHEN OLD.completion_day IS NULL AND NEW.completion_day IS NOT NULL
+        BEGIN {add} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS rollup_update_remove
+        AFTER UPDATE OF habit_id, completion_day ON completion
+        WHEN OLD.completion_day IS NOT NULL AND NEW.completion_day IS NULL
+        BEGIN {remove} END
+    ''')
+
+# Migration 5: adds the completion_bitmap table with a day and a week bitmap of the completions of every habit
+# (see app.bitmaps). Bitmaps are built on first use; triggers delete the bitmap of a habit whenever its
+# completions change, so writers that do not update the bitmap themselves never leave a stale one behind.
+def _migration_completion_bitmap(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS completion_bitmap (
+            habit_id INTEGER PRIMARY KEY,
+            base_day INTEGER NOT NULL,
+            days BLOB NOT NULL,
+            weeks BLOB NOT NULL,
+            FOREIGN KEY (habit_id) REFERENCES habits (id) ON DELETE CASCADE
+        )
+    ''')
+    # Bulk writes update the bitmaps once per chunk instead (see bulk_writes).
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS bitmap_insert
+        AFTER INSERT ON completion
+        BEGIN DELETE FROM completion_bitmap WHERE habit_id = NEW.habit_id; END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS bitmap_delete
+        AFTER DELETE ON completion
+        BEGIN DELETE FROM completion_bitmap WHERE habit_id = OLD.habit_id; END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS bitmap_update
+        AFTER UPDATE OF habit_id, completion_day ON completion
+        BEGIN DELETE FROM completion_bitmap WHERE habit_id IN (OLD.habit_id, NEW.habit_id); END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS bitmap_habit_delete
+        AFTER DELETE ON habits
+        BEGIN DELETE FROM completion_bitmap WHERE habit_id = OLD.id; END
+    ''')
+
+# Tables with rows per habit. Rows of deleted habits are removed in this order, so the triggers on completion
+# can still update the rollups and bitmaps.
+ORPHAN_TABLES = ("completion", "habit_streaks", "completion_bitmap", "completion_weekly", "completion_monthly")
+
+# Deletes the rows of habits that no longer exist, left behind by writers that did not enforce the foreign keys.
+# Runs in the transaction of the caller and returns the number of deleted rows per table.
+def purge_orphans(cursor):
+    return {table: cursor.execute(f"DELETE FROM {table} WHERE habit_id NOT IN (SELECT id FROM habits)").rowcount
+            for table in ORPHAN_TABLES}
+
+# Migration 6: adds the append-only habit_events log (see app.event_log) and removes the orphaned rows
+# that deleted habits left behind while the foreign keys were not enforced.
+def _migration_event_log(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS habit_events (
+            seq INTEGER PRIMARY KEY,
+            kind TEXT NOT NULL,
+            habit_name TEXT NOT NULL,
+            payload TEXT,
+            created_at TEXT NOT NULL
+        )
+    ''')
+    purge_orphans(cursor)
+
+# Schema migrations in order. Migration n upgrades a database from user_version n - 1 to n.
+MIGRATIONS = [
+    _migration_completion_index,
+    _migration_habit_streaks,
+    _migration_completion_day,
+    _migration_rollups,
+    _migration_completion_bitmap,
+    _migration_event_log,
+]
+
+# Inserts a completion (habit_id, completion_date, completion_day), completions that already exist are skipped.
+INSERT_COMPLETION_SQL = '''
+    INSERT INTO completion (habit_id, completion_date, completion_day)
+    VALUES (?, ?, ?)
+    ON CONFLICT (habit_id, completion_day) DO NOTHING
+'''
+
+# Schema version of a fully migrated database.
+SCHEMA_VERSION = len(MIGRATIONS)
+
+# Returns the schema version stored in the database file.
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+# Applies all pending migrations in a single transaction and returns the new schema version.
+def migrate_database(database=None):
+    database = database or get_database()
+    conn = database.connection()
+    if get_schema_version(conn) >= SCHEMA_VERSION:
+        return SCHEMA_VERSION
+
+    # BEGIN IMMEDIATE keeps other processes from migrating the same file at the same time.
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        version = get_schema_version(conn)
+        cursor = conn.cursor()
+        for migration in MIGRATIONS[version:]:
+            migration(cursor)
+        cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
         conn.commit()
+        database.generation += 1
+    except BaseException:
+        conn.rollback()
+        raise
+    return SCHEMA_VERSION
+
+# Initializes the SQLite database with required tables.
+# The tables are only created if the schema version shows that the database is not up to date,
+# so starting the app on an existing database does not run any DDL.
+def initialize_database(database=None):
+    database = database or get_database()
+
+    try:
+        if get_schema_version(database.connection()) >= SCHEMA_VERSION:
+            return
+        with database.connection() as conn:
+            cursor = conn.cursor()
+
+            # Table: Habits
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS habits (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL UNIQUE,
+                    description TEXT,
+                    periodicity TEXT CHECK(periodicity IN ('daily', 'weekly')) NOT NULL,
+                    creation_date TEXT NOT NULL
+                )
+            ''')
+
+            # Table: Completion
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS completion (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    habit_id INTEGER NOT NULL,
+                    completion_date TEXT NOT NULL,
+                    FOREIGN KEY (habit_id) REFERENCES habits (id) ON DELETE CASCADE
+                )
+            ''')
+
+        # Indexes and later schema changes are applied as migrations, so existing files are upgraded in place.
+        migrate_database(database)
         # print("Database initialized successfully.")
     except sqlite3.Error as e:
         print(f"Error while initializing database: {e}")
-    finally:
-        conn.close()
 
-# Resets the database by dropping and reinitializing tables.
-def reset_database():
-    try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
+# Resets the database by dropping all tables.
+def reset_database(database=None):
+    database = database or get_database()
 
-        cursor.execute('DROP TABLE IF EXISTS completion')
-        cursor.execute('DROP TABLE IF EXISTS habits')
+    try:
+        conn = database.connection()
+        # Otherwise dropping a table deletes its rows first, which cascades into tables that are already gone.
+        conn.execute("PRAGMA foreign_keys = OFF")
+        try:
+            with conn:
+                cursor = conn.cursor()
 
-        conn.commit()
+                cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")
+                for (table,) in cursor.fetchall():
+                    cursor.execute(f'DROP TABLE IF EXISTS "{table}"')
+                cursor.execute('PRAGMA user_version = 0')
+        finally:
+            conn.execute("PRAGMA foreign_keys = ON")
+        database.generation += 1
         # print("Database reset successfully.")
     except sqlite3.Error as e:
         print(f"Error while resetting database: {e}")
-    finally:
-        conn.close()
 
 if __name__ == "__main__":
     initialize_database()
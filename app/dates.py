@@ -0,0 +1,43 @@
+from datetime import date
+
+# Completion dates are stored as ISO strings and as integer day ordinals (the numbering of date.toordinal()).
+# Day 1 (0001-01-01) is a Monday, so week numbers derived from day ordinals start on Monday like ISO weeks.
+
+# SQL expression turning an ISO date parameter or column into its day ordinal.
+DAY_ORDINAL_SQL = "CAST(julianday({}) - 1721424.5 AS INTEGER)"
+
+# SQL expression turning a day ordinal parameter or column into its ISO date.
+DAY_DATE_SQL = "date({} + 1721424.5)"
+
+# Returns the day ordinal of an ISO date string or a date object.
+def to_day(value):
+    if isinstance(value, str):
+        value = date.fromisoformat(value)
+    return value.toordinal()
+
+# Returns the (ISO date string, day ordinal) pair stored for a completion date, given as an ISO string,
+# a date object or a day ordinal. Raises a ValueError for strings that are not valid ISO dates.
+def completion_values(value):
+    if isinstance(value, int):
+        return date.fromordinal(value).isoformat(), value
+    if isinstance(value, str):
+        value = date.fromisoformat(value)
+    return value.isoformat(), value.toordinal()
+
+# Returns the ISO date string of a day ordinal.
+def day_to_date(day):
+    return date.fromordinal(day).isoformat()
+
+# Returns the week number of a day ordinal.
+def day_to_week(day):
+    return (day - 1) // 7
+
+# Returns the first (Monday) and the last (Sunday) day ordinal of the week containing the day.
+def week_bounds(day):
+    first_day = day - (day - 1) % 7
+    return first_day, first_day + 6
+
+# Returns the period number of a date: the day ordinal for daily habits and the week number for weekly habits.
+def period_of(value, periodicity):
+    day = to_day(value)
+    return day if periodicity == "daily" else day_to_week(day)
@@ -0,0 +1,223 @@
+# Append-only event log of habit changes (create, edit, delete, complete, uncomplete) for write bursts.
+# Writing an event is a single INSERT at the end of the habit_events table, which has no index or trigger to
+# maintain. A compactor folds the events in order into the habits and completion tables in one transaction per
+# batch, recomputes the streaks of the touched habits and deletes the folded events, so readers always see
+# compacted tables. Events refer to habits by name, because a habit created in the log has no id before it is
+# compacted. Changes show up in HabitManager and app.analytics after the next compaction.
+# Run from the project root: python -m app.event_log compact / python -m app.event_log purge
+import argparse
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from app.cache import get_habit_cache
+from app.database import (get_database, initialize_database, is_locked_error, purge_orphans, retry_on_locked,
+                          INSERT_COMPLETION_SQL)
+from app.dates import completion_values
+from app.streaks import recompute_streak
+
+EVENT_KINDS = ("create", "edit", "delete", "complete", "uncomplete")
+
+# Maximum number of events folded in one transaction.
+COMPACT_BATCH_SIZE = 10000
+
+# Seconds between two runs of the background compactor and between two purges of orphaned rows.
+DEFAULT_COMPACT_INTERVAL = 1.0
+DEFAULT_PURGE_INTERVAL = 3600.0
+
+# Appends habit changes to the event log of a database and compacts them into its tables.
+# With a compact_interval a background thread compacts the log until stop() is called.
+class EventLog:
+    def __init__(self, database=None, compact_interval=None, purge_interval=DEFAULT_PURGE_INTERVAL):
+        self._database = database
+        self.compact_interval = compact_interval
+        self.purge_interval = purge_interval
+        # (seq, kind, habit_name, error) of the events that could not be applied.
+        self.failed = []
+        self.last_error = None
+        self._stop_event = threading.Event()
+        self._thread = None
+        if compact_interval:
+            self._thread = threading.Thread(target=self._run, name="habit-compactor", daemon=True)
+            self._thread.start()
+
+    # Returns the database pool of the log (the shared pool unless one was passed in).
+    @property
+    def database(self):
+        return self._database or get_database()
+
+    # Appends an event and returns its sequence number.
+    @retry_on_locked
+    def append(self, kind, habit_name, **payload):
+        if kind not in EVENT_KINDS:
+            raise ValueError(f"Unknown event '{kind}', expected one of {', '.join(EVENT_KINDS)}.")
+        with self.database.connection() as conn:
+            cursor = conn.execute('''
+                INSERT INTO habit_events (kind, habit_name, payload, created_at)
+                VALUES (?, ?, ?, ?)
+            ''', (kind, habit_name, json.dumps(payload) if payload else None, datetime.now().isoformat(timespec="seconds")))
+        return cursor.lastrowid
+
+    # Logs the creation of a habit.
+    def create_habit(self, name, description, periodicity):
+        if periodicity not in ("daily", "weekly"):
+            raise ValueError(f"Unknown periodicity '{periodicity}', expected 'daily' or 'weekly'.")
+        return self.append("create", name, description=description, periodicity=periodicity,
+                           creation_date=datetime.now().strftime("%Y-%m-%d"))
+
+    # Logs a change of the name, description or periodicity of a habit.
+    def edit_habit(self, habit_name, new_name=None, new_description=None, new_periodicity=None):
+        if new_periodicity is not None and new_periodicity not in ("daily", "weekly"):
+            raise ValueError(f"Unknown periodicity '{new_periodicity}', expected 'daily' or 'weekly'.")
+        changes = {"name": new_name, "description": new_description, "periodicity": new_periodicity}
+        return self.append("edit", habit_name, **{key: value for key, value in changes.items() if value is not None})
+
+    # Logs the deletion of a habit with its completions.
+    def delete_habit(self, habit_name):
+        return self.append("delete", habit_name)
+
+    # Logs a completion of a habit. Raises a ValueError for dates that are not in YYYY-MM-DD format.
+    def mark_habit_completed(self, habit_name, completion_date):
+        return self.append("complete", habit_name, date=completion_values(completion_date)[0])
+
+    # Logs the removal of a completion of a habit.
+    def unmark_habit_completed(self, habit_name, completion_date):
+        return self.append("uncomplete", habit_name, date=completion_values(completion_date)[0])
+
+    # Returns the number of events that are not compacted yet.
+    def pending(self):
+        return self.database.connection().execute("SELECT COUNT(*) FROM habit_events").fetchone()[0]
+
+    # Returns the id of a habit by its name or raises a ValueError.
+    @staticmethod
+    def _habit_id(conn, habit_name):
+        row = conn.execute("SELECT id FROM habits WHERE name = ?", (habit_name,)).fetchone()
+        if row is None:
+            raise ValueError(f"No habit found with name '{habit_name}'.")
+        return row[0]
+
+    # Applies one event and returns the id of the habit whose streak has to be recomputed or None.
+    def _apply(self, conn, kind, habit_name, payload):
+        if kind == "create":
+            return conn.execute('''
+                INSERT INTO habits (name, description, periodicity, creation_date)
+                VALUES (?, ?, ?, ?)
+            ''', (habit_name, payload["description"], payload["periodicity"], payload["creation_date"])).lastrowid
+
+        if kind == "delete":
+            # The foreign keys cascade to the completions, the streak summary and the bitmap of the habit.
+            if conn.execute("DELETE FROM habits WHERE name = ?", (habit_name,)).rowcount == 0:
+                raise ValueError(f"Habit with name '{habit_name}' not found.")
+            return None
+
+        habit_id = self._habit_id(conn, habit_name)
+        if kind == "edit":
+            for column in ("name", "description", "periodicity"):
+                if column in payload:
+                    conn.execute(f"UPDATE habits SET {column} = ? WHERE id = ?", (payload[column], habit_id))
+            # Streaks are counted in periods, so they have to be recomputed for a new periodicity.
+            return habit_id if "periodicity" in payload else None
+
+        completion_date, completion_day = completion_values(payload["date"])
+        if kind == "complete":
+            conn.execute(INSERT_COMPLETION_SQL, (habit_id, completion_date, completion_day))
+        else:
+            conn.execute("DELETE FROM completion WHERE habit_id = ? AND completion_day = ?", (habit_id, completion_day))
+        return habit_id
+
+    # Folds up to batch_size events in order into the tables in one transaction and deletes them from the log.
+    # Events that cannot be applied (e.g. a completion of an unknown habit) are skipped and kept in failed.
+    # Returns the number of applied and failed events.
+    @retry_on_locked
+    def compact(self, batch_size=COMPACT_BATCH_SIZE):
+        database = self.database
+        conn = database.connection()
+        failed = []
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            events = conn.execute("SELECT seq, kind, habit_name, payload FROM habit_events ORDER BY seq LIMIT ?",
+                                  (batch_size,)).fetchall()
+            if not events:
+                return {"applied": 0, "failed": 0}
+
+            touched_habit_ids = set()
+            for seq, kind, habit_name, payload in events:
+                conn.execute("SAVEPOINT event")
+                try:
+                    habit_id = self._apply(conn, kind, habit_name, json.loads(payload) if payload else {})
+                    conn.execute("RELEASE event")
+                except (sqlite3.Error, ValueError) as e:
+                    # A locked database fails the whole transaction, which is then retried.
+                    if is_locked_error(e):
+                        raise
+                    conn.execute("ROLLBACK TO event")
+                    conn.execute("RELEASE event")
+                    failed.append((seq, kind, habit_name, str(e)))
+                    continue
+                if habit_id is not None:
+                    touched_habit_ids.add(habit_id)
+
+            for habit_id in touched_habit_ids:
+                recompute_streak(conn, habit_id)
+            conn.execute("DELETE FROM habit_events WHERE seq <= ?", (events[-1][0],))
+
+        self.failed.extend(failed)
+        get_habit_cache(database).clear()
+        return {"applied": len(events) - len(failed), "failed": len(failed)}
+
+    # Compacts until the log is empty and returns the total number of applied and failed events.
+    def compact_all(self, batch_size=COMPACT_BATCH_SIZE):
+        totals = {"applied": 0, "failed": 0}
+        while True:
+            result = self.compact(batch_size)
+            if not result["applied"] and not result["failed"]:
+                return totals
+            totals = {key: totals[key] + result[key] for key in totals}
+
+    # Deletes the rows of habits that no longer exist and returns their number per table.
+    @retry_on_locked
+    def purge_orphans(self):
+        database = self.database
+        with database.connection() as conn:
+            removed = purge_orphans(conn)
+        get_habit_cache(database).clear()
+        return removed
+
+    # Background thread: compacts the log every compact_interval seconds and purges orphaned rows every
+    # purge_interval seconds until stop() is called. Errors are kept in last_error and retried on the next round.
+    def _run(self):
+        last_purge = None
+        while not self._stop_event.wait(self.compact_interval):
+            try:
+                self.compact_all()
+                if last_purge is None or time.monotonic() - last_purge >= self.purge_interval:
+                    self.purge_orphans()
+                    last_purge = time.monotonic()
+                self.last_error = None
+            except (sqlite3.Error, OSError) as e:
+                self.last_error = e
+
+    # Stops the background thread and compacts the remaining events.
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.compact_all()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compact the habit event log or purge orphaned rows.")
+    parser.add_argument("command", choices=["compact", "purge"])
+    args = parser.parse_args()
+
+    initialize_database()
+    log = EventLog()
+    if args.command == "compact":
+        totals = log.compact_all()
+        print(f"Compacted {totals['applied']} events, {totals['failed']} could not be applied.")
+        for seq, kind, habit_name, error in log.failed:
+            print(f"Failed: event {seq} ({kind} '{habit_name}'): {error}")
+    else:
+        removed = log.purge_orphans()
+        print(f"Removed {sum(removed.values())} orphaned rows.")
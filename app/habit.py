@@ -1,89 +1,188 @@
-from datetime import datetime, timedelta
-import sqlite3
+import json
+from array import array
+from app.database import get_database, iter_rows, INSERT_COMPLETION_SQL
+from app.dates import completion_values
+from app.streak_engine import HAS_NUMPY, _load_numpy, summarize_dates
+from app.streaks import get_current_streak, get_streak_summary, record_completion
 
+# Number of rows fetched at once when a HabitCollection is built from a cursor.
+COLLECTION_BATCH_SIZE = 1000
+
+# Returns a list of habit ids from one id or an iterable of ids.
+def _id_list(habit_ids):
+    return [habit_ids] if isinstance(habit_ids, int) else list(habit_ids)
+
+# Returns the query and parameters selecting (habit_id, column) of the completions of the habits (all for None)
+# from start to end, both inclusive and optional, ordered by habit and day.
+def _completion_query(column, habit_ids, start, end):
+    conditions = []
+    params = {}
+    if habit_ids is not None:
+        habit_ids = _id_list(habit_ids)
+        if len(habit_ids) == 1:
+            conditions.append("habit_id = :habit_id")
+            params["habit_id"] = habit_ids[0]
+        else:
+            conditions.append("habit_id IN (SELECT value FROM json_each(:habit_ids))")
+            params["habit_ids"] = json.dumps(habit_ids)
+    if start is not None:
+        conditions.append("completion_day >= :start")
+        params["start"] = completion_values(start)[1]
+    if end is not None:
+        conditions.append("completion_day <= :end")
+        params["end"] = completion_values(end)[1]
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return f"SELECT habit_id, {column} FROM completion {where} ORDER BY habit_id, completion_day", params
+
+# Slotted, so every instance stores its attributes without a per-instance __dict__.
+# database is the pool the habit was read from (the shared pool if None), its streaks are read there.
 class Habit:
-    def __init__(self, id, name, description, periodicity, creation_date):
+    __slots__ = ("id", "name", "description", "periodicity", "creation_date", "database")
+
+    def __init__(self, id, name, description, periodicity, creation_date, database=None):
         self.id = id
         self.name = name
         self.description = description
         self.periodicity = periodicity
         self.creation_date = creation_date
+        self.database = database
 
     @staticmethod
-    # Creates a Habit instance from a database row.
-    def from_database(row):
-        return Habit(row[0], row[1], row[2], row[3], row[4])
+    # Creates a Habit instance from a database row read from the given pool.
+    def from_database(row, database=None):
+        return Habit(row[0], row[1], row[2], row[3], row[4], database)
 
     @staticmethod
-    # Fetches all completion dates for the habit from the database.
-    def get_completion_dates(habit_id):
-        conn = sqlite3.connect('habits.db')
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT completion_date 
-            FROM completion 
-            WHERE habit_id = ? 
-            ORDER BY completion_date ASC
-        ''', (habit_id,))
-        completion_dates = [row[0] for row in cursor.fetchall()]
-        conn.close()
-        return completion_dates
+    # Fetches the completion dates of the habit from the database, optionally only from start to end.
+    def get_completion_dates(habit_id, database=None, start=None, end=None):
+        return [completion_date for _, completion_date in Habit.iter_completions(habit_id, start, end,
+                                                                                 database=database)]
 
     @staticmethod
-    # Marks a habit as completed on a given date.
-    def mark_completed(habit_id, completion_date):
-        conn = sqlite3.connect('habits.db')
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO completion (habit_id, completion_date)
-            VALUES (?, ?)
-        ''', (habit_id, completion_date))
-        conn.commit()
-        conn.close()
+    # Fetches the completions of the habit as integer day ordinals, read directly from the index.
+    def get_completion_days(habit_id, database=None, start=None, end=None):
+        return [day for _, day in Habit.iter_completions(habit_id, start, end, as_days=True, database=database)]
 
     @staticmethod
-    # Calculates the longest streak based on completion data.
-    def calculate_streak(completion_dates):
-        if not completion_dates:
-            return 0
+    # Streams (habit_id, completion) pairs ordered by habit and date, as ISO dates or with as_days=True as day
+    # ordinals. habit_ids is one id, a list of ids or None for all habits; start and end (inclusive) are ISO dates,
+    # date objects or day ordinals. Every habit is read as one range of the (habit_id, completion_day) index,
+    # so the cost depends on the completions in the range and not on the whole history.
+    def iter_completions(habit_ids=None, start=None, end=None, as_days=False, database=None,
+                         batch_size=COLLECTION_BATCH_SIZE):
+        cursor = (database or get_database()).connection().cursor()
+        cursor.execute(*_completion_query("completion_day" if as_days else "completion_date", habit_ids, start, end))
+        return iter_rows(cursor, batch_size)
 
-        streak = 1
-        longest_streak = 1
+    @staticmethod
+    # Fetches the completion days of the habits from start to end as NumPy int64 arrays, one per habit id.
+    # Habits without completions in the range get an empty array if they were asked for by id.
+    def get_completion_arrays(habit_ids=None, start=None, end=None, database=None):
+        if not HAS_NUMPY:
+            raise ImportError("NumPy is required for completion arrays, install it with 'pip install numpy'.")
+        np = _load_numpy()
+        conn = (database or get_database()).connection()
+        rows = conn.execute(*_completion_query("completion_day", habit_ids, start, end)).fetchall()
 
-        # Convert dates to datetime objects
-        completion_dates = [datetime.strptime(date, "%Y-%m-%d") for date in completion_dates]
-        completion_dates.sort()
+        pairs = np.array(rows, dtype=np.int64).reshape(-1, 2)
+        arrays = {}
+        if habit_ids is not None:
+            arrays = {habit_id: np.empty(0, dtype=np.int64) for habit_id in _id_list(habit_ids)}
+        # Rows are ordered by habit, so every habit is one slice between two changes of the habit id.
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(pairs[:, 0])) + 1)) if len(pairs) else []
+        for first, days in zip(starts, np.split(pairs[:, 1], starts[1:])):
+            arrays[int(pairs[first, 0])] = days
+        return arrays
 
-        for i in range(1, len(completion_dates)):
-            if completion_dates[i] - completion_dates[i - 1] == timedelta(days=1):
-                streak += 1
-                longest_streak = max(longest_streak, streak)
-            else:
-                streak = 1
+    @staticmethod
+    # Marks a habit as completed on a given date (ISO string, date object or day ordinal),
+    # a completion that already exists is ignored.
+    def mark_completed(habit_id, completion_date, database=None):
+        with (database or get_database()).connection() as conn:
+            cursor = conn.cursor()
+            completion_date, completion_day = completion_values(completion_date)
+            cursor.execute(INSERT_COMPLETION_SQL, (habit_id, completion_date, completion_day))
+            if cursor.rowcount:
+                record_completion(conn, habit_id, completion_date)
 
-        return longest_streak
+    @staticmethod
+    # Calculates the longest streak based on completion data.
+    # Large histories are computed with the vectorized NumPy engine if NumPy is installed.
+    def calculate_streak(completion_dates, periodicity="daily"):
+        return summarize_dates(completion_dates, periodicity)[0]
 
-    # Calculates the longest streak for this habit using the database.
+    # Returns the longest streak of this habit in days or weeks from the streak summary.
     def get_longest_streak(self):
-        completion_dates = self.get_completion_dates(self.id)
-        return self.calculate_streak(completion_dates)
+        summary = get_streak_summary((self.database or get_database()).connection(), self.id)
+        return summary[2]
 
-    # Calculates the current streak for this habit.
+    # Returns the current streak of this habit in days or weeks from the streak summary.
+    # A streak is still current if the latest run reaches today or yesterday (this or last week).
     def get_current_streak(self):
-        completion_dates = self.get_completion_dates(self.id)
-        if not completion_dates:
-            return 0
+        return get_current_streak((self.database or get_database()).connection(), self.id, self.periodicity)
+
+# Read-only sequence of habits stored column by column instead of one object per habit.
+# Ids are kept in an integer array and periodicities as one byte per habit; repeated descriptions
+# and creation dates share a single string. Habit objects are only created when an item is accessed.
+class HabitCollection:
+    __slots__ = ("ids", "names", "descriptions", "_periodicity_codes", "_periodicities", "creation_dates", "database")
+
+    def __init__(self, database=None):
+        self.ids = array("q")
+        self.names = []
+        self.descriptions = []
+        self._periodicity_codes = bytearray()
+        self._periodicities = []
+        self.creation_dates = []
+        # Pool the habits were read from, passed on to the Habit objects.
+        self.database = database
+
+    @staticmethod
+    # Creates a collection from (id, name, description, periodicity, creation_date) rows.
+    def from_rows(rows, database=None):
+        collection = HabitCollection(database)
+        collection.extend(rows)
+        return collection
+
+    @staticmethod
+    # Creates a collection from an executed cursor, fetching the rows in batches.
+    def from_cursor(cursor, batch_size=COLLECTION_BATCH_SIZE, database=None):
+        collection = HabitCollection(database)
+        collection.extend(iter_rows(cursor, batch_size))
+        return collection
+
+    # Appends (id, name, description, periodicity, creation_date) rows to the columns.
+    def extend(self, rows):
+        shared = {}
+        for habit_id, name, description, periodicity, creation_date in rows:
+            if periodicity not in self._periodicities:
+                self._periodicities.append(periodicity)
+            self.ids.append(habit_id)
+            self.names.append(name)
+            self.descriptions.append(shared.setdefault(description, description))
+            self._periodicity_codes.append(self._periodicities.index(periodicity))
+            self.creation_dates.append(shared.setdefault(creation_date, creation_date))
+
+    # Returns the periodicity of the habit at the given position.
+    def periodicity(self, index):
+        return self._periodicities[self._periodicity_codes[index]]
+
+    # Returns the habit at the given position as a database row.
+    def row(self, index):
+        return (self.ids[index], self.names[index], self.descriptions[index], self.periodicity(index),
+                self.creation_dates[index])
 
-        # Convert dates to datetime objects
-        completion_dates = [datetime.strptime(date, "%Y-%m-%d") for date in completion_dates]
-        completion_dates.sort()
+    def __len__(self):
+        return len(self.ids)
 
-        streak = 1
-        today = datetime.now().date()
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return HabitCollection.from_rows((self.row(i) for i in range(*index.indices(len(self)))), self.database)
+        return Habit.from_database(self.row(index), self.database)
 
-        for i in range(len(completion_dates) - 1, 0, -1):
-            if (today - completion_dates[i].date()).days > 1:
-                break
-            streak += 1
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
 
-        return streak
+    def __repr__(self):
+        return f"HabitCollection({len(self)} habits)"
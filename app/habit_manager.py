@@ -1,35 +1,108 @@
-import sqlite3
-from datetime import datetime, timedelta
-from app.habit import Habit
-
+import contextlib
+import functools
+import inspect
+import json
+from datetime import datetime
+from itertools import islice
+from app.habit import Habit, HabitCollection
+from app.bitmaps import CompletionBitmap, last_completion_date, load_bitmap, store_bitmap
+from app.cache import get_habit_cache
+from app.database import bulk_writes, get_database, iter_rows, retry_on_locked, INSERT_COMPLETION_SQL
+from app.dates import completion_values, day_to_date, to_day, week_bounds, DAY_DATE_SQL
+from app.streaks import record_completion, recompute_streak
+from app.tenants import get_shard_map
+
+# Number of completions written per transaction by mark_habits_completed_bulk.
+BULK_CHUNK_SIZE = 50000
+
+# Number of rows fetched at once by the iterator methods.
+ITER_BATCH_SIZE = 1000
+
+# Decorator holding a lease on the tenant's database pool while a method runs, or while a generator method
+# is iterated, so the shard map does not close the pool under the call.
+def _leased(func):
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def generator_wrapper(self, *args, **kwargs):
+            with self._lease():
+                yield from func(self, *args, **kwargs)
+        return generator_wrapper
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        with self._lease():
+            return func(self, *args, **kwargs)
+    return wrapper
+
+# Manages the habits of one database: the shared pool, a given pool or the database of a tenant.
+# With a tenant id the database is looked up in the shard map (the shared one unless one is passed in)
+# on every call and leased for its duration, so the manager keeps working after the tenant's pool was evicted
+# and the pool is never evicted while a call uses it.
 class HabitManager:
-    def __init__(self):
-        pass
+    def __init__(self, database=None, tenant=None, shard_map=None):
+        if database is not None and tenant is not None:
+            raise ValueError("Pass either a database or a tenant, not both.")
+        self._database = database
+        self.tenant = tenant
+        self._shard_map = shard_map
+
+    # Returns the database pool used by this manager (the shared pool unless a database or tenant was passed in).
+    @property
+    def database(self):
+        if self.tenant is not None:
+            return (self._shard_map or get_shard_map()).database(self.tenant)
+        return self._database or get_database()
+
+    # Returns a context manager leasing the tenant's pool from the shard map, a no-op without a tenant.
+    def _lease(self):
+        if self.tenant is None:
+            return contextlib.nullcontext()
+        return (self._shard_map or get_shard_map()).lease(self.tenant)
+
+    # Returns the habit cache of the database after checking it against the connection.
+    def _cache(self, conn):
+        cache = get_habit_cache(self.database)
+        cache.validate(conn)
+        return cache
+
+    # Invalidates the cache entries touched by a write on the connection and accepts the write.
+    def _after_write(self, conn, habit_id=None, name=None):
+        cache = get_habit_cache(self.database)
+        if habit_id is not None or name is not None:
+            cache.invalidate(habit_id=habit_id, name=name)
+        cache.sync(conn)
 
     # Creates a new habit and saves it to the database.
+    @_leased
+    @retry_on_locked
     def create_habit(self, name, description, periodicity):
         creation_date = datetime.now().strftime("%Y-%m-%d")
 
-        with sqlite3.connect('habits.db') as conn:
+        with self.database.connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 INSERT INTO habits (name, description, periodicity, creation_date)
                 VALUES (?, ?, ?, ?)
             ''', (name, description, periodicity, creation_date))
             habit_id = cursor.lastrowid
+            # Stores the empty bitmap, so status checks find it instead of building it on every read.
+            load_bitmap(conn, habit_id)
+        self._after_write(conn, habit_id=habit_id, name=name)
 
         print(f"Habit '{name}' created successfully.")
-        return Habit(habit_id, name, description, periodicity, creation_date)
+        return Habit(habit_id, name, description, periodicity, creation_date, self.database)
 
     # Edit an existing habit in the database.
+    @_leased
+    @retry_on_locked
     def edit_habit(self, habit_name, new_name=None, new_description=None, new_periodicity=None):
-        with sqlite3.connect('habits.db') as conn:
+        habit = self.get_habit_by_name(habit_name)
+        if not habit:
+            raise ValueError(f"Habit with name '{habit_name}' not found.")
+        habit_id = habit.id
+
+        with self.database.connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT id FROM habits WHERE name = ?", (habit_name,))
-            result = cursor.fetchone()
-            if not result:
-                raise ValueError(f"Habit with name '{habit_name}' not found.")
-            habit_id = result[0]
 
             if new_name:
                 cursor.execute("UPDATE habits SET name = ? WHERE id = ?", (new_name, habit_id))
@@ -37,170 +110,380 @@ class HabitManager:
                 cursor.execute("UPDATE habits SET description = ? WHERE id = ?", (new_description, habit_id))
             if new_periodicity:
                 cursor.execute("UPDATE habits SET periodicity = ? WHERE id = ?", (new_periodicity, habit_id))
+                # Streaks are counted in periods, so they have to be recomputed for the new periodicity.
+                recompute_streak(conn, habit_id)
+        self._after_write(conn, habit_id=habit_id, name=habit_name)
 
         print(f"Habit '{habit_name}' updated successfully.")
 
     # Deletes a habit by name from the database.
+    @_leased
+    @retry_on_locked
     def delete_habit(self, habit_name):
-        with sqlite3.connect('habits.db') as conn:
+        with self.database.connection() as conn:
             cursor = conn.cursor()
+            # The foreign keys cascade to the completions, the streak summary and the bitmap of the habit.
             cursor.execute("DELETE FROM habits WHERE name = ?", (habit_name,))
             if cursor.rowcount == 0:
                 raise ValueError(f"Habit with name '{habit_name}' not found.")
+        self._after_write(conn, name=habit_name)
 
         print(f"Habit '{habit_name}' deleted successfully.")
 
-    # Returns all habits from the database.
+    # Returns all habits from the database as a HabitCollection.
+    @_leased
     def list_habits(self):
-        with sqlite3.connect('habits.db') as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM habits")
-            habits = cursor.fetchall()
-
-        return [Habit.from_database(row) for row in habits]
+        conn = self.database.connection()
+        cache = self._cache(conn)
+        habits = cache.get_list("all")
+        if habits is not None:
+            return habits
 
-    # Returns all habits with description and last completion date.
-    def list_habits_with_details(self):
-        conn = sqlite3.connect('habits.db')
         cursor = conn.cursor()
+        cursor.execute("SELECT id, name, description, periodicity, creation_date FROM habits")
+        habits = HabitCollection.from_cursor(cursor, database=self.database)
+        cache.put_list("all", habits)
+        return habits
 
-        cursor.execute('''
-            SELECT h.id, h.name, h.description, h.periodicity, 
-                   COALESCE(MAX(c.completion_date), 'Never') AS last_completed
+    # Returns a habit by its ID or None if it does not exist.
+    @_leased
+    def get_habit(self, habit_id):
+        conn = self.database.connection()
+        cache = self._cache(conn)
+        habit = cache.get(habit_id)
+        if habit is None:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM habits WHERE id = ?", (habit_id,))
+            result = cursor.fetchone()
+            if result:
+                habit = Habit.from_database(result, self.database)
+                cache.put(habit)
+        return habit
+
+    # Returns a habit by its name or None if it does not exist.
+    @_leased
+    def get_habit_by_name(self, habit_name):
+        conn = self.database.connection()
+        cache = self._cache(conn)
+        habit = cache.get_by_name(habit_name)
+        if habit is None:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM habits WHERE name = ?", (habit_name,))
+            result = cursor.fetchone()
+            if result:
+                habit = Habit.from_database(result, self.database)
+                cache.put(habit)
+        return habit
+
+    # Streams the habits as Habit objects, ordered by "id" or "name" and optionally only one periodicity.
+    # limit and after page through the result: pass the id or name of the last habit to get the next page.
+    # Rows are fetched in batches, so memory use does not depend on the number of habits.
+    @_leased
+    def iter_habits(self, periodicity=None, order_by="id", limit=None, after=None, batch_size=ITER_BATCH_SIZE):
+        if order_by not in ("id", "name"):
+            raise ValueError(f"Unknown order '{order_by}', expected 'id' or 'name'.")
+
+        conditions = []
+        if periodicity is not None:
+            conditions.append("periodicity = :periodicity")
+        if after is not None:
+            conditions.append(f"{order_by} > :after")
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        database = self.database
+        cursor = database.connection().cursor()
+        cursor.execute(f'''
+            SELECT id, name, description, periodicity, creation_date
+            FROM habits
+            {where}
+            ORDER BY {order_by}
+            LIMIT :limit
+        ''', {"periodicity": periodicity, "after": after, "limit": -1 if limit is None else limit})
+
+        for row in iter_rows(cursor, batch_size):
+            yield Habit.from_database(row, database)
+
+    # Returns all habits with description and last completion date as a list, see iter_habits_with_details.
+    @_leased
+    def list_habits_with_details(self):
+        return list(self.iter_habits_with_details())
+
+    # Streams all habits with description and last completion date as
+    # (habit_id, name, description, periodicity, last_completed) rows ordered by name.
+    # limit and after_name page through the result: pass the name of the last row to get the next page.
+    @_leased
+    def iter_habits_with_details(self, limit=None, after_name=None, batch_size=ITER_BATCH_SIZE):
+        after_condition = "WHERE h.name > :after_name" if after_name is not None else ""
+
+        cursor = self.database.connection().cursor()
+        cursor.execute(f'''
+            SELECT h.id, h.name, h.description, h.periodicity,
+                   COALESCE({DAY_DATE_SQL.format('(SELECT MAX(completion_day) FROM completion WHERE habit_id = h.id)')},
+                            'Never') AS last_completed
             FROM habits h
-            LEFT JOIN completion c ON h.id = c.habit_id
-            GROUP BY h.id, h.name, h.description, h.periodicity
+            {after_condition}
             ORDER BY h.name
-        ''')
-        habits = cursor.fetchall()
-        conn.close()
+            LIMIT :limit
+        ''', {"after_name": after_name, "limit": -1 if limit is None else limit})
 
-        return habits
+        yield from iter_rows(cursor, batch_size)
 
     # Marks a habit as completed on a given date in the database.
+    # Returns False if the habit was already marked as completed on that date, which is a bit test in its bitmap.
+    @_leased
+    @retry_on_locked
     def mark_habit_completed(self, habit_id, completion_date):
-        with sqlite3.connect('habits.db') as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT 1 FROM completion WHERE habit_id = ? AND completion_date = ?
-            ''', (habit_id, completion_date))
-            if cursor.fetchone():
+        # Raises a ValueError for dates that are not in YYYY-MM-DD format.
+        completion_date, completion_day = completion_values(completion_date)
+
+        with self.database.connection() as conn:
+            # Takes the write lock first, so no other writer changes the bitmap between the check and the update.
+            conn.execute("BEGIN IMMEDIATE")
+            bitmap = load_bitmap(conn, habit_id)
+            duplicate = bitmap is not None and bitmap.has_day(completion_day)
+            if not duplicate:
+                cursor = conn.execute(INSERT_COMPLETION_SQL, (habit_id, completion_date, completion_day))
+                duplicate = cursor.rowcount == 0
+            if duplicate:
                 print(f"Habit with ID {habit_id} is already marked as completed on {completion_date}.")
-                return
-
-            cursor.execute('''
-                INSERT INTO completion (habit_id, completion_date)
-                VALUES (?, ?)
-            ''', (habit_id, completion_date))
-
-        # print(f"Habit with ID {habit_id} marked as completed on {completion_date}.")
+                return False
+            if bitmap is not None:
+                store_bitmap(conn, habit_id, bitmap.with_day(completion_day))
+            record_completion(conn, habit_id, completion_date)
+        self._after_write(conn)
+        return True
+
+    # Marks many habits as completed from an iterable of (habit_id, completion_date) pairs.
+    # The pairs are streamed and written in transactions of chunk_size rows, completions that
+    # already exist, completions of unknown habits and invalid dates are skipped. Returns the number of inserted and skipped completions.
+    # With commit=False the chunks are written in the open transaction of the caller instead, which commits or rolls
+    # back the whole bulk write, e.g. an import that creates the habits of the completions in the same transaction.
+    @_leased
+    def mark_habits_completed_bulk(self, completions, chunk_size=BULK_CHUNK_SIZE, commit=True):
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1.")
+
+        conn = self.database.connection()
+        if not commit and not conn.in_transaction:
+            raise ValueError("commit=False needs an open transaction on the connection.")
+        completions = iter(completions)
+        inserted = 0
+        total = 0
+        touched_habit_ids = set()
+        known_habit_ids = set()
+
+        while True:
+            batch = list(islice(completions, chunk_size))
+            if not batch:
+                break
+            total += len(batch)
+
+            chunk = []
+            for habit_id, completion_date in batch:
+                try:
+                    chunk.append((habit_id, *completion_values(completion_date)))
+                except ValueError:
+                    continue
+            # Completions of unknown habits are skipped, the foreign key would reject the whole chunk.
+            unknown_habit_ids = {row[0] for row in chunk} - known_habit_ids
+            if unknown_habit_ids:
+                known_habit_ids |= self._existing_habit_ids(conn, unknown_habit_ids)
+                chunk = [row for row in chunk if row[0] in known_habit_ids]
+            if not chunk:
+                continue
+
+            new_habit_ids = {row[0] for row in chunk} - touched_habit_ids
+            if commit:
+                inserted += self._write_completion_chunk(conn, chunk, new_habit_ids)
+            else:
+                inserted += self._insert_completion_chunk(conn, chunk, new_habit_ids)
+            touched_habit_ids |= new_habit_ids
+
+        if commit:
+            self._write_streaks(conn, touched_habit_ids)
+        else:
+            self._recompute_streaks(conn, touched_habit_ids)
+        self._after_write(conn)
+
+        return {"inserted": inserted, "skipped": total - inserted}
+
+    # Returns the ids among habit_ids that belong to existing habits.
+    def _existing_habit_ids(self, conn, habit_ids):
+        cursor = conn.execute("SELECT id FROM habits WHERE id IN (SELECT value FROM json_each(?))",
+                              (json.dumps([habit_id for habit_id in habit_ids if isinstance(habit_id, int)]),))
+        return {row[0] for row in cursor.fetchall()}
+
+    # Inserts one chunk of a bulk import in the transaction of the caller and returns the number of inserted
+    # completions. The rollups and bitmaps are updated once for the whole chunk instead of by triggers per row
+    # (see bulk_writes). Drops the streak summaries of the newly affected habits in the same transaction,
+    # so they are never stale even if the import is interrupted.
+    def _insert_completion_chunk(self, conn, chunk, new_habit_ids):
+        with bulk_writes(conn):
+            cursor = conn.executemany(INSERT_COMPLETION_SQL, chunk)
+            conn.executemany("DELETE FROM habit_streaks WHERE habit_id = ?", ((habit_id,) for habit_id in new_habit_ids))
+        return cursor.rowcount
+
+    # Writes one chunk of a bulk import in its own transaction, see _insert_completion_chunk.
+    @retry_on_locked
+    def _write_completion_chunk(self, conn, chunk, new_habit_ids):
+        with conn:
+            return self._insert_completion_chunk(conn, chunk, new_habit_ids)
+
+    # Recomputes the streak summaries of the given habits in the transaction of the caller.
+    def _recompute_streaks(self, conn, habit_ids):
+        for habit_id in habit_ids:
+            recompute_streak(conn, habit_id)
+
+    # Recomputes the streak summaries of the given habits in one transaction.
+    @retry_on_locked
+    def _write_streaks(self, conn, habit_ids):
+        with conn:
+            self._recompute_streaks(conn, habit_ids)
+
+    # Removes the completion of a habit on a given date from the database.
+    @_leased
+    @retry_on_locked
+    def unmark_habit_completed(self, habit_id, completion_date):
+        completion_day = to_day(completion_date)
+
+        with self.database.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            bitmap = load_bitmap(conn, habit_id)
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM completion WHERE habit_id = ? AND completion_day = ?", (habit_id, completion_day))
+            if cursor.rowcount == 0:
+                raise ValueError(f"Habit with ID {habit_id} is not marked as completed on {completion_date}.")
+            if bitmap is not None:
+                store_bitmap(conn, habit_id, bitmap.without_day(completion_day))
+            # Removing a completion can split a run, so the summary is recomputed from the history.
+            recompute_streak(conn, habit_id)
+        self._after_write(conn)
 
     # Checks the status of all habits for a specific date with details.
+    @_leased
     def check_habits_status(self, date):
-        with sqlite3.connect('habits.db') as conn:
-            cursor = conn.cursor()
-
-            # Retrieve all habits with their periodicity and last completion date
-            cursor.execute('''
-                SELECT h.id, h.name, h.periodicity, 
-                       COALESCE(MAX(c.completion_date), 'Never') AS last_completed
-                FROM habits h
-                LEFT JOIN completion c ON h.id = c.habit_id
-                GROUP BY h.id, h.name, h.periodicity
-            ''')
-            habits = cursor.fetchall()
-
-            completed = []
-            pending = []
-
-            current_date = datetime.strptime(date, "%Y-%m-%d")
-
-            for habit_id, name, periodicity, last_completed in habits:
-                if last_completed != 'Never':
-                    last_completion_date = datetime.strptime(last_completed, "%Y-%m-%d")
-                else:
-                    last_completion_date = None
-
-                # Check if the habit is completed or pending
-                if periodicity == "daily":
-                    if last_completion_date and last_completion_date.date() == current_date.date():
-                        completed.append((name, periodicity, last_completed))
-                    else:
-                        pending.append((name, periodicity, last_completed))
-                elif periodicity == "weekly":
-                    # Check if the last completion is in the current week
-                    current_week_start = current_date - timedelta(days=current_date.weekday())  # Start of the week
-                    current_week_end = current_week_start + timedelta(days=6)  # End of the week
-
-                    if last_completion_date and current_week_start.date() <= last_completion_date.date() <= current_week_end.date():
-                        completed.append((name, periodicity, last_completed))
-                    else:
-                        pending.append((name, periodicity, last_completed))
-
+        completed = []
+        pending = []
+        # One pass over the habits sorts every habit into its list.
+        for _, name, periodicity, last_completion, is_completed in self._iter_status(date):
+            (completed if is_completed else pending).append((name, periodicity, last_completion or 'Never'))
         return completed, pending
 
-    # Loads all completions of a habit from the database.
-    def get_habit_completions(self, habit_id):
-        with sqlite3.connect('habits.db') as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT completion_date FROM completion
-                WHERE habit_id = ?
-                ORDER BY completion_date ASC
-            ''', (habit_id,))
-            completions = cursor.fetchall()
-
-        return [completion[0] for completion in completions]
+    # Returns the habits with the given status ("completed" or "pending") on a date as a list,
+    # see iter_habits_by_status.
+    @_leased
+    def get_habits_by_status(self, date, status, limit=None, after_name=None):
+        return list(self.iter_habits_by_status(date, status, limit=limit, after_name=after_name))
+
+    # Streams the habits with the given status ("completed" or "pending") on a date as
+    # (habit_id, name, periodicity, last_completion) rows ordered by name.
+    # A daily habit is completed if it has a completion on the date, a weekly habit if it has one
+    # in the week (Monday to Sunday) of the date. Each check is a range lookup on the completion index,
+    # so with a limit SQLite stops after the requested number of habits.
+    # limit and after_name page through the result: pass the name of the last row to get the next page.
+    @_leased
+    def iter_habits_by_status(self, date, status, limit=None, after_name=None, batch_size=ITER_BATCH_SIZE):
+        if status not in ("completed", "pending"):
+            raise ValueError(f"Unknown status '{status}', expected 'completed' or 'pending'.")
+
+        current_day = to_day(datetime.strptime(date, "%Y-%m-%d").date())
+        week_start, week_end = week_bounds(current_day)
+
+        # Keyset pagination: the name condition lets SQLite seek into the name index instead of skipping rows.
+        after_condition = "AND h.name > :after_name" if after_name is not None else ""
+
+        cursor = self.database.connection().cursor()
+        cursor.execute(f'''
+            SELECT h.id, h.name, h.periodicity,
+                   (SELECT MAX(completion_day) FROM completion WHERE habit_id = h.id) AS last_day
+            FROM habits h
+            WHERE EXISTS (
+                SELECT 1 FROM completion c
+                WHERE c.habit_id = h.id
+                  AND c.completion_day BETWEEN (CASE h.periodicity WHEN 'weekly' THEN :week_start ELSE :day END)
+                                           AND (CASE h.periodicity WHEN 'weekly' THEN :week_end ELSE :day END)
+            ) = :completed {after_condition}
+            ORDER BY h.name
+            LIMIT :limit
+        ''', {"day": current_day, "week_start": week_start, "week_end": week_end,
+              "completed": status == "completed", "after_name": after_name,
+              "limit": -1 if limit is None else limit})
+
+        for habit_id, name, periodicity, last_day in iter_rows(cursor, batch_size):
+            yield habit_id, name, periodicity, day_to_date(last_day) if last_day is not None else None
+
+    # Streams all habits ordered by name as (habit_id, name, periodicity, last_completion, completed) rows.
+    # Both checks and the last completion are read from the bitmap of the habit, so one row per habit is
+    # read instead of probing the completion index. Habits whose bitmap is missing (e.g. after a write by
+    # another program) fall back to the range lookups of iter_habits_by_status, which SQLite only runs for them,
+    # so reading the status never writes to the database or reads a whole history.
+    def _iter_status(self, date, batch_size=ITER_BATCH_SIZE):
+        current_day = to_day(datetime.strptime(date, "%Y-%m-%d").date())
+        week_start, week_end = week_bounds(current_day)
+
+        cursor = self.database.connection().cursor()
+        cursor.execute('''
+            SELECT h.id, h.name, h.periodicity, b.base_day, b.days, b.weeks,
+                   CASE WHEN b.habit_id IS NULL THEN
+                       (SELECT MAX(completion_day) FROM completion WHERE habit_id = h.id)
+                   END AS last_day,
+                   CASE WHEN b.habit_id IS NULL THEN EXISTS (
+                       SELECT 1 FROM completion c
+                       WHERE c.habit_id = h.id
+                         AND c.completion_day BETWEEN (CASE h.periodicity WHEN 'weekly' THEN :week_start ELSE :day END)
+                                                  AND (CASE h.periodicity WHEN 'weekly' THEN :week_end ELSE :day END)
+                   ) END AS completed
+            FROM habits h
+            LEFT JOIN completion_bitmap b ON b.habit_id = h.id
+            ORDER BY h.name
+        ''', {"day": current_day, "week_start": week_start, "week_end": week_end})
+
+        for habit_id, name, periodicity, base_day, days, weeks, last_day, completed in iter_rows(cursor, batch_size):
+            if base_day is not None:
+                bitmap = CompletionBitmap(base_day, days, weeks)
+                yield habit_id, name, periodicity, last_completion_date(bitmap), bitmap.has_period(current_day, periodicity)
+            else:
+                yield habit_id, name, periodicity, day_to_date(last_day) if last_day is not None else None, bool(completed)
+
+    # Loads the completions of a habit from the database, all of them or only from start to end (inclusive;
+    # ISO dates, date objects or day ordinals). With as_days=True the completions are returned as integer day
+    # ordinals instead of date strings, with as_array=True as a NumPy array of day ordinals.
+    @_leased
+    def get_habit_completions(self, habit_id, as_days=False, start=None, end=None, as_array=False):
+        if as_array:
+            return Habit.get_completion_arrays(habit_id, start, end, self.database)[habit_id]
+        if as_days:
+            return Habit.get_completion_days(habit_id, self.database, start, end)
+        return Habit.get_completion_dates(habit_id, self.database, start, end)
+
+    # Loads the completions of several habits (a list of ids, None for all) from start to end as a dict
+    # {habit_id: completions}, with the same formats as get_habit_completions. Habits asked for by id are
+    # always in the dict, with an empty list if they have no completions in the range.
+    @_leased
+    def get_completions(self, habit_ids=None, start=None, end=None, as_days=False, as_array=False):
+        if as_array:
+            return Habit.get_completion_arrays(habit_ids, start, end, self.database)
+        completions = {} if habit_ids is None else {habit_id: [] for habit_id in habit_ids}
+        for habit_id, completion in self.iter_completions(habit_ids, start, end, as_days):
+            completions.setdefault(habit_id, []).append(completion)
+        return completions
+
+    # Streams (habit_id, completion) pairs of several habits from start to end, ordered by habit and date.
+    # Rows are fetched in batches, so memory use does not depend on the length of the history.
+    @_leased
+    def iter_completions(self, habit_ids=None, start=None, end=None, as_days=False, batch_size=ITER_BATCH_SIZE):
+        yield from Habit.iter_completions(habit_ids, start, end, as_days, self.database, batch_size)
 
     # Returns the ID of a habit by its name.
+    @_leased
     def get_habit_id_by_name(self, habit_name):
-        with sqlite3.connect('habits.db') as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT id FROM habits WHERE name = ?", (habit_name,))
-            result = cursor.fetchone()
-
-        if result:
-            return result[0]
+        habit = self.get_habit_by_name(habit_name)
+        if habit:
+            return habit.id
         else:
             raise ValueError(f"No habit found with name '{habit_name}'.")
 
     # Fetches all habits that are pending for the specified date, considering their periodicity.
-    def get_pending_habits(self, date):
-        with sqlite3.connect('habits.db') as conn:
-            cursor = conn.cursor()
-
-            # Retrieve all habits with their periodicity
-            cursor.execute('''
-                SELECT h.id, h.name, h.periodicity, 
-                       (SELECT MAX(completion_date) 
-                        FROM completion 
-                        WHERE habit_id = h.id) AS last_completion
-                FROM habits h
-            ''')
-            habits = cursor.fetchall()
-
-            pending = []
-            current_date = datetime.strptime(date, "%Y-%m-%d")
-
-            for habit_id, name, periodicity, last_completion in habits:
-                if last_completion:
-                    last_completion_date = datetime.strptime(last_completion, "%Y-%m-%d")
-                else:
-                    last_completion_date = None
-
-                # Determine if the habit is pending based on its periodicity
-                if periodicity == "daily":
-                    if not last_completion_date or last_completion_date.date() < current_date.date():
-                        pending.append((habit_id, name, periodicity, last_completion))
-                elif periodicity == "weekly":
-                    # Check if the last completion is in the current week
-                    current_week_start = current_date - timedelta(days=current_date.weekday())  # Start of the week
-                    current_week_end = current_week_start + timedelta(days=6)  # End of the week
-
-                    if not last_completion_date or not (
-                            current_week_start.date() <= last_completion_date.date() <= current_week_end.date()):
-                        pending.append((habit_id, name, periodicity, last_completion))
-
-        return pending
-
-
+    @_leased
+    def get_pending_habits(self, date, limit=None, after_name=None):
+        return self.get_habits_by_status(date, "pending", limit=limit, after_name=after_name)
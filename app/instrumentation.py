@@ -0,0 +1,257 @@
+# Optional instrumentation of the hot paths: call timings of the public methods of HabitManager and Habit
+# and of the functions in app.analytics, plus the number and duration of every SQL statement.
+# Nothing is wrapped while it is disabled, so the instrumented code runs without any overhead.
+# Enable it with enable() or by setting the HABITS_INSTRUMENT environment variable to 1 for main.py.
+import functools
+import inspect
+import re
+import sqlite3
+import threading
+import time
+from app import analytics
+from app import database as database_module
+from app.habit import Habit
+from app.habit_manager import HabitManager
+
+# Upper bounds in milliseconds of the histogram buckets, the last bucket takes all longer durations.
+BUCKET_BOUNDS_MS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 10000)
+
+# SQL statements are grouped by their first characters with whitespace collapsed.
+SQL_KEY_LENGTH = 120
+
+# Duration histogram of one instrumented call or SQL statement.
+class Histogram:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.buckets = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+
+    # Adds a duration in seconds.
+    def record(self, seconds):
+        milliseconds = seconds * 1000
+        self.count += 1
+        self.total += milliseconds
+        self.min = milliseconds if self.min is None else min(self.min, milliseconds)
+        self.max = milliseconds if self.max is None else max(self.max, milliseconds)
+        index = 0
+        while index < len(BUCKET_BOUNDS_MS) and milliseconds > BUCKET_BOUNDS_MS[index]:
+            index += 1
+        self.buckets[index] += 1
+
+    # Returns the upper bound of the bucket containing the given percentile (0 to 100) in milliseconds,
+    # at most the longest recorded duration.
+    def percentile(self, percent):
+        if not self.count:
+            return 0.0
+        rank = self.count * percent / 100
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank and count:
+                return min(BUCKET_BOUNDS_MS[index], self.max) if index < len(BUCKET_BOUNDS_MS) else self.max
+        return self.max
+
+    # Returns the statistics as a dictionary.
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "total_ms": self.total,
+            "mean_ms": self.total / self.count if self.count else 0.0,
+            "min_ms": self.min or 0.0,
+            "max_ms": self.max or 0.0,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "buckets": dict(zip([f"<={bound}" for bound in BUCKET_BOUNDS_MS] + ["more"], self.buckets)),
+        }
+
+_lock = threading.Lock()
+_histograms = {}
+_statement_counts = {}
+_originals = []
+_enabled = False
+
+# Adds a duration to the histogram of a name.
+def record(name, seconds):
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.record(seconds)
+
+# Returns the key of an SQL statement: the statement with collapsed whitespace, shortened.
+def sql_key(sql):
+    return "sql: " + re.sub(r"\s+", " ", sql).strip()[:SQL_KEY_LENGTH]
+
+# Adds executions of an SQL statement to its count.
+def _count(key, executions=1):
+    with _lock:
+        _statement_counts[key] = _statement_counts.get(key, 0) + executions
+
+# Statements are counted by the cursors, keyed by their SQL before SQLite fills in the parameters.
+# The trace callback only counts what SQLite runs outside of them, i.e. the COMMIT and ROLLBACK statements
+# of the implicit transactions; statements of triggers and the implicit BEGIN run inside a cursor call.
+_cursor_calls = threading.local()
+
+def _trace(statement):
+    if not getattr(_cursor_calls, "depth", 0):
+        _count(sql_key(statement))
+
+# Runs a cursor method with the trace callback muted and records its duration under key.
+def _run_statement(key, method, *args):
+    _cursor_calls.depth = getattr(_cursor_calls, "depth", 0) + 1
+    start = time.perf_counter()
+    try:
+        return method(*args)
+    finally:
+        record(key, time.perf_counter() - start)
+        _cursor_calls.depth -= 1
+
+# Cursor that counts and records the duration of every statement it executes.
+# executemany counts one execution per parameter set.
+class InstrumentedCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        key = sql_key(sql)
+        _count(key)
+        return _run_statement(key, super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        key = sql_key(sql)
+        executions = 0
+
+        def counted():
+            nonlocal executions
+            for parameters in seq_of_parameters:
+                executions += 1
+                yield parameters
+        try:
+            return _run_statement(key, super().executemany, sql, counted())
+        finally:
+            _count(key, executions)
+
+# Connection whose cursors record their statements. Connection.execute calls the execute of its cursor
+# in C without going through InstrumentedCursor, so the shortcuts are routed through cursor() here.
+class InstrumentedConnection(sqlite3.Connection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.set_trace_callback(_trace)
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+# Returns a wrapper of func recording the duration of every call under name.
+# Generator functions are timed over the whole iteration, not only until the generator is created.
+def timed(name, func):
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def generator_wrapper(*args, **kwargs):
+            generator = func(*args, **kwargs)
+            elapsed = 0.0
+            try:
+                while True:
+                    start = time.perf_counter()
+                    try:
+                        item = next(generator)
+                    except StopIteration:
+                        return
+                    finally:
+                        elapsed += time.perf_counter() - start
+                    yield item
+            finally:
+                generator.close()
+                record(name, elapsed)
+        return generator_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            record(name, time.perf_counter() - start)
+    return wrapper
+
+# Replaces an attribute and remembers the original for disable().
+def _patch(owner, attribute, value):
+    _originals.append((owner, attribute, owner.__dict__[attribute]))
+    setattr(owner, attribute, value)
+
+# Wraps the public methods of a class, static methods included.
+def _instrument_class(cls):
+    for attribute, value in list(cls.__dict__.items()):
+        if attribute.startswith("_"):
+            continue
+        name = f"{cls.__name__}.{attribute}"
+        if isinstance(value, staticmethod):
+            _patch(cls, attribute, staticmethod(timed(name, value.__func__)))
+        elif inspect.isfunction(value):
+            _patch(cls, attribute, timed(name, value))
+
+# Wraps the public functions defined in a module.
+def _instrument_module(module, prefix):
+    for attribute, value in list(vars(module).items()):
+        if not attribute.startswith("_") and inspect.isfunction(value) and value.__module__ == module.__name__:
+            _patch(module, attribute, timed(f"{prefix}.{attribute}", value))
+
+# Turns the instrumentation on. Connections of the given pool (the shared pool by default) are closed,
+# so they are reopened as instrumented connections; call it at startup before other threads use the pool.
+# Functions imported with "from app.analytics import ..." before enable() keep their uninstrumented version.
+def enable(database=None):
+    global _enabled
+    with _lock:
+        if _enabled:
+            return
+        _enabled = True
+    _instrument_class(HabitManager)
+    _instrument_class(Habit)
+    _instrument_module(analytics, "analytics")
+    database_module.CONNECTION_FACTORY = InstrumentedConnection
+    (database or database_module.get_database()).close()
+
+# Turns the instrumentation off and restores the original functions and connections.
+def disable(database=None):
+    global _enabled
+    with _lock:
+        if not _enabled:
+            return
+        _enabled = False
+    while _originals:
+        owner, attribute, value = _originals.pop()
+        setattr(owner, attribute, value)
+    database_module.CONNECTION_FACTORY = sqlite3.Connection
+    (database or database_module.get_database()).close()
+
+# Returns True if the instrumentation is enabled.
+def is_enabled():
+    return _enabled
+
+# Removes all recorded timings and statement counts.
+def reset():
+    with _lock:
+        _histograms.clear()
+        _statement_counts.clear()
+
+# Returns the recorded histograms by name and the number of executed statements by SQL key.
+def get_stats():
+    with _lock:
+        return {
+            "timings": {name: histogram.to_dict() for name, histogram in _histograms.items()},
+            "statements": dict(_statement_counts),
+        }
+
+# Returns the recorded timings as text lines, the names with the largest total time first.
+def format_stats(limit=30):
+    timings = get_stats()["timings"]
+    lines = [f"{'name':<70} {'count':>8} {'total ms':>10} {'mean ms':>9} {'p95 ms':>8} {'max ms':>9}"]
+    for name, stats in sorted(timings.items(), key=lambda item: item[1]["total_ms"], reverse=True)[:limit]:
+        lines.append(f"{name[:70]:<70} {stats['count']:>8} {stats['total_ms']:>10.2f} {stats['mean_ms']:>9.3f} "
+                     f"{stats['p95_ms']:>8.3f} {stats['max_ms']:>9.3f}")
+    return lines
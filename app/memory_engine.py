@@ -0,0 +1,262 @@
+# In-memory engine: the whole database is loaded into an in-memory SQLite database, so HabitManager and
+# app.analytics read and write without disk I/O, and the changes are persisted behind their back.
+# - Triggers record every change of the journaled tables in the memory_journal table.
+# - A background thread appends these changes to a journal file next to the database file (write-behind)
+#   every flush_interval seconds and writes a snapshot of the whole database to the database file with the
+#   SQLite backup API every snapshot_interval seconds, after which the journal starts over.
+# - On start the last snapshot is loaded and the journal is replayed on top of it, so after a crash only the
+#   changes of the last flush_interval are lost. A torn last line of the journal is ignored.
+# The rollup tables are not journaled, their triggers rebuild them while the journal is replayed.
+# Enable it for the shared pool with HABITS_DB_MEMORY=1 or configure_database(path, memory=True).
+import atexit
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+from app.database import Database, DB_FILE, initialize_database, get_schema_version, retry_on_locked, SCHEMA_VERSION
+
+# Tables whose changes are written to the journal.
+JOURNAL_TABLES = ("habits", "completion", "habit_streaks", "habit_events")
+
+# Suffix of the journal file, appended to the path of the database file.
+JOURNAL_SUFFIX = ".memlog"
+
+# Seconds between two flushes of the journal and between two snapshots.
+DEFAULT_FLUSH_INTERVAL = 1.0
+DEFAULT_SNAPSHOT_INTERVAL = 300.0
+
+_names = itertools.count(1)
+
+# Returns the primary key column and the other columns of a table (generated columns are left out).
+def _columns(conn, table):
+    rows = conn.execute(f"PRAGMA table_info({table})").fetchall()
+    primary_key = next(row[1] for row in rows if row[5] == 1)
+    return primary_key, [row[1] for row in rows if row[5] != 1]
+
+# Returns the SQL of json_object() over the given columns of a row (prefix "NEW." or "OLD.").
+def _json_row(columns, prefix):
+    return "json_object(" + ", ".join(f"'{column}', {prefix}{column}" for column in columns) + ")"
+
+# Database pool whose connections share one in-memory database loaded from a database file.
+# The memory is freed when stop() writes the last snapshot, close() only closes the pooled connections.
+class MemoryDatabase(Database):
+    uri = True
+
+    def __init__(self, path=DB_FILE, journal_path=None, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 snapshot_interval=DEFAULT_SNAPSHOT_INTERVAL, sync=True):
+        # The memdb VFS shares the database between the connections of this process by name
+        # and uses the normal locks, so the busy timeout applies to them as for a file.
+        super().__init__(f"file:/habits-memory-{os.getpid()}-{next(_names)}?vfs=memdb")
+        self.file_path = path
+        self.journal_path = journal_path or path + JOURNAL_SUFFIX
+        self.flush_interval = flush_interval
+        self.snapshot_interval = snapshot_interval
+        self.sync = sync
+        self.last_error = None
+        self.replayed = 0
+        self._journal_lock = threading.RLock()
+        self._journal_generation = None
+        self._seq = 0
+        self._stopped = False
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        # Keeps the in-memory database alive while the pooled connections are closed and reopened.
+        self._anchor = sqlite3.connect(self.path, uri=True, check_same_thread=False)
+        self._last_snapshot = time.monotonic()
+        self._load()
+        atexit.register(self.stop)
+        if flush_interval:
+            self._thread = threading.Thread(target=self._run, name="habit-memory-journal", daemon=True)
+            self._thread.start()
+
+    # Opens a pooled connection to the in-memory database.
+    def _connect(self):
+        if self._stopped:
+            raise sqlite3.ProgrammingError("The memory engine has been stopped.")
+        return super()._connect()
+
+    # Loads the last snapshot, replays the journal on top of it and installs the journal triggers.
+    def _load(self):
+        if os.path.exists(self.file_path):
+            source = sqlite3.connect(self.file_path)
+            try:
+                source.backup(self._anchor)
+            finally:
+                source.close()
+
+        conn = self.connection()
+        version = get_schema_version(conn)
+        initialize_database(self)
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'memory_snapshot'").fetchone():
+            self._seq = conn.execute("SELECT seq FROM memory_snapshot").fetchone()[0]
+            with conn:
+                conn.execute("DROP TABLE memory_snapshot")
+
+        self.replayed = self._replay(conn)
+        self._install_journal(conn)
+        self._journal_file = open(self.journal_path, "a", encoding="utf-8")
+        # Schema changes and replayed changes are written to the file right away, so the journal can start over.
+        if self.replayed or version < SCHEMA_VERSION or not os.path.exists(self.file_path):
+            self.snapshot()
+
+    # Applies the journal entries written after the last snapshot and returns their number.
+    def _replay(self, conn):
+        if not os.path.exists(self.journal_path):
+            return 0
+        columns = {table: _columns(conn, table) for table in JOURNAL_TABLES}
+        replayed = 0
+        with open(self.journal_path, encoding="utf-8") as file, conn:
+            for line in file:
+                try:
+                    seq, table, operation, row = json.loads(line)
+                except ValueError:
+                    # The last line may be incomplete if the process died while appending it.
+                    break
+                if seq <= self._seq:
+                    continue
+                primary_key, _ = columns[table]
+                if operation == "D":
+                    conn.execute(f"DELETE FROM {table} WHERE {primary_key} = ?", (row[primary_key],))
+                else:
+                    names = list(row)
+                    updates = ", ".join(f"{name} = excluded.{name}" for name in names if name != primary_key)
+                    conn.execute(f'''
+                        INSERT INTO {table} ({", ".join(names)}) VALUES ({", ".join("?" * len(names))})
+                        ON CONFLICT ({primary_key}) DO UPDATE SET {updates}
+                    ''', [row[name] for name in names])
+                self._seq = seq
+                replayed += 1
+        return replayed
+
+    # Creates the memory_journal table and the triggers that fill it, numbering the entries after self._seq.
+    def _install_journal(self, conn):
+        with conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS memory_journal (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    tbl TEXT NOT NULL,
+                    op TEXT NOT NULL,
+                    row TEXT NOT NULL
+                )
+            ''')
+            if not conn.execute("SELECT 1 FROM sqlite_sequence WHERE name = 'memory_journal'").fetchone():
+                conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('memory_journal', ?)", (self._seq,))
+            for table in JOURNAL_TABLES:
+                primary_key, columns = _columns(conn, table)
+                insert = _json_row([primary_key, *columns], "NEW.")
+                delete = _json_row([primary_key], "OLD.")
+                conn.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS journal_{table}_insert AFTER INSERT ON {table}
+                    BEGIN INSERT INTO memory_journal (tbl, op, row) VALUES ('{table}', 'I', {insert}); END
+                ''')
+                # A changed primary key deletes the old row before the new one is written.
+                conn.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS journal_{table}_update AFTER UPDATE ON {table}
+                    BEGIN
+                        INSERT INTO memory_journal (tbl, op, row)
+                        SELECT '{table}', 'D', {delete} WHERE OLD.{primary_key} IS NOT NEW.{primary_key};
+                        INSERT INTO memory_journal (tbl, op, row) VALUES ('{table}', 'I', {insert});
+                    END
+                ''')
+                conn.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS journal_{table}_delete AFTER DELETE ON {table}
+                    BEGIN INSERT INTO memory_journal (tbl, op, row) VALUES ('{table}', 'D', {delete}); END
+                ''')
+        self._journal_generation = self.generation
+
+    # Appends the recorded changes to the journal file and returns their number.
+    # After a schema change (e.g. reset_database) a snapshot is written instead, as DDL is not journaled.
+    def flush(self):
+        with self._journal_lock:
+            if self.generation != self._journal_generation:
+                self.snapshot()
+                return 0
+            conn = self.connection()
+            rows = conn.execute("SELECT seq, tbl, op, row FROM memory_journal ORDER BY seq").fetchall()
+            if not rows:
+                return 0
+            # Entries already contained in the last snapshot are dropped without writing them.
+            self._journal_file.write("".join(f'[{seq}, "{table}", "{operation}", {row}]\n'
+                                             for seq, table, operation, row in rows if seq > self._seq))
+            self._journal_file.flush()
+            if self.sync:
+                os.fsync(self._journal_file.fileno())
+            self._seq = max(self._seq, rows[-1][0])
+            with conn:
+                conn.execute("DELETE FROM memory_journal WHERE seq <= ?", (rows[-1][0],))
+            return len(rows)
+
+    # Writes the whole in-memory database to the database file and empties the journal.
+    # The snapshot is written to a temporary file first and then renamed, so the old file stays
+    # intact if the process dies in between. It remembers the last journal entry it contains.
+    def snapshot(self):
+        with self._journal_lock:
+            conn = self.connection()
+            if self.generation != self._journal_generation:
+                self._install_journal(conn)
+            temporary_path = self.file_path + ".snapshot"
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            target = sqlite3.connect(temporary_path)
+            try:
+                retry_on_locked(conn.backup)(target)
+                seq = target.execute("SELECT seq FROM sqlite_sequence WHERE name = 'memory_journal'").fetchone()[0]
+                with target:
+                    for table in JOURNAL_TABLES:
+                        for operation in ("insert", "update", "delete"):
+                            target.execute(f"DROP TRIGGER IF EXISTS journal_{table}_{operation}")
+                    target.execute("DROP TABLE memory_journal")
+                    target.execute("CREATE TABLE memory_snapshot (seq INTEGER NOT NULL)")
+                    target.execute("INSERT INTO memory_snapshot (seq) VALUES (?)", (seq,))
+            finally:
+                target.close()
+            os.replace(temporary_path, self.file_path)
+
+            self._seq = max(self._seq, seq)
+            self._journal_file.close()
+            self._journal_file = open(self.journal_path, "w", encoding="utf-8")
+            self._last_snapshot = time.monotonic()
+
+    # Background thread: flushes the journal and writes snapshots until stop() is called.
+    # Errors are kept in last_error and retried on the next round.
+    def _run(self):
+        while not self._stop_event.wait(self.flush_interval):
+            try:
+                self.flush()
+                if time.monotonic() - self._last_snapshot >= self.snapshot_interval:
+                    self.snapshot()
+                self.last_error = None
+            except (sqlite3.Error, OSError) as e:
+                self.last_error = e
+
+    # Writes a last snapshot, removes the empty journal and frees the in-memory database.
+    def stop(self):
+        with self._journal_lock:
+            if self._stopped:
+                return
+            self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+        with self._journal_lock:
+            self.snapshot()
+            self._journal_file.close()
+            os.remove(self.journal_path)
+            self._stopped = True
+            self.close()
+            self._anchor.close()
+        atexit.unregister(self.stop)
+
+    # Stops the background thread and frees the memory without a final flush or snapshot,
+    # as if the process had died. Only meant for crash recovery tests.
+    def _abandon(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._stopped = True
+        self._journal_file.close()
+        self.close()
+        self._anchor.close()
+        atexit.unregister(self.stop)
@@ -0,0 +1,135 @@
+import importlib.util
+from collections import defaultdict
+from datetime import date
+from app.dates import period_of
+
+# NumPy is optional: without it every calculation uses the pure Python path.
+# It is only imported when the NumPy engine is used, because importing it takes longer than most CLI commands.
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+np = None
+
+# Imports NumPy on first use.
+def _load_numpy():
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+    return np
+
+# Inputs with fewer dates than this are computed in pure Python, where NumPy's overhead does not pay off.
+NUMPY_MIN_SIZE = 2000
+
+# Ordinal of 1970-01-01, used to turn datetime64[D] values into date ordinals.
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# Returns the longest run and the first and last period of the latest run from sorted, distinct periods.
+def summarize_periods(periods):
+    if not periods:
+        return 0, None, None
+
+    longest = 1
+    run_start = periods[0]
+    for previous, period in zip(periods, periods[1:]):
+        if period != previous + 1:
+            run_start = period
+        longest = max(longest, period - run_start + 1)
+    return longest, run_start, periods[-1]
+
+# Returns True if the NumPy engine should be used for an input of the given size and imports it in this case.
+def _use_numpy(engine, size):
+    if engine == "numpy":
+        if not HAS_NUMPY:
+            raise ValueError("The numpy engine requires numpy to be installed.")
+    elif engine == "python":
+        return False
+    elif engine == "auto":
+        if not HAS_NUMPY or size < NUMPY_MIN_SIZE:
+            return False
+    else:
+        raise ValueError(f"Unknown streak engine '{engine}'.")
+    _load_numpy()
+    return True
+
+# Converts ISO date strings (or date objects) to date ordinals in one vectorized step.
+def _to_ordinals(dates):
+    return np.array(dates, dtype='datetime64[D]').astype(np.int64) + EPOCH_ORDINAL
+
+# Returns (longest, current_start, current_end) for the completion dates of one habit.
+# current_start and current_end are the first and last period of the latest run.
+def summarize_dates(completion_dates, periodicity="daily", engine="auto"):
+    if not completion_dates:
+        return 0, None, None
+
+    if not _use_numpy(engine, len(completion_dates)):
+        periods = sorted({period_of(completion_date, periodicity) for completion_date in completion_dates})
+        return summarize_periods(periods)
+
+    days = _to_ordinals(list(completion_dates))
+    periods = (days - 1) // 7 if periodicity == "weekly" else days
+    return _summarize_numpy(np.zeros(len(periods), dtype=np.int64), periods)[0]
+
+# Returns {habit_id: (longest, current_start, current_end)} for many habits at once.
+# rows is an iterable of (habit_id, periodicity, completion_date) tuples in any order.
+def summarize_batch(rows, engine="auto"):
+    rows = rows if isinstance(rows, list) else list(rows)
+    if not rows:
+        return {}
+
+    if _use_numpy(engine, len(rows)):
+        days = _to_ordinals([row[2] for row in rows])
+        weekly = np.array([row[1] == "weekly" for row in rows], dtype=bool)
+        return _summarize_numpy(np.array([row[0] for row in rows], dtype=np.int64),
+                                np.where(weekly, (days - 1) // 7, days))
+
+    return summarize_period_batch(((habit_id, period_of(completion_date, periodicity))
+                                   for habit_id, periodicity, completion_date in rows), engine="python")
+
+# Returns {habit_id: (longest, current_start, current_end)} from (habit_id, period) rows in any order,
+# for example day or week numbers read directly from the completion table.
+def summarize_period_batch(rows, engine="auto"):
+    rows = rows if isinstance(rows, list) else list(rows)
+    if not rows:
+        return {}
+
+    if _use_numpy(engine, len(rows)):
+        return _summarize_numpy(np.array([row[0] for row in rows], dtype=np.int64),
+                                np.array([row[1] for row in rows], dtype=np.int64))
+
+    periods = defaultdict(set)
+    for habit_id, period in rows:
+        periods[habit_id].add(period)
+    return {habit_id: summarize_periods(sorted(habit_periods)) for habit_id, habit_periods in periods.items()}
+
+# Vectorized run detection: sorts all (habit, period) pairs, marks the start of every run where the
+# habit changes or the period does not follow the previous one, and reduces the run lengths per habit.
+def _summarize_numpy(habit_ids, periods):
+    order = np.lexsort((periods, habit_ids))
+    habit_ids = habit_ids[order]
+    periods = periods[order]
+
+    # Several completions in the same period count once.
+    distinct = np.ones(len(periods), dtype=bool)
+    distinct[1:] = (habit_ids[1:] != habit_ids[:-1]) | (periods[1:] != periods[:-1])
+    habit_ids = habit_ids[distinct]
+    periods = periods[distinct]
+
+    run_starts = np.ones(len(periods), dtype=bool)
+    run_starts[1:] = (habit_ids[1:] != habit_ids[:-1]) | (periods[1:] != periods[:-1] + 1)
+    run_start_index = np.flatnonzero(run_starts)
+    run_lengths = np.diff(np.append(run_start_index, len(periods)))
+    run_habits = habit_ids[run_start_index]
+    run_first_periods = periods[run_start_index]
+
+    habit_starts = np.ones(len(run_habits), dtype=bool)
+    habit_starts[1:] = run_habits[1:] != run_habits[:-1]
+    habit_first_run = np.flatnonzero(habit_starts)
+    habit_last_run = np.append(habit_first_run[1:], len(run_habits)) - 1
+
+    longest = np.maximum.reduceat(run_lengths, habit_first_run)
+    current_start = run_first_periods[habit_last_run]
+    current_end = current_start + run_lengths[habit_last_run] - 1
+
+    return {
+        int(habit_id): (int(longest_run), int(start), int(end))
+        for habit_id, longest_run, start, end in zip(run_habits[habit_first_run], longest, current_start, current_end)
+    }
@@ -0,0 +1,212 @@
+import json
+from datetime import date
+from app.bitmaps import last_completion_date, load_bitmap
+from app.database import get_database
+from app.dates import day_to_week, period_of, DAY_DATE_SQL
+from app.streak_engine import summarize_period_batch
+
+# SQL expression for the period number of a completion row, formatted with the periodicity expression.
+PERIOD_SQL = "CASE {} WHEN 'weekly' THEN (completion_day - 1) / 7 ELSE completion_day END"
+
+# Materialized streak summary per habit.
+# The table habit_streaks stores the latest run of consecutive periods (current_start to current_end),
+# the longest run and the last completion date. HabitManager keeps it up to date on every write,
+# so reading a streak is a single primary key lookup regardless of the size of the history.
+
+# Returns the current streak of a summary row: the length of the latest run if it
+# reaches the current or the previous period, otherwise 0.
+def current_streak_from_summary(summary, periodicity, today=None):
+    current_start, current_end = summary[0], summary[1]
+    if current_end is None:
+        return 0
+    if current_end < period_of(today or date.today(), periodicity) - 1:
+        return 0
+    return current_end - current_start + 1
+
+# Returns the current streak of a habit by reading its completions newest first from the
+# (habit_id, completion_day) index and stopping at the first gap, so the cost depends on the length of the
+# streak and not on the size of the history. Same result as current_streak_from_summary, without the summary.
+def scan_current_streak(conn, habit_id, periodicity, today=None):
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT completion_day FROM completion
+        WHERE habit_id = ? AND completion_day IS NOT NULL
+        ORDER BY completion_day DESC
+    ''', (habit_id,))
+    streak = 0
+    expected = None
+    # The cursor steps through the index one row at a time, rows after the gap are never read.
+    for (day,) in cursor:
+        period = day if periodicity == "daily" else day_to_week(day)
+        if expected is None:
+            if period < period_of(today or date.today(), periodicity) - 1:
+                break
+        elif period == expected:
+            # Further completions in the same week.
+            continue
+        elif period != expected - 1:
+            break
+        streak += 1
+        expected = period
+    cursor.close()
+    return streak
+
+# Returns the current streak of every habit (or of the given habit ids) as {habit_id: streak} in one query.
+# A recursive CTE starts at the last period of every habit and steps back one period per index probe
+# while the previous period has a completion, so like scan_current_streak it stops at the first gap.
+def current_streaks(conn, today=None, habit_ids=None):
+    today = today or date.today()
+    where = "WHERE id IN (SELECT value FROM json_each(:habit_ids))" if habit_ids is not None else ""
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        WITH RECURSIVE
+        latest AS (
+            SELECT id, periodicity = 'weekly' AS weekly,
+                   (SELECT MAX(completion_day) FROM completion WHERE habit_id = habits.id) AS last_day
+            FROM habits
+            {where}
+        ),
+        walk (habit_id, weekly, period) AS (
+            SELECT id, weekly, CASE WHEN weekly THEN (last_day - 1) / 7 ELSE last_day END
+            FROM latest
+            WHERE last_day IS NOT NULL
+              AND CASE WHEN weekly THEN (last_day - 1) / 7 ELSE last_day END
+                  >= CASE WHEN weekly THEN :week ELSE :day END - 1
+            UNION ALL
+            SELECT habit_id, weekly, period - 1
+            FROM walk
+            WHERE EXISTS (
+                SELECT 1 FROM completion
+                WHERE completion.habit_id = walk.habit_id
+                  AND completion_day BETWEEN CASE WHEN weekly THEN (period - 1) * 7 + 1 ELSE period - 1 END
+                                         AND CASE WHEN weekly THEN (period - 1) * 7 + 7 ELSE period - 1 END
+            )
+        )
+        SELECT latest.id, COUNT(walk.habit_id)
+        FROM latest
+        LEFT JOIN walk ON walk.habit_id = latest.id
+        GROUP BY latest.id
+    ''', {"day": period_of(today, "daily"), "week": period_of(today, "weekly"),
+          "habit_ids": json.dumps(list(habit_ids or []))})
+    return dict(cursor.fetchall())
+
+# Recomputes the summary row of a habit from its full completion history.
+def recompute_streak(conn, habit_id):
+    cursor = conn.cursor()
+    cursor.execute("SELECT periodicity FROM habits WHERE id = ?", (habit_id,))
+    result = cursor.fetchone()
+    if not result:
+        cursor.execute("DELETE FROM habit_streaks WHERE habit_id = ?", (habit_id,))
+        return None
+    periodicity = result[0]
+
+    # The runs are found with bit operations on the completion bitmap instead of reading every completion.
+    bitmap = load_bitmap(conn, habit_id)
+    longest, current_start, current_end = bitmap.summarize(periodicity)
+    last_completion = last_completion_date(bitmap)
+
+    cursor.execute('''
+        INSERT OR REPLACE INTO habit_streaks (habit_id, current_start, current_end, longest_streak, last_completion)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (habit_id, current_start, current_end, longest, last_completion))
+    return current_start, current_end, longest, last_completion
+
+# Updates the summary row of a habit after a new completion was inserted.
+# Completions inside, right after or after the latest run are applied in constant time,
+# completions before the latest run fall back to a full recompute.
+def record_completion(conn, habit_id, completion_date):
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT s.current_start, s.current_end, s.longest_streak, s.last_completion, h.periodicity
+        FROM habits h
+        LEFT JOIN habit_streaks s ON s.habit_id = h.id
+        WHERE h.id = ?
+    ''', (habit_id,))
+    result = cursor.fetchone()
+    if not result or result[1] is None:
+        recompute_streak(conn, habit_id)
+        return
+
+    current_start, current_end, longest, last_completion, periodicity = result
+    period = period_of(completion_date, periodicity)
+
+    if current_start <= period <= current_end:
+        pass
+    elif period == current_end + 1:
+        current_end = period
+    elif period > current_end + 1:
+        current_start = current_end = period
+    else:
+        # Older completions can join the latest run with earlier runs, which needs the full history.
+        recompute_streak(conn, habit_id)
+        return
+
+    cursor.execute('''
+        UPDATE habit_streaks
+        SET current_start = ?, current_end = ?, longest_streak = ?, last_completion = ?
+        WHERE habit_id = ?
+    ''', (current_start, current_end, max(longest, current_end - current_start + 1),
+          max(last_completion, completion_date), habit_id))
+
+# Returns the stored summary row (current_start, current_end, longest_streak, last_completion) of a habit,
+# or None if it does not exist yet.
+def _read_streak_summary(conn, habit_id):
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT current_start, current_end, longest_streak, last_completion
+        FROM habit_streaks
+        WHERE habit_id = ?
+    ''', (habit_id,))
+    return cursor.fetchone()
+
+# Returns the summary row (current_start, current_end, longest_streak, last_completion) of a habit,
+# computing and storing it first if it does not exist yet.
+def get_streak_summary(conn, habit_id):
+    summary = _read_streak_summary(conn, habit_id)
+    if summary:
+        return summary
+
+    with conn:
+        summary = recompute_streak(conn, habit_id)
+    return summary or (None, None, 0, None)
+
+# Returns the current streak of a habit from its summary row. Without a summary row the streak is
+# found with scan_current_streak, which only reads the latest run and writes nothing.
+def get_current_streak(conn, habit_id, periodicity, today=None):
+    summary = _read_streak_summary(conn, habit_id)
+    if summary:
+        return current_streak_from_summary(summary, periodicity, today)
+    return scan_current_streak(conn, habit_id, periodicity, today)
+
+# Rebuilds the summary rows of all habits, repairing drift caused by writes outside of HabitManager.
+# All completions are read in one query and the streaks of all habits are computed in one batch.
+def rebuild_streaks(database=None):
+    with (database or get_database()).connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT c.habit_id, {PERIOD_SQL.format('h.periodicity')}
+            FROM completion c
+            JOIN habits h ON h.id = c.habit_id
+        ''')
+        summaries = summarize_period_batch(cursor.fetchall())
+
+        cursor.execute(f"SELECT habit_id, {DAY_DATE_SQL.format('MAX(completion_day)')} FROM completion GROUP BY habit_id")
+        last_completions = dict(cursor.fetchall())
+
+        cursor.execute("SELECT id FROM habits")
+        rebuilt = []
+        for (habit_id,) in cursor.fetchall():
+            longest, current_start, current_end = summaries.get(habit_id, (0, None, None))
+            rebuilt.append((habit_id, current_start, current_end, longest, last_completions.get(habit_id)))
+
+        cursor.execute("DELETE FROM habit_streaks")
+        cursor.executemany('''
+            INSERT INTO habit_streaks (habit_id, current_start, current_end, longest_streak, last_completion)
+            VALUES (?, ?, ?, ?, ?)
+        ''', rebuilt)
+
+    return len(rebuilt)
+
+if __name__ == "__main__":
+    count = rebuild_streaks()
+    print(f"Streaks of {count} habits rebuilt successfully.")
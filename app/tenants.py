@@ -0,0 +1,145 @@
+import contextlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from app.database import Database, initialize_database, DB_CONCURRENT
+
+# Directory with one database file per tenant, can be overridden with the HABITS_SHARD_DIR environment variable.
+SHARD_DIR = os.environ.get('HABITS_SHARD_DIR', 'shards')
+
+# Maximum number of tenant databases a ShardMap keeps open at the same time.
+DEFAULT_MAX_OPEN_SHARDS = 64
+
+# Tenant ids become file names, so only letters, digits, '_' and '-' are allowed.
+TENANT_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+# Routes every tenant to its own SQLite file (<directory>/<tenant_id>.db).
+# The database pools of the most recently used tenants are kept open, the least recently used idle
+# pool is closed when more than max_open tenants are open. A pool is idle while nobody holds a lease on it
+# (see lease(), HabitManager leases the pool for every call), so closing it never closes a connection
+# that another thread is using. If all pools are leased, more than max_open stay open until they are released.
+class ShardMap:
+    def __init__(self, directory=SHARD_DIR, max_open=DEFAULT_MAX_OPEN_SHARDS, concurrent=DB_CONCURRENT):
+        self.directory = directory
+        self.max_open = max_open
+        self.concurrent = concurrent
+        self._lock = threading.Lock()
+        self._databases = OrderedDict()
+        # Number of active leases per tenant id.
+        self._leases = {}
+
+    # Returns the database file of a tenant.
+    def path_for(self, tenant_id):
+        if not isinstance(tenant_id, str) or not TENANT_ID_PATTERN.match(tenant_id):
+            raise ValueError(f"Invalid tenant id '{tenant_id}'.")
+        return os.path.join(self.directory, f"{tenant_id}.db")
+
+    # Returns the database pool of a tenant, creating and initializing its file on first use.
+    # The pool may be closed as soon as it is idle, use lease() to keep it open while it is used.
+    def database(self, tenant_id):
+        with self._lock:
+            database = self._open(tenant_id)
+            self._evict_idle(keep=tenant_id)
+            return database
+
+    # Returns the database pool of a tenant and keeps it open until the with block is left.
+    # Leases can be nested and held by several threads at the same time.
+    @contextlib.contextmanager
+    def lease(self, tenant_id):
+        with self._lock:
+            database = self._open(tenant_id)
+            self._leases[tenant_id] = self._leases.get(tenant_id, 0) + 1
+            self._evict_idle()
+        try:
+            yield database
+        finally:
+            with self._lock:
+                self._leases[tenant_id] -= 1
+                if not self._leases[tenant_id]:
+                    del self._leases[tenant_id]
+                self._evict_idle()
+
+    # Returns the open pool of a tenant or opens it as the most recently used one. Called with the lock held.
+    def _open(self, tenant_id):
+        database = self._databases.get(tenant_id)
+        if database is not None:
+            self._databases.move_to_end(tenant_id)
+            return database
+
+        path = self.path_for(tenant_id)
+        os.makedirs(self.directory, exist_ok=True)
+        database = Database(path, concurrent=self.concurrent)
+        initialize_database(database)
+        self._databases[tenant_id] = database
+        return database
+
+    # Closes the least recently used idle pools (except keep) while more than max_open are open.
+    # Called with the lock held.
+    def _evict_idle(self, keep=None):
+        for tenant_id in list(self._databases):
+            if len(self._databases) <= self.max_open:
+                break
+            if tenant_id != keep and not self._leases.get(tenant_id):
+                self._databases.pop(tenant_id).close()
+
+    # Returns the number of tenant databases that are currently open.
+    def open_count(self):
+        with self._lock:
+            return len(self._databases)
+
+    # Returns the ids of all tenants with a database file, sorted.
+    def tenants(self):
+        if not os.path.isdir(self.directory):
+            return []
+        tenant_ids = (file_name[:-3] for file_name in os.listdir(self.directory) if file_name.endswith(".db"))
+        return sorted(tenant_id for tenant_id in tenant_ids if TENANT_ID_PATTERN.match(tenant_id))
+
+    # Runs func(database) for every tenant (or the given tenants) in parallel threads and returns
+    # {tenant_id: result}. SQLite releases the GIL while it executes a query, so the shards are scanned
+    # at the same time. Every task uses its own pool, which keeps the LRU of open tenants untouched.
+    # Shards on an older schema are migrated first, so func can rely on the current tables.
+    def map(self, func, tenant_ids=None, max_workers=None):
+        # Imported here, so the CLI does not pay for it on every start.
+        from concurrent.futures import ThreadPoolExecutor
+
+        tenant_ids = self.tenants() if tenant_ids is None else list(tenant_ids)
+
+        def run(tenant_id):
+            database = Database(self.path_for(tenant_id))
+            try:
+                initialize_database(database)
+                return func(database)
+            finally:
+                database.close()
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return dict(zip(tenant_ids, executor.map(run, tenant_ids)))
+
+    # Closes all open tenant databases.
+    def close(self):
+        with self._lock:
+            for database in self._databases.values():
+                database.close()
+            self._databases.clear()
+
+_default_shard_map = None
+_default_lock = threading.Lock()
+
+# Returns the shared shard map, creating it on first use.
+def get_shard_map():
+    global _default_shard_map
+    if _default_shard_map is None:
+        with _default_lock:
+            if _default_shard_map is None:
+                _default_shard_map = ShardMap()
+    return _default_shard_map
+
+# Points the shared shard map to another directory.
+def configure_shards(directory=SHARD_DIR, max_open=DEFAULT_MAX_OPEN_SHARDS, concurrent=DB_CONCURRENT):
+    global _default_shard_map
+    with _default_lock:
+        if _default_shard_map is not None:
+            _default_shard_map.close()
+        _default_shard_map = ShardMap(directory, max_open=max_open, concurrent=concurrent)
+    return _default_shard_map
@@ -0,0 +1,262 @@
+# Streaming export and import of habits with their completions.
+# Formats (chosen by the file extension unless given explicitly):
+#   csv   = one row per completion with the habit columns repeated (habits without completions get one row)
+#   jsonl = one JSON object per habit with its completion dates
+#   hbt   = compact binary format: one block per habit with varint encoded strings and the completion days
+#           as the first day ordinal followed by the differences to the previous day
+# Exports read the habits and completions with two cursors in one ordered pass; imports stream into the
+# bulk import of the HabitManager. Only the completions of one habit are held in memory at a time.
+# Run from the project root: python -m app.transfer export backup.hbt / python -m app.transfer import backup.hbt
+import argparse
+import csv
+import json
+import os
+from itertools import groupby
+from app.cache import get_habit_cache
+from app.database import get_database, iter_rows, retry_on_locked
+from app.dates import day_to_date
+from app.habit_manager import HabitManager, BULK_CHUNK_SIZE, ITER_BATCH_SIZE
+
+FORMATS = ("csv", "jsonl", "hbt")
+
+# First bytes of a file in the binary format, the last byte is the format version.
+BINARY_MAGIC = b"HBT\x01"
+
+CSV_COLUMNS = ["name", "description", "periodicity", "creation_date", "completion_date"]
+
+# Returns the format of a file from its extension.
+def detect_format(path):
+    extension = os.path.splitext(path)[1].lstrip(".").lower()
+    if extension not in FORMATS:
+        raise ValueError(f"Unknown file format '{extension}', expected one of {', '.join(FORMATS)}.")
+    return extension
+
+# Streams (habit_row, completion_days) for all habits ordered by id.
+# Both tables are read in index order at the same time, so the completions are matched without a query per habit.
+def iter_histories(database=None, batch_size=ITER_BATCH_SIZE):
+    conn = (database or get_database()).connection()
+    habits = conn.cursor()
+    habits.execute("SELECT id, name, description, periodicity, creation_date FROM habits ORDER BY id")
+    completions = conn.cursor()
+    completions.execute("SELECT habit_id, completion_day FROM completion ORDER BY habit_id, completion_day")
+
+    completion_rows = iter_rows(completions, batch_size)
+    pending = next(completion_rows, None)
+    for habit in iter_rows(habits, batch_size):
+        days = []
+        # Completions of deleted habits are skipped.
+        while pending is not None and pending[0] <= habit[0]:
+            if pending[0] == habit[0]:
+                days.append(pending[1])
+            pending = next(completion_rows, None)
+        yield habit, days
+
+# Appends an unsigned integer in LEB128 varint encoding.
+def _write_varint(buffer, value):
+    while value >= 0x80:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+# Reads a varint from data at position and returns (value, next position).
+def _read_varint(data, position):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+# Appends a string as its varint length + 1 and UTF-8 bytes, None is written as length 0.
+def _write_string(buffer, text):
+    if text is None:
+        _write_varint(buffer, 0)
+        return
+    encoded = text.encode("utf-8")
+    _write_varint(buffer, len(encoded) + 1)
+    buffer.extend(encoded)
+
+# Reads a string written by _write_string and returns (text, next position).
+def _read_string(data, position):
+    length, position = _read_varint(data, position)
+    if length == 0:
+        return None, position
+    end = position + length - 1
+    return bytes(data[position:end]).decode("utf-8"), end
+
+# Returns the binary block of one habit (without its length prefix).
+def _encode_habit(habit, days):
+    block = bytearray()
+    for text in habit[1:]:
+        _write_string(block, text)
+    _write_varint(block, len(days))
+    previous = 0
+    for day in days:
+        _write_varint(block, day - previous)
+        previous = day
+    return block
+
+# Decodes a habit block into ((name, description, periodicity, creation_date), completion_days).
+def _decode_habit(block):
+    position = 0
+    fields = []
+    for _ in range(4):
+        text, position = _read_string(block, position)
+        fields.append(text)
+    count, position = _read_varint(block, position)
+    days = []
+    day = 0
+    for _ in range(count):
+        delta, position = _read_varint(block, position)
+        day += delta
+        days.append(day)
+    return tuple(fields), days
+
+# Writers: every writer streams (habit_row, completion_days) pairs into an open file.
+def _write_csv(file, histories):
+    writer = csv.writer(file)
+    writer.writerow(CSV_COLUMNS)
+    for habit, days in histories:
+        if not days:
+            writer.writerow([*habit[1:], ""])
+        for day in days:
+            writer.writerow([*habit[1:], day_to_date(day)])
+
+def _write_jsonl(file, histories):
+    for habit, days in histories:
+        record = dict(zip(CSV_COLUMNS[:4], habit[1:]))
+        record["completions"] = [day_to_date(day) for day in days]
+        file.write(json.dumps(record) + "\n")
+
+def _write_binary(file, histories):
+    file.write(BINARY_MAGIC)
+    for habit, days in histories:
+        block = _encode_habit(habit, days)
+        prefix = bytearray()
+        _write_varint(prefix, len(block))
+        file.write(prefix)
+        file.write(block)
+
+# Readers: every reader streams ((name, description, periodicity, creation_date), completions) pairs,
+# where completions are ISO dates or day ordinals.
+def _read_csv(file):
+    rows = csv.DictReader(file)
+    for _, habit_rows in groupby(rows, key=lambda row: row["name"]):
+        first = next(habit_rows)
+        fields = (first["name"], first["description"], first["periodicity"], first["creation_date"])
+        completions = [row["completion_date"] for row in [first, *habit_rows] if row["completion_date"]]
+        yield fields, completions
+
+def _read_jsonl(file):
+    for line in file:
+        if line.strip():
+            record = json.loads(line)
+            yield tuple(record.get(column) for column in CSV_COLUMNS[:4]), record.get("completions", [])
+
+def _read_binary(file):
+    if file.read(len(BINARY_MAGIC)) != BINARY_MAGIC:
+        raise ValueError("Not a habit export in the binary format.")
+    while True:
+        # Length prefix of the next block, read byte by byte because it may end anywhere.
+        length = 0
+        shift = 0
+        byte = file.read(1)
+        if not byte:
+            return
+        while True:
+            length |= (byte[0] & 0x7F) << shift
+            if byte[0] < 0x80:
+                break
+            shift += 7
+            byte = file.read(1)
+        block = file.read(length)
+        if len(block) != length:
+            raise ValueError("The binary export is truncated.")
+        yield _decode_habit(block)
+
+WRITERS = {"csv": _write_csv, "jsonl": _write_jsonl, "hbt": _write_binary}
+READERS = {"csv": _read_csv, "jsonl": _read_jsonl, "hbt": _read_binary}
+
+# Opens an export file in the mode its format needs.
+def _open(path, fmt, mode):
+    if fmt == "hbt":
+        return open(path, mode + "b")
+    return open(path, mode, newline="" if fmt == "csv" else None, encoding="utf-8")
+
+# Exports all habits and completions to a file and returns the number of exported habits and completions.
+def export_data(path, fmt=None, database=None):
+    fmt = fmt or detect_format(path)
+    counts = {"habits": 0, "completions": 0}
+
+    def counted(histories):
+        for habit, days in histories:
+            counts["habits"] += 1
+            counts["completions"] += len(days)
+            yield habit, days
+
+    with _open(path, fmt, "w") as file:
+        WRITERS[fmt](file, counted(iter_histories(database)))
+    return counts
+
+# Returns the id of the habit with the given name, creating it first if it does not exist.
+# Runs in the transaction of the caller.
+def _import_habit(conn, name, description, periodicity, creation_date):
+    row = conn.execute("SELECT id FROM habits WHERE name = ?", (name,)).fetchone()
+    if row:
+        return row[0]
+    return conn.execute('''
+        INSERT INTO habits (name, description, periodicity, creation_date)
+        VALUES (?, ?, ?, ?)
+    ''', (name, description, periodicity, creation_date)).lastrowid
+
+# Reads a file and writes its habits and completions in one transaction, see import_data.
+# A lock error rolls the transaction back, the retry then reads the file again from the start.
+@retry_on_locked
+def _import_file(database, path, fmt, chunk_size):
+    conn = database.connection()
+    habits = 0
+
+    def completions(file):
+        nonlocal habits
+        for (name, description, periodicity, creation_date), habit_completions in READERS[fmt](file):
+            if periodicity not in ("daily", "weekly"):
+                raise ValueError(f"Habit '{name}' has the unknown periodicity '{periodicity}', "
+                                 f"expected 'daily' or 'weekly'.")
+            habit_id = _import_habit(conn, name, description, periodicity, creation_date)
+            habits += 1
+            for completion in habit_completions:
+                yield habit_id, completion
+
+    with _open(path, fmt, "r") as file, conn:
+        conn.execute("BEGIN IMMEDIATE")
+        result = HabitManager(database).mark_habits_completed_bulk(completions(file), chunk_size, commit=False)
+    return {"habits": habits, **result}
+
+# Imports habits and completions from a file. Habits are matched by name: existing habits keep their
+# settings and only get the missing completions. Returns the number of habits and inserted and skipped completions.
+# The habits and all chunks of completions are written in one transaction, so the import commits once and an error
+# (e.g. a habit with an unknown periodicity, which raises a ValueError) leaves the database as it was.
+def import_data(path, fmt=None, database=None, chunk_size=BULK_CHUNK_SIZE):
+    fmt = fmt or detect_format(path)
+    database = database or get_database()
+    try:
+        return _import_file(database, path, fmt, chunk_size)
+    finally:
+        get_habit_cache(database).clear()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export or import habits and completions.")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("path", help="file to write or read, the extension selects the format (csv, jsonl, hbt)")
+    parser.add_argument("--format", choices=FORMATS, help="format of the file if it has another extension")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        counts = export_data(args.path, args.format)
+        print(f"Exported {counts['habits']} habits with {counts['completions']} completions to {args.path}.")
+    else:
+        counts = import_data(args.path, args.format)
+        print(f"Imported {counts['habits']} habits with {counts['inserted']} new completions from {args.path}.")
@@ -0,0 +1,52 @@
+# Compares marking completions from many coroutines with run_in_executor around the blocking
+# HabitManager and with AsyncHabitManager, which coalesces them into shared transactions.
+# Run from the project root: python -m benchmarks.bench_async
+import asyncio
+import contextlib
+import io
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+from app.async_manager import AsyncHabitManager
+from app.database import initialize_database, using_database
+from app.habit_manager import HabitManager
+
+COMPLETIONS = 5000
+
+# Returns the ISO date i days after start.
+def nth_day(start, i):
+    return (start + timedelta(days=i)).isoformat()
+
+# Marks all completions concurrently with run_in_executor and returns the completions per second.
+async def measure_executor(manager, habit_id):
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    await asyncio.gather(*(loop.run_in_executor(None, manager.mark_habit_completed, habit_id, nth_day(date(1990, 1, 1), i))
+                           for i in range(COMPLETIONS)))
+    return COMPLETIONS / (time.perf_counter() - start)
+
+# Marks all completions concurrently with AsyncHabitManager and returns the completions per second.
+async def measure_async(manager, habit_id):
+    start = time.perf_counter()
+    await asyncio.gather(*(manager.mark_habit_completed(habit_id, nth_day(date(2010, 1, 1), i))
+                           for i in range(COMPLETIONS)))
+    return COMPLETIONS / (time.perf_counter() - start)
+
+async def run():
+    with tempfile.TemporaryDirectory() as tmp, using_database(os.path.join(tmp, 'bench.db')):
+        initialize_database()
+        with contextlib.redirect_stdout(io.StringIO()):
+            habit = HabitManager().create_habit("Benchmark", "Benchmark habit", "daily")
+
+        results = {"run_in_executor": await measure_executor(HabitManager(), habit.id)}
+        async with AsyncHabitManager() as manager:
+            results["AsyncHabitManager"] = await measure_async(manager, habit.id)
+            transactions = manager.batches
+
+    for name, ops in results.items():
+        print(f"{name:<20} {ops:>12,.0f} completions/sec")
+    print(f"AsyncHabitManager wrote {COMPLETIONS} completions in {transactions} transactions")
+
+if __name__ == "__main__":
+    asyncio.run(run())
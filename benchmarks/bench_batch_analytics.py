@@ -0,0 +1,39 @@
+# Measures how the batch analytics over many database files scale with the number of worker processes.
+# Run from the project root: python -m benchmarks.bench_batch_analytics
+import os
+import tempfile
+import time
+from app.batch_analytics import run_batch
+from app.database import Database, initialize_database
+from database_seeder.generator import generate_dataset
+
+FILES = 32
+HABITS_PER_FILE = 20
+YEARS = 2
+
+# Creates FILES synthetic habit databases in a directory and returns their paths.
+def create_files(directory):
+    paths = []
+    for number in range(FILES):
+        database = Database(os.path.join(directory, f"tenant-{number:03d}.db"))
+        initialize_database(database)
+        generate_dataset(HABITS_PER_FILE, YEARS, seed=number, database=database)
+        database.close()
+        paths.append(database.path)
+    return paths
+
+def run():
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = create_files(tmp)
+        baseline = None
+        for workers in sorted({1, 2, 4, os.cpu_count() or 1}):
+            start = time.perf_counter()
+            report, results = run_batch(paths, max_workers=workers)
+            seconds = time.perf_counter() - start
+            baseline = baseline or seconds
+            slowest = max(result["seconds"] for result in results)
+            print(f"{workers:>3} workers  {seconds:>8.3f} s  speedup {baseline / seconds:>5.2f}x  "
+                  f"slowest file {slowest * 1000:>8.1f} ms")
+
+if __name__ == "__main__":
+    run()
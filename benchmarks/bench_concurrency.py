@@ -0,0 +1,56 @@
+# Measures the write throughput of several processes marking completions at the same time,
+# in the default rollback journal mode and in the concurrency mode (WAL).
+# Run from the project root: python -m benchmarks.bench_concurrency
+import contextlib
+import io
+import multiprocessing
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+from app.database import configure_database, initialize_database, DB_FILE
+from app.habit_manager import HabitManager
+
+PROCESSES = (1, 2, 4, 8)
+COMPLETIONS_PER_PROCESS = 500
+
+# Marks COMPLETIONS_PER_PROCESS completions of the process's own habit.
+def mark_completions(path, concurrent, worker):
+    configure_database(path, concurrent=concurrent)
+    manager = HabitManager()
+    habit_id = manager.get_habit_id_by_name(f"Worker {worker}")
+    for i in range(COMPLETIONS_PER_PROCESS):
+        manager.mark_habit_completed(habit_id, (date(2000, 1, 1) + timedelta(days=i)).isoformat())
+
+# Runs the given number of writer processes on a new database and returns the completions per second.
+def measure(processes, concurrent):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        database = configure_database(path, concurrent=concurrent)
+        initialize_database()
+        # create_habit prints a confirmation for every habit
+        with contextlib.redirect_stdout(io.StringIO()):
+            for worker in range(processes):
+                HabitManager().create_habit(f"Worker {worker}", "Benchmark habit", "daily")
+        database.close()
+
+        context = multiprocessing.get_context("fork")
+        workers = [context.Process(target=mark_completions, args=(path, concurrent, worker))
+                   for worker in range(processes)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        seconds = time.perf_counter() - start
+    configure_database(DB_FILE)
+    return processes * COMPLETIONS_PER_PROCESS / seconds
+
+def run():
+    for processes in PROCESSES:
+        for mode, concurrent in (("rollback journal", False), ("WAL", True)):
+            ops = measure(processes, concurrent)
+            print(f"{processes} processes  {mode:<18} {ops:>12,.0f} completions/sec")
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,60 @@
+# Compares the old per-call sqlite3.connect() pattern with the shared connection pool.
+# Run from the project root: python -m benchmarks.bench_connection_pool
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+from app.database import initialize_database, using_database
+from app.habit_manager import HabitManager
+
+OPERATIONS = 5000
+
+# Returns the ISO date i days after start.
+def nth_day(start, i):
+    return (start + timedelta(days=i)).isoformat()
+
+# Reproduces the lookup as it was done before the pool: one connection per call.
+def legacy_get_habit_id_by_name(path, habit_name):
+    with sqlite3.connect(path) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM habits WHERE name = ?", (habit_name,))
+        result = cursor.fetchone()
+    return result[0]
+
+# Reproduces the completion insert as it was done before the pool.
+def legacy_mark_habit_completed(path, habit_id, completion_date):
+    with sqlite3.connect(path) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1 FROM completion WHERE habit_id = ? AND completion_date = ?", (habit_id, completion_date))
+        if cursor.fetchone():
+            return
+        cursor.execute("INSERT INTO completion (habit_id, completion_date) VALUES (?, ?)", (habit_id, completion_date))
+
+# Runs func OPERATIONS times and returns the achieved operations per second.
+def measure(func):
+    start = time.perf_counter()
+    for i in range(OPERATIONS):
+        func(i)
+    return OPERATIONS / (time.perf_counter() - start)
+
+def run():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        with using_database(path):
+            initialize_database()
+            manager = HabitManager()
+            habit = manager.create_habit("Benchmark", "Benchmark habit", "daily")
+
+            results = {
+                "lookup (per-call connect)": measure(lambda i: legacy_get_habit_id_by_name(path, "Benchmark")),
+                "lookup (pooled)": measure(lambda i: manager.get_habit_id_by_name("Benchmark")),
+                "complete (per-call connect)": measure(lambda i: legacy_mark_habit_completed(path, habit.id, nth_day(date(1990, 1, 1), i))),
+                "complete (pooled)": measure(lambda i: manager.mark_habit_completed(habit.id, nth_day(date(2010, 1, 1), i))),
+            }
+
+    for name, ops in results.items():
+        print(f"{name:<30} {ops:>12,.0f} ops/sec")
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,48 @@
+# Compares the memory needed to hold many habits as objects with a __dict__ (the previous Habit class),
+# as slotted Habit objects and as a columnar HabitCollection.
+# Run from the project root: python -m benchmarks.bench_memory
+import gc
+import tracemalloc
+from app.habit import Habit, HabitCollection
+
+HABITS = (10000, 100000, 500000)
+
+# The Habit class as it was before __slots__.
+class DictHabit:
+    def __init__(self, id, name, description, periodicity, creation_date):
+        self.id = id
+        self.name = name
+        self.description = description
+        self.periodicity = periodicity
+        self.creation_date = creation_date
+
+# Returns rows like the ones read from the habits table.
+def make_rows(count):
+    return [(habit_id, f"Synthetic {habit_id:07d}", "Generated daily habit" if habit_id % 3 else "Generated weekly habit",
+             "daily" if habit_id % 3 else "weekly", "2024-01-01") for habit_id in range(1, count + 1)]
+
+# Returns the bytes allocated by build(rows) that are still held by its result.
+# The strings of the rows are shared by all variants and therefore not counted.
+def measure(build, rows):
+    gc.collect()
+    tracemalloc.start()
+    result = build(rows)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+def run():
+    builders = {
+        "Habit with __dict__": lambda rows: [DictHabit(*row) for row in rows],
+        "Habit with __slots__": lambda rows: [Habit.from_database(row) for row in rows],
+        "HabitCollection": HabitCollection.from_rows,
+    }
+    for count in HABITS:
+        rows = make_rows(count)
+        for name, build in builders.items():
+            size = measure(build, rows)
+            print(f"{count:>8} habits  {name:<22} {size / 2 ** 20:>8.1f} MiB  {size / count:>6.1f} bytes/habit")
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,60 @@
+# Compares marking completions and reading statuses and streaks on the database file with the in-memory engine,
+# including the time of the final snapshot of the in-memory engine.
+# Run from the project root: python -m benchmarks.bench_memory_engine
+import contextlib
+import io
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+from app import analytics
+from app.database import Database, initialize_database
+from app.habit_manager import HabitManager
+from app.memory_engine import MemoryDatabase
+
+HABITS = 20
+COMPLETIONS_PER_HABIT = 250
+READS = 200
+
+# Marks the completions one by one and returns the completions per second.
+def measure_writes(manager, habit_ids):
+    start = time.perf_counter()
+    for habit_id in habit_ids:
+        for i in range(COMPLETIONS_PER_HABIT):
+            manager.mark_habit_completed(habit_id, (date(2020, 1, 1) + timedelta(days=i)).isoformat())
+    return len(habit_ids) * COMPLETIONS_PER_HABIT / (time.perf_counter() - start)
+
+# Runs the status check and the longest streak READS times and returns the runs per second.
+def measure_reads(manager, database):
+    start = time.perf_counter()
+    for _ in range(READS):
+        manager.check_habits_status("2020-06-01")
+        analytics.longest_streak(database=database)
+    return READS / (time.perf_counter() - start)
+
+# Creates the habits and measures writes and reads on a database pool.
+def measure(database):
+    manager = HabitManager(database)
+    with contextlib.redirect_stdout(io.StringIO()):
+        habit_ids = [manager.create_habit(f"Habit {number}", "Benchmark habit", "daily").id for number in range(HABITS)]
+    return measure_writes(manager, habit_ids), measure_reads(manager, database)
+
+def run():
+    with tempfile.TemporaryDirectory() as tmp:
+        database = Database(os.path.join(tmp, 'file.db'))
+        initialize_database(database)
+        results = {"database file": measure(database)}
+        database.close()
+
+        engine = MemoryDatabase(os.path.join(tmp, 'memory.db'))
+        results["memory engine"] = measure(engine)
+        start = time.perf_counter()
+        engine.stop()
+        snapshot = time.perf_counter() - start
+
+    for name, (writes, reads) in results.items():
+        print(f"{name:<15} {writes:>10,.0f} completions/sec {reads:>10,.0f} reads/sec")
+    print(f"final snapshot of the memory engine: {snapshot * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    run()
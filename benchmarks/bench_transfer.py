@@ -0,0 +1,38 @@
+# Compares file size and export/import speed of the CSV, JSON Lines and binary export formats.
+# Run from the project root: python -m benchmarks.bench_transfer
+import os
+import tempfile
+import time
+from app.database import Database, initialize_database
+from app.transfer import FORMATS, export_data, import_data
+from database_seeder.generator import generate_dataset
+
+HABITS = 200
+YEARS = 5
+
+def run():
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Database(os.path.join(tmp, 'source.db'))
+        initialize_database(source)
+        counts = generate_dataset(HABITS, YEARS, seed=42, database=source)
+        print(f"{counts['habits']} habits with {counts['completions']} completions")
+
+        for fmt in FORMATS:
+            path = os.path.join(tmp, f"export.{fmt}")
+            start = time.perf_counter()
+            export_data(path, database=source)
+            export_seconds = time.perf_counter() - start
+
+            target = Database(os.path.join(tmp, f"target-{fmt}.db"))
+            initialize_database(target)
+            start = time.perf_counter()
+            import_data(path, database=target)
+            import_seconds = time.perf_counter() - start
+            target.close()
+
+            print(f"{fmt:<6} {os.path.getsize(path) / 2 ** 20:>8.2f} MiB  export {export_seconds:>6.2f} s  "
+                  f"import {import_seconds:>6.2f} s")
+        source.close()
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,136 @@
+# Benchmark suite for the hot paths of the Habit Tracking App at different dataset sizes.
+# Run from the project root: python -m benchmarks.run_benchmarks --sizes 1k,100k --json results.json
+# The 10M dataset takes a few minutes to generate, add it with --sizes 1k,100k,10M.
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+from app.analytics import filter_by_periodicity, longest_streak
+from app.database import initialize_database, using_database
+from app.habit import Habit
+from app.habit_manager import HabitManager
+from database_seeder.generator import generate_dataset
+
+# Minimum time and number of runs per measured operation.
+MIN_SECONDS = 0.5
+MIN_ITERATIONS = 3
+
+DENSITY = 0.8
+WEEKLY_SHARE = 0.3
+
+# Parses sizes like "1k", "100k" or "10M" into numbers of completions.
+def parse_size(text):
+    factors = {"k": 1000, "m": 1000000}
+    suffix = text[-1].lower()
+    if suffix in factors:
+        return int(float(text[:-1]) * factors[suffix])
+    return int(text)
+
+# Returns the number of habits and years of history that produce about size completions.
+def dataset_shape(size):
+    habits = max(10, min(10000, size // 1000))
+    completions_per_year = DENSITY * (365 * (1 - WEEKLY_SHARE) + 52 * WEEKLY_SHARE)
+    years = size / (habits * completions_per_year)
+    return habits, years
+
+# Runs func repeatedly and returns the timing statistics in milliseconds.
+def measure(func):
+    durations = []
+    started = time.perf_counter()
+    iteration = 0
+    while iteration < MIN_ITERATIONS or time.perf_counter() - started < MIN_SECONDS:
+        start = time.perf_counter()
+        func(iteration)
+        durations.append(time.perf_counter() - start)
+        iteration += 1
+
+    durations.sort()
+    return {
+        "iterations": len(durations),
+        "mean_ms": sum(durations) / len(durations) * 1000,
+        "median_ms": durations[len(durations) // 2] * 1000,
+        "min_ms": durations[0] * 1000,
+        "ops_per_sec": len(durations) / sum(durations),
+    }
+
+# Generates a dataset of the given size in a temporary database and times every benchmarked operation on it.
+# The shared pool is pointed to the temporary database only while the benchmarks run.
+def run_size(size, seed):
+    results = []
+    habits, years = dataset_shape(size)
+    today = date.today()
+
+    with tempfile.TemporaryDirectory() as tmp, using_database(os.path.join(tmp, 'bench.db')):
+        initialize_database()
+
+        start = time.perf_counter()
+        counts = generate_dataset(habits, years, DENSITY, seed=seed, weekly_share=WEEKLY_SHARE, end_date=today)
+        seconds = time.perf_counter() - start
+        results.append({"operation": "generate_dataset", "iterations": 1, "mean_ms": seconds * 1000,
+                        "median_ms": seconds * 1000, "min_ms": seconds * 1000,
+                        "ops_per_sec": counts["completions"] / seconds})
+
+        manager = HabitManager()
+        habit = manager.list_habits()[0]
+        status_date = today.isoformat()
+        future = today + timedelta(days=1)
+
+        operations = {
+            "create_habit": lambda i: manager.create_habit(f"Benchmark {i}", "Benchmark habit", "daily"),
+            "mark_habit_completed": lambda i: manager.mark_habit_completed(habit.id, future + timedelta(days=i)),
+            "check_habits_status": lambda i: manager.check_habits_status(status_date),
+            "get_pending_habits": lambda i: manager.get_pending_habits(status_date),
+            "longest_streak": lambda i: longest_streak(),
+            "filter_by_periodicity": lambda i: filter_by_periodicity("daily"),
+            "Habit.get_current_streak": lambda i: Habit.get_current_streak(habit),
+        }
+        for name, operation in operations.items():
+            # create_habit prints a confirmation for every habit
+            with contextlib.redirect_stdout(io.StringIO()):
+                stats = measure(operation)
+            results.append({"operation": name, **stats})
+
+    for result in results:
+        result.update({"size": size, "habits": counts["habits"], "completions": counts["completions"]})
+    return results
+
+# Formats one result as a line of the benchmark table.
+def format_result(result):
+    return (f"{result['completions']:>10} completions  {result['operation']:<26} "
+            f"{result['median_ms']:>10.3f} ms  {result['ops_per_sec']:>12,.1f} ops/sec")
+
+# Runs the benchmarks for comma separated sizes and returns the report, calling on_result for every result.
+def run(sizes, seed, on_result=None):
+    results = []
+    for size in sizes.split(","):
+        for result in run_size(parse_size(size), seed):
+            results.append(result)
+            if on_result:
+                on_result(result)
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "results": results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Habit Tracking App.")
+    parser.add_argument("--sizes", default="1k,100k", help="comma separated numbers of completions, e.g. 1k,100k,10M")
+    parser.add_argument("--seed", type=int, default=42, help="seed of the synthetic data generator")
+    parser.add_argument("--json", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    report = run(args.sizes, args.seed, on_result=lambda result: print(format_result(result)))
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(report, file, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+from datetime import date, timedelta
+import argparse
+import random
+from app.database import get_database, initialize_database
+from app.habit_manager import HabitManager
+
+# Generates a synthetic dataset of any size for benchmarks and load tests.
+# Habits are inserted with executemany and completions are streamed into the bulk import,
+# so even millions of completions never have to be held in memory at once.
+def generate_dataset(habits=100, years=1, density=0.8, seed=None, weekly_share=0.3, end_date=None,
+                     prefix="Synthetic", database=None):
+    database = database or get_database()
+    rng = random.Random(seed)
+    end_date = end_date or date.today()
+    start_date = end_date - timedelta(days=int(years * 365) - 1)
+
+    # Create the habits in one transaction
+    new_habits = []
+    for number in range(habits):
+        periodicity = "weekly" if rng.random() < weekly_share else "daily"
+        new_habits.append((f"{prefix} {number:07d}", f"Generated {periodicity} habit", periodicity,
+                           start_date.isoformat()))
+
+    with database.connection() as conn:
+        conn.executemany('''
+            INSERT OR IGNORE INTO habits (name, description, periodicity, creation_date)
+            VALUES (?, ?, ?, ?)
+        ''', new_habits)
+        cursor = conn.execute("SELECT id, periodicity FROM habits WHERE name >= ? AND name < ? ORDER BY name",
+                              (f"{prefix} ", f"{prefix}!"))
+        habit_rows = cursor.fetchall()
+
+    # Daily habits are done on a day with the given density, weekly habits once in a week on a random day.
+    def completions():
+        first_day = start_date.toordinal()
+        last_day = end_date.toordinal()
+        for habit_id, periodicity in habit_rows:
+            if periodicity == "daily":
+                for day in range(first_day, last_day + 1):
+                    if rng.random() < density:
+                        yield habit_id, date.fromordinal(day)
+            else:
+                for week_start in range(first_day, last_day + 1, 7):
+                    if rng.random() < density:
+                        yield habit_id, date.fromordinal(min(week_start + rng.randint(0, 6), last_day))
+
+    result = HabitManager(database).mark_habits_completed_bulk(completions())
+    return {"habits": len(habit_rows), "completions": result["inserted"]}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill the habit database with synthetic data.")
+    parser.add_argument("--habits", type=int, default=100, help="number of habits to create")
+    parser.add_argument("--years", type=float, default=1, help="years of completion history")
+    parser.add_argument("--density", type=float, default=0.8, help="share of periods with a completion")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the random number generator")
+    args = parser.parse_args()
+
+    initialize_database()
+    counts = generate_dataset(args.habits, args.years, args.density, args.seed)
+    print(f"Generated {counts['habits']} habits with {counts['completions']} completions.")
@@ -1,12 +1,11 @@
-import sqlite3
 from datetime import datetime, timedelta
 import random
-
-DB_FILE = 'habits.db'
+from app.database import get_database
+from app.streaks import rebuild_streaks
 
 # Seeds the database with test data.
-def seed_database():
-    conn = sqlite3.connect(DB_FILE)
+def seed_database(database=None):
+    conn = (database or get_database()).connection()
     cursor = conn.cursor()
 
     # 5 Daily Habits
@@ -85,7 +84,9 @@ def seed_database():
             ''', (habit_id, random_date.strftime("%Y-%m-%d")))
 
     conn.commit()
-    conn.close()
+
+    # The completions above are written directly, so the streak summaries are rebuilt afterwards.
+    rebuild_streaks(database)
 
     print("Database seeded successfully with test data.")
 
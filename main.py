@@ -1,9 +1,204 @@
-from app.database import initialize_database
-from app.cli import display_menu
+import argparse
+import sys
 
-if __name__ == "__main__":
-    # Initializing the Database
+# The app modules are imported inside the commands, so "--help" and simple commands start quickly.
+
+# Returns a habit as a dictionary for the JSON output.
+def habit_to_dict(habit):
+    return {"id": habit.id, "name": habit.name, "description": habit.description,
+            "periodicity": habit.periodicity, "creation_date": habit.creation_date}
+
+# Returns the date argument or today as an ISO date.
+def date_or_today(value):
+    from datetime import date
+    return value or date.today().isoformat()
+
+# Command "add": creates a habit.
+def command_add(args):
+    from app.habit_manager import HabitManager
+    habit = HabitManager().create_habit(args.name, args.description, args.periodicity)
+    return habit_to_dict(habit), f"Habit '{habit.name}' created successfully."
+
+# Command "done": marks a habit as completed by its name.
+def command_done(args):
+    from app.habit_manager import HabitManager
+    manager = HabitManager()
+    completion_date = date_or_today(args.date)
+    inserted = manager.mark_habit_completed(manager.get_habit_id_by_name(args.name), completion_date)
+    result = {"name": args.name, "date": completion_date, "inserted": inserted}
+    if inserted:
+        return result, f"Habit '{args.name}' marked as completed on {completion_date}."
+    return result, f"Habit '{args.name}' was already completed on {completion_date}."
+
+# Command "status": lists the completed and pending habits of a date.
+def command_status(args):
+    from app.habit_manager import HabitManager
+    status_date = date_or_today(args.date)
+    completed, pending = HabitManager().check_habits_status(status_date)
+    result = {
+        "date": status_date,
+        "completed": [{"name": name, "periodicity": periodicity, "last_completed": last}
+                      for name, periodicity, last in completed],
+        "pending": [{"name": name, "periodicity": periodicity, "last_completed": last}
+                    for name, periodicity, last in pending],
+    }
+    lines = [f"Status on {status_date}:"]
+    for status in ("completed", "pending"):
+        for habit in result[status]:
+            lines.append(f"- [{status}] {habit['name']} ({habit['periodicity']} / Last Completed: {habit['last_completed']})")
+    return result, "\n".join(lines)
+
+# Command "history": lists the completions of a habit, all of them or only from --start to --end.
+def command_history(args):
+    from app.habit_manager import HabitManager
+    manager = HabitManager()
+    completions = manager.get_habit_completions(manager.get_habit_id_by_name(args.name), start=args.start, end=args.end)
+    result = {"name": args.name, "start": args.start, "end": args.end, "completions": completions}
+    return result, "\n".join(f"- {completion_date}" for completion_date in completions) or "No completions found."
+
+# Command "streaks": shows the longest and current streak of every habit.
+def command_streaks(args):
+    from app.analytics import streak_leaderboard
+    leaderboard = streak_leaderboard()
+    lines = []
+    for periodicity, habits in leaderboard.items():
+        unit = "weeks" if periodicity == "weekly" else "days"
+        for habit in habits:
+            lines.append(f"- {habit['name']} ({periodicity}): longest {habit['longest']} {unit}, current {habit['current']} {unit}")
+    return leaderboard, "\n".join(lines) or "No habits found."
+
+# Command "list": lists all habits or the habits of one periodicity.
+def command_list(args):
+    from app.habit_manager import HabitManager
+    habits = [habit_to_dict(habit) for habit in HabitManager().iter_habits(args.periodicity, order_by="name")]
+    lines = [f"- {habit['name']} ({habit['periodicity']}): {habit['description']}" for habit in habits]
+    return habits, "\n".join(lines) or "No habits found."
+
+# Command "seed": fills the database with the sample habits.
+def command_seed(args):
+    from database_seeder.seeder import seed_database
+    seed_database()
+    return {"seeded": True}, "Database seeded successfully."
+
+# Command "bench": runs the benchmark suite on temporary databases, the database of --db is left untouched.
+def command_bench(args):
+    from benchmarks.run_benchmarks import format_result, run
+    report = run(args.sizes, args.seed)
+    return report, "\n".join(format_result(result) for result in report["results"])
+
+# Command "stats": runs the main read operations with instrumentation and shows their timings.
+def command_stats(args):
+    from datetime import date, timedelta
+    from app import analytics, instrumentation
+    from app.habit_manager import HabitManager
+    today = date.today()
+
+    instrumentation.enable()
+    instrumentation.reset()
+    try:
+        manager = HabitManager()
+        for _ in range(args.repeat):
+            manager.list_habits()
+            manager.list_habits_with_details()
+            manager.check_habits_status(today.isoformat())
+            analytics.longest_streak()
+            analytics.filter_by_periodicity("daily")
+            analytics.completion_rates(today - timedelta(days=29), today)
+        stats = instrumentation.get_stats()
+    finally:
+        instrumentation.disable()
+    return stats, "\n".join(instrumentation.format_stats(args.limit))
+
+COMMANDS = {
+    "add": command_add,
+    "done": command_done,
+    "status": command_status,
+    "history": command_history,
+    "streaks": command_streaks,
+    "list": command_list,
+    "seed": command_seed,
+    "bench": command_bench,
+    "stats": command_stats,
+}
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Habit Tracking App. Without a command the interactive menu starts.")
+    parser.add_argument("--db", help="path of the database file (default: habits.db or HABITS_DB)")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    commands = parser.add_subparsers(dest="command")
+
+    add = commands.add_parser("add", help="create a habit")
+    add.add_argument("name")
+    add.add_argument("--description", default="")
+    add.add_argument("--periodicity", choices=["daily", "weekly"], default="daily")
+
+    done = commands.add_parser("done", help="mark a habit as completed")
+    done.add_argument("name")
+    done.add_argument("--date", help="completion date (YYYY-MM-DD, default: today)")
+
+    status = commands.add_parser("status", help="show completed and pending habits")
+    status.add_argument("--date", help="date to check (YYYY-MM-DD, default: today)")
+
+    history = commands.add_parser("history", help="list the completions of a habit")
+    history.add_argument("name")
+    history.add_argument("--start", help="first date (YYYY-MM-DD, default: first completion)")
+    history.add_argument("--end", help="last date (YYYY-MM-DD, default: last completion)")
+
+    commands.add_parser("streaks", help="show the longest and current streak of every habit")
+
+    list_command = commands.add_parser("list", help="list habits")
+    list_command.add_argument("--periodicity", choices=["daily", "weekly"])
+
+    commands.add_parser("seed", help="seed the database with sample data")
+
+    bench = commands.add_parser("bench", help="run the benchmark suite")
+    bench.add_argument("--sizes", default="1k", help="comma separated numbers of completions, e.g. 1k,100k")
+    bench.add_argument("--seed", type=int, default=42)
+
+    stats = commands.add_parser("stats", help="profile the main operations on the database")
+    stats.add_argument("--repeat", type=int, default=10, help="number of runs of every operation")
+    stats.add_argument("--limit", type=int, default=30, help="number of rows in the timing table")
+    return parser
+
+# Runs a command line and returns the exit code.
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    from app.database import configure_database, initialize_database
+    if args.db:
+        configure_database(args.db)
+    # Only runs DDL if the schema version of the database is not up to date.
     initialize_database()
 
-    # Start CLI
-    display_menu()
+    if args.command is None:
+        from app.cli import display_menu
+        display_menu()
+        return 0
+
+    import contextlib
+    import io
+    import json
+    import os
+    import sqlite3
+
+    # HABITS_INSTRUMENT=1 prints the timings of the command to stderr.
+    instrument = os.environ.get("HABITS_INSTRUMENT") == "1" and args.command != "stats"
+    if instrument:
+        from app import instrumentation
+        instrumentation.enable()
+    try:
+        # The manager prints confirmations of its own, every command reports its result itself.
+        with contextlib.redirect_stdout(io.StringIO()):
+            result, text = COMMANDS[args.command](args)
+    except (ValueError, sqlite3.IntegrityError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if instrument:
+            print("\n".join(instrumentation.format_stats()), file=sys.stderr)
+
+    print(json.dumps(result, indent=2) if args.json else text)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
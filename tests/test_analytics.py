@@ -1,7 +1,10 @@
 import unittest
 import sqlite3
-from app.analytics import longest_streak, filter_by_periodicity
-from app.database import initialize_database, reset_database
+from datetime import date
+from app.analytics import (completion_rates, filter_by_periodicity, habit_completion_rate, longest_streak, monthly_trend,
+                           most_struggled_habit, streak_leaderboard, weekday_heatmap)
+from app.database import initialize_database, reset_database, BULK_SKIPPED_TRIGGERS
+from app.habit_manager import HabitManager
 
 class TestAnalytics(unittest.TestCase):
     @classmethod
@@ -46,6 +49,30 @@ class TestAnalytics(unittest.TestCase):
         self.assertEqual(streak['weekly']['name'], 'Read')
         self.assertEqual(streak['weekly']['streak'], 2)
 
+    # Test the per habit streaks of the leaderboard
+    def test_streak_leaderboard(self):
+        leaderboard = streak_leaderboard(today=date(2024, 12, 17))
+
+        self.assertEqual(leaderboard['daily'], [{"id": 1, "name": "Exercise", "longest": 2, "current": 0}])
+        self.assertEqual(leaderboard['weekly'], [{"id": 2, "name": "Read", "longest": 2, "current": 2}])
+
+    # Test that weekly streaks follow weeks starting on Monday
+    def test_weekly_streak_uses_iso_weeks(self):
+        conn = sqlite3.connect('habits.db')
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO habits (name, description, periodicity, creation_date) VALUES (?, ?, ?, ?)",
+                       ("Clean", "Weekly cleaning", "weekly", "2024-12-01"))
+        # Sunday and the following Monday are in consecutive weeks, Monday and Sunday of one week are not.
+        cursor.executemany("INSERT INTO completion (habit_id, completion_date) VALUES (?, ?)",
+                           [(3, "2024-11-25"), (3, "2024-12-01"), (3, "2024-12-02"), (3, "2024-12-08"), (3, "2024-12-09")])
+        conn.commit()
+        conn.close()
+
+        leaderboard = streak_leaderboard(today=date(2024, 12, 9))
+        clean = [habit for habit in leaderboard['weekly'] if habit['name'] == "Clean"][0]
+        self.assertEqual(clean['longest'], 3)
+        self.assertEqual(clean['current'], 3)
+
     # Test analytics for habit filter
     def test_filter_by_periodicity(self):
         daily_habits = filter_by_periodicity("daily")
@@ -56,5 +83,60 @@ class TestAnalytics(unittest.TestCase):
         self.assertEqual(len(weekly_habits), 1)
         self.assertEqual(weekly_habits[0].name, "Read")
 
+    # Test completion rates over a window that starts and ends inside a week
+    def test_completion_rates(self):
+        rates = completion_rates("2024-12-10", "2024-12-16")
+
+        self.assertEqual([(rate["name"], rate["completed"], rate["periods"]) for rate in rates],
+                         [("Exercise", 2, 7), ("Read", 1, 2)])
+        self.assertEqual(most_struggled_habit("2024-12-10", "2024-12-16")["name"], "Exercise")
+
+    # Test that the bitmap based rate of one habit matches the rollup based rates
+    def test_habit_completion_rate(self):
+        rates = completion_rates("2024-12-10", "2024-12-16")
+
+        for rate in rates:
+            self.assertEqual(habit_completion_rate(rate["id"], "2024-12-10", "2024-12-16"), rate)
+        with self.assertRaises(ValueError):
+            habit_completion_rate(99, "2024-12-10", "2024-12-16")
+
+    # Test the completions per weekday of all habits and of one habit
+    def test_weekday_heatmap(self):
+        self.assertEqual(weekday_heatmap("2024-12-01", "2024-12-31"), [2, 1, 1, 0, 0, 0, 0])
+        self.assertEqual(weekday_heatmap("2024-12-01", "2024-12-31", habit_id=1), [0, 1, 1, 0, 0, 0, 0])
+
+    # Test the monthly trend and that the rollups follow removed completions
+    def test_monthly_trend(self):
+        HabitManager().unmark_habit_completed(1, "2024-12-11")
+
+        self.assertEqual(monthly_trend(2, today=date(2024, 12, 20)),
+                         [{"month": "2024-11", "completions": 0}, {"month": "2024-12", "completions": 3}])
+        self.assertEqual(completion_rates("2024-12-09", "2024-12-15")[0]["completed"], 1)
+
+    # Test that bulk imports update the rollups once per chunk like the triggers do for single writes and restore the triggers
+    def test_bulk_import_rollups(self):
+        manager = HabitManager()
+        # Small chunks that share weeks and months, a week split between November and December and existing completions.
+        days = ["2024-11-28", "2024-11-29", "2024-12-01", "2024-12-02", "2024-12-03", "2024-12-10", "2024-12-30",
+                "2025-01-02"]
+        result = manager.mark_habits_completed_bulk([(habit_id, day) for habit_id in (1, 2) for day in days],
+                                                    chunk_size=3)
+        self.assertEqual(result, {"inserted": 15, "skipped": 1})
+
+        conn = sqlite3.connect('habits.db')
+        weekly, monthly = {}, {}
+        for habit_id, day in conn.execute("SELECT habit_id, completion_day FROM completion").fetchall():
+            completions, mask = weekly.get((habit_id, (day - 1) // 7), (0, 0))
+            weekly[habit_id, (day - 1) // 7] = (completions + 1, mask | 1 << (day - 1) % 7)
+            month = date.fromordinal(day).year * 12 + date.fromordinal(day).month - 1
+            monthly[habit_id, month] = monthly.get((habit_id, month), 0) + 1
+        self.assertEqual({(row[0], row[1]): (row[2], row[3]) for row in conn.execute("SELECT * FROM completion_weekly")},
+                         weekly)
+        self.assertEqual({(row[0], row[1]): row[2] for row in conn.execute("SELECT * FROM completion_monthly")}, monthly)
+        # The insert triggers are back for single writes.
+        self.assertEqual({row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+                         & set(BULK_SKIPPED_TRIGGERS), set(BULK_SKIPPED_TRIGGERS))
+        conn.close()
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,83 @@
+import asyncio
+import sqlite3
+import unittest
+from datetime import date, timedelta
+from app.async_manager import AsyncHabitManager
+from app.bitmaps import build_bitmap
+from app.database import get_connection, initialize_database, reset_database
+from app.habit_manager import HabitManager
+from app.streaks import get_streak_summary
+
+class TestAsyncHabitManager(unittest.IsolatedAsyncioTestCase):
+    # Reset the database before each test.
+    def setUp(self):
+        reset_database()
+        initialize_database()
+
+    async def asyncSetUp(self):
+        self.manager = AsyncHabitManager()
+
+    async def asyncTearDown(self):
+        await self.manager.close()
+
+    # Test that concurrent completions are all written in fewer transactions
+    async def test_concurrent_completions_coalesced(self):
+        habit = await self.manager.create_habit("Exercise", "Daily exercise", "daily")
+        dates = [(date(2024, 1, 1) + timedelta(days=i)).isoformat() for i in range(200)]
+
+        await asyncio.gather(*(self.manager.mark_habit_completed(habit.id, day) for day in dates))
+
+        self.assertEqual(HabitManager().get_habit_completions(habit.id), dates)
+        self.assertLess(self.manager.batches, len(dates))
+        leaderboard = await self.manager.streak_leaderboard(today=date(2024, 7, 18))
+        self.assertEqual(leaderboard["daily"][0]["longest"], 200)
+
+    # Test that completions report whether they were inserted, also for duplicates queued in the same batch
+    async def test_duplicate_completion(self):
+        habit = await self.manager.create_habit("Exercise", "Daily exercise", "daily")
+
+        results = await asyncio.gather(*(self.manager.mark_habit_completed(habit.id, day)
+                                         for day in ["2024-12-10", "2024-12-11", "2024-12-10"]))
+        self.assertEqual(results, [True, True, False])
+        self.assertFalse(await self.manager.mark_habit_completed(habit.id, date(2024, 12, 11)))
+        self.assertEqual(HabitManager().get_habit_completions(habit.id), ["2024-12-10", "2024-12-11"])
+
+    # Test that coalesced completions leave the same bitmap and streak summary as the blocking API
+    async def test_completions_update_bitmap_and_streak(self):
+        habit = await self.manager.create_habit("Exercise", "Daily exercise", "daily")
+        days = ["2024-12-10", "2024-12-11", "2024-11-01", "2024-12-12"]
+
+        await asyncio.gather(*(self.manager.mark_habit_completed(habit.id, day) for day in days))
+
+        conn = get_connection()
+        stored = conn.execute("SELECT base_day, days, weeks FROM completion_bitmap WHERE habit_id = ?",
+                              (habit.id,)).fetchone()
+        rebuilt = build_bitmap(conn, habit.id)
+        self.assertEqual(stored, (rebuilt.base_day, rebuilt.days, rebuilt.weeks))
+        self.assertEqual(get_streak_summary(conn, habit.id)[2:], (3, "2024-12-12"))
+
+    # Test that invalid dates are rejected before they are queued
+    async def test_invalid_date(self):
+        with self.assertRaises(ValueError):
+            await self.manager.mark_habit_completed(1, "2024-13-01")
+
+    # Test that the status and analytics calls return the results of the blocking API
+    async def test_reads(self):
+        daily = await self.manager.create_habit("Exercise", "Daily exercise", "daily")
+        await self.manager.create_habit("Read", "Weekly reading", "weekly")
+        await self.manager.mark_habit_completed(daily.id, "2024-12-10")
+
+        completed, pending = await self.manager.check_habits_status("2024-12-10")
+        self.assertEqual([row[0] for row in completed], ["Exercise"])
+        self.assertEqual([row[1] for row in await self.manager.get_pending_habits("2024-12-10")], ["Read"])
+        self.assertEqual((await self.manager.longest_streak())["daily"], {"name": "Exercise", "streak": 1})
+        self.assertEqual([habit.name for habit in await self.manager.filter_by_periodicity("weekly")], ["Read"])
+
+    # Test that errors of a call are raised in the calling coroutine
+    async def test_error_propagates(self):
+        await self.manager.create_habit("Exercise", "Daily exercise", "daily")
+        with self.assertRaises(sqlite3.IntegrityError):
+            await self.manager.create_habit("Exercise", "Daily exercise", "daily")
+
+if __name__ == "__main__":
+    unittest.main()
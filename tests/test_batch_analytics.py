@@ -0,0 +1,73 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import date
+from app.batch_analytics import analyze_file, collect_paths, run_batch
+from app.database import Database, initialize_database
+from app.habit_manager import HabitManager
+
+class TestBatchAnalytics(unittest.TestCase):
+    # Create two habit databases and a broken file in a temporary directory before each test.
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.paths = [self.create_database("alice", 2), self.create_database("bob", 3)]
+        self.broken = os.path.join(self.tmp.name, "broken.db")
+        with open(self.broken, "w") as file:
+            file.write("not a database")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    # Creates a database with a daily habit completed on the last days up to 2024-12-15.
+    def create_database(self, name, days):
+        database = Database(os.path.join(self.tmp.name, f"{name}.db"))
+        initialize_database(database)
+        manager = HabitManager(database)
+        habit = manager.create_habit(f"Exercise {name}", "Daily exercise", "daily")
+        for day in range(days):
+            manager.mark_habit_completed(habit.id, f"2024-12-{15 - day}")
+        manager.create_habit(f"Read {name}", "Weekly reading", "weekly")
+        database.close()
+        return database.path
+
+    # Test the streaks and completion rates of one file
+    def test_analyze_file(self):
+        result = analyze_file(self.paths[1], today=date(2024, 12, 15))
+
+        self.assertIsNone(result["error"])
+        exercise = [habit for habit in result["habits"] if habit["name"] == "Exercise bob"][0]
+        self.assertEqual((exercise["longest"], exercise["current"], exercise["completion_rate"]), (3, 3, 1.0))
+
+    # Test that the batch merges all files and reports broken ones
+    def test_run_batch(self):
+        report, results = run_batch(collect_paths([self.tmp.name]), max_workers=2, today=date(2024, 12, 15))
+
+        self.assertEqual(report["files"], 3)
+        self.assertEqual(report["habits"], 4)
+        self.assertEqual(report["longest"]["daily"]["name"], "Exercise bob")
+        self.assertEqual([failure["path"] for failure in report["failed"]], [self.broken])
+        self.assertEqual(len(report["seconds"]), 3)
+
+    # Test that a file with the schema of the first version of the app is migrated and analyzed
+    def test_run_batch_old_schema(self):
+        path = os.path.join(self.tmp.name, "carol.db")
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE habits (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL UNIQUE, "
+                     "description TEXT, periodicity TEXT NOT NULL, creation_date TEXT NOT NULL)")
+        conn.execute("CREATE TABLE completion (id INTEGER PRIMARY KEY AUTOINCREMENT, habit_id INTEGER NOT NULL, "
+                     "completion_date TEXT NOT NULL)")
+        conn.execute("INSERT INTO habits VALUES (1, 'Exercise carol', 'Daily exercise', 'daily', '2024-12-09')")
+        conn.executemany("INSERT INTO completion (habit_id, completion_date) VALUES (1, ?)",
+                         [(f"2024-12-{day}",) for day in range(10, 16)])
+        conn.commit()
+        conn.close()
+
+        report, results = run_batch([path, *self.paths], max_workers=2, today=date(2024, 12, 15))
+
+        self.assertIsNone(results[0]["error"])
+        self.assertEqual(report["failed"], [])
+        self.assertEqual(report["longest"]["daily"], {"path": path, "name": "Exercise carol", "streak": 6})
+
+if __name__ == "__main__":
+    unittest.main()
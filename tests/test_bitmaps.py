@@ -0,0 +1,90 @@
+import random
+import sqlite3
+import unittest
+from datetime import date
+from app.bitmaps import CompletionBitmap, build_bitmap, longest_run, rebuild_bitmaps
+from app.database import get_connection, initialize_database, reset_database
+from app.habit_manager import HabitManager
+from app.streak_engine import summarize_periods
+
+class TestBitmaps(unittest.TestCase):
+    # Reset the database before each test.
+    def setUp(self):
+        reset_database()
+        initialize_database()
+        self.manager = HabitManager()
+
+    # Test the bit tricks against the streak engine on random histories
+    def test_runs_match_streak_engine(self):
+        generator = random.Random(7)
+        for _ in range(200):
+            days = sorted(generator.sample(range(739000, 739400), generator.randint(1, 300)))
+            bitmap = CompletionBitmap(date(2024, 1, 1).toordinal())
+            for day in days:
+                bitmap = bitmap.with_day(day)
+            added = CompletionBitmap(date(2024, 1, 1).toordinal()).with_days(generator.sample(days, len(days)))
+            self.assertEqual((added.base_day, added.days, added.weeks), (bitmap.base_day, bitmap.days, bitmap.weeks))
+
+            for periodicity in ("daily", "weekly"):
+                periods = sorted({day if periodicity == "daily" else (day - 1) // 7 for day in days})
+                self.assertEqual(bitmap.summarize(periodicity), summarize_periods(periods))
+            self.assertEqual(bitmap.last_day(), days[-1])
+            self.assertEqual(bitmap.count(739100, 739199), len([day for day in days if 739100 <= day <= 739199]))
+            self.assertEqual(bitmap.count(739100, 739199, "weekly"),
+                             len({(day - 1) // 7 for day in days if 739100 <= day <= 739199}))
+        self.assertEqual(longest_run(0), 0)
+
+    # Test that added and removed completions update the bitmap like a rebuild
+    def test_incremental_updates(self):
+        habit = self.manager.create_habit("Exercise", "Daily exercise", "daily")
+        for completion_date in ("2024-12-10", "2024-12-11", "2024-11-01", "2024-12-17"):
+            self.assertTrue(self.manager.mark_habit_completed(habit.id, completion_date))
+        self.assertFalse(self.manager.mark_habit_completed(habit.id, "2024-12-11"))
+        self.manager.unmark_habit_completed(habit.id, "2024-12-17")
+
+        conn = get_connection()
+        stored = conn.execute("SELECT base_day, days, weeks FROM completion_bitmap WHERE habit_id = ?",
+                              (habit.id,)).fetchone()
+        rebuilt = build_bitmap(conn, habit.id)
+        self.assertEqual(stored, (rebuilt.base_day, rebuilt.days, rebuilt.weeks))
+        self.assertEqual(rebuilt.base_day, date(2024, 10, 28).toordinal())
+        self.assertFalse(rebuilt.has_week((date(2024, 12, 17).toordinal() - 1) // 7))
+
+    # Test that bulk imports add their completions to the stored bitmap like a rebuild
+    def test_bulk_import_updates_bitmap(self):
+        habit = self.manager.create_habit("Exercise", "Daily exercise", "daily")
+        self.manager.mark_habit_completed(habit.id, "2024-12-10")
+        days = ["2024-12-10", "2024-12-11", "2024-11-01", "2024-12-17", "2023-12-31"]
+        self.assertEqual(self.manager.mark_habits_completed_bulk([(habit.id, day) for day in days], chunk_size=2),
+                         {"inserted": 4, "skipped": 1})
+
+        conn = get_connection()
+        stored = conn.execute("SELECT base_day, days, weeks FROM completion_bitmap WHERE habit_id = ?",
+                              (habit.id,)).fetchone()
+        rebuilt = build_bitmap(conn, habit.id)
+        self.assertEqual(stored, (rebuilt.base_day, rebuilt.days, rebuilt.weeks))
+        self.assertEqual(rebuilt.base_day, date(2023, 12, 25).toordinal())
+
+    # Test that writes by other programs drop the bitmap, so the status stays correct
+    def test_external_writes_invalidate_bitmap(self):
+        habit = self.manager.create_habit("Read", "Weekly reading", "weekly")
+        self.manager.mark_habit_completed(habit.id, "2024-12-09")
+        self.assertEqual(self.manager.check_habits_status("2024-12-18"), ([], [("Read", "weekly", "2024-12-09")]))
+
+        conn = sqlite3.connect("habits.db")
+        conn.execute("INSERT INTO completion (habit_id, completion_date) VALUES (?, ?)", (habit.id, "2024-12-20"))
+        conn.execute("INSERT INTO habits (name, description, periodicity, creation_date) "
+                     "VALUES ('Walk', 'Daily walk', 'daily', '2024-12-01')")
+        conn.commit()
+        conn.close()
+
+        # Reading the status falls back to the completion index for the missing bitmap without writing it.
+        changes = get_connection().total_changes
+        self.assertEqual(self.manager.check_habits_status("2024-12-18"),
+                         ([("Read", "weekly", "2024-12-20")], [("Walk", "daily", "Never")]))
+        self.assertEqual(self.manager.get_pending_habits("2024-12-25", limit=1), [(habit.id, "Read", "weekly", "2024-12-20")])
+        self.assertEqual(get_connection().total_changes, changes)
+        self.assertEqual(rebuild_bitmaps(), 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import sqlite3
+import unittest
+from app.analytics import filter_by_periodicity
+from app.cache import HabitCache, get_habit_cache
+from app.database import get_database, initialize_database, reset_database
+from app.habit import Habit
+from app.habit_manager import HabitManager
+
+class TestHabitCache(unittest.TestCase):
+    # Reset the database before each test.
+    def setUp(self):
+        reset_database()
+        initialize_database()
+        self.manager = HabitManager()
+        self.cache = get_habit_cache(get_database())
+        self.cache.clear()
+
+    # Test that repeated lookups are served from the cache
+    def test_lookup_hits_cache(self):
+        habit = self.manager.create_habit("Exercise", "Daily exercise", "daily")
+        self.assertEqual(self.manager.get_habit_id_by_name("Exercise"), habit.id)
+        hits = self.cache.hits
+
+        self.assertEqual(self.manager.get_habit_id_by_name("Exercise"), habit.id)
+        self.assertEqual(self.cache.hits, hits + 1)
+
+    # Test that the manager's own writes invalidate cached habits and lists
+    def test_invalidated_by_manager_writes(self):
+        self.manager.create_habit("Exercise", "Daily exercise", "daily")
+        self.assertEqual(len(self.manager.list_habits()), 1)
+        self.assertEqual(len(filter_by_periodicity("weekly")), 0)
+
+        self.manager.edit_habit("Exercise", new_name="Run", new_periodicity="weekly")
+        self.manager.create_habit("Read", "Weekly reading", "weekly")
+
+        self.assertEqual(len(self.manager.list_habits()), 2)
+        self.assertEqual([habit.name for habit in filter_by_periodicity("weekly")], ["Run", "Read"])
+        with self.assertRaises(ValueError):
+            self.manager.get_habit_id_by_name("Exercise")
+
+    # Test that writes by another connection are detected
+    def test_invalidated_by_external_writer(self):
+        self.manager.create_habit("Exercise", "Daily exercise", "daily")
+        self.assertEqual(self.manager.get_habit_by_name("Exercise").description, "Daily exercise")
+
+        conn = sqlite3.connect('habits.db')
+        conn.execute("UPDATE habits SET description = 'Run 5 km' WHERE name = 'Exercise'")
+        conn.commit()
+        conn.close()
+
+        self.assertEqual(self.manager.get_habit_by_name("Exercise").description, "Run 5 km")
+
+    # Test that the least recently used habit is evicted
+    def test_lru_eviction(self):
+        cache = HabitCache(max_entries=2)
+        for habit_id in range(1, 4):
+            cache.put(Habit(habit_id, f"Habit {habit_id}", "", "daily", "2024-12-09"))
+
+        self.assertIsNone(cache.get(1))
+        self.assertIsNone(cache.get_by_name("Habit 1"))
+        self.assertEqual(cache.get_by_name("Habit 3").id, 3)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,7 @@
 import sqlite3
 import unittest
 from unittest.mock import patch
-from app.cli import display_menu
+from app.cli import display_menu, VIEW_PAGE_SIZE
 from app.database import initialize_database, reset_database
 
 class TestCLI(unittest.TestCase):
@@ -109,5 +109,24 @@ class TestCLI(unittest.TestCase):
         self.assertIn("The longest daily streak is", output)
         self.assertIn("The longest weekly streak is", output)
 
+    # Test that "View Habits" shows long lists page by page
+    @patch("builtins.input", side_effect=[
+        "2", "q",  # View Habits, stop after the first page
+        "10"  # Exit
+    ])
+    @patch("builtins.print")
+    def test_view_habits_paged(self, mock_print, mock_input):
+        conn = sqlite3.connect('habits.db')
+        conn.executemany("INSERT INTO habits (name, description, periodicity, creation_date) VALUES (?, '', 'daily', '2024-12-09')",
+                         [(f"Habit {number:02d}",) for number in range(VIEW_PAGE_SIZE + 5)])
+        conn.commit()
+        conn.close()
+
+        display_menu()
+
+        output = [call.args[0] for call in mock_print.call_args_list if call.args]
+        self.assertIn(f"- Habit {VIEW_PAGE_SIZE - 1:02d} (daily)", output)
+        self.assertNotIn(f"- Habit {VIEW_PAGE_SIZE:02d} (daily)", output)
+
 if __name__ == "__main__":
     unittest.main()
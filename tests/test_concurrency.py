@@ -0,0 +1,95 @@
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import date, timedelta
+from app.database import (configure_database, get_connection, get_schema_version, initialize_database, retry_on_locked,
+                          SCHEMA_VERSION, DB_FILE)
+from app.habit_manager import HabitManager
+
+PROCESSES = 6
+COMPLETIONS_PER_PROCESS = 50
+
+# Marks COMPLETIONS_PER_PROCESS completions of the shared habit and of the process's own habit.
+def mark_completions(path, worker):
+    configure_database(path, concurrent=True)
+    manager = HabitManager()
+    own_habit_id = manager.get_habit_id_by_name(f"Worker {worker}")
+    start = date(2024, 1, 1) + timedelta(days=worker * COMPLETIONS_PER_PROCESS)
+    for i in range(COMPLETIONS_PER_PROCESS):
+        completion_date = (start + timedelta(days=i)).isoformat()
+        manager.mark_habit_completed(1, completion_date)
+        manager.mark_habit_completed(own_habit_id, completion_date)
+
+class TestConcurrency(unittest.TestCase):
+    # Point the shared pool to a temporary database file in concurrency mode before each test.
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'test.db')
+        configure_database(self.path, concurrent=True)
+        initialize_database()
+
+    # Restore the default database file after each test.
+    def tearDown(self):
+        configure_database(DB_FILE)
+        self.tmp.cleanup()
+
+    # Test that the concurrency mode switches the database file to WAL
+    def test_wal_mode(self):
+        conn = get_connection()
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        self.assertEqual(conn.execute("PRAGMA synchronous").fetchone()[0], 1)
+
+    # Test that a locked database is retried until the write succeeds
+    def test_retry_on_locked(self):
+        calls = []
+
+        @retry_on_locked
+        def write():
+            calls.append(1)
+            if len(calls) < 3:
+                raise sqlite3.OperationalError("database is locked")
+            return "written"
+
+        self.assertEqual(write(), "written")
+        self.assertEqual(len(calls), 3)
+
+    # Test that other errors are not retried
+    def test_no_retry_on_other_errors(self):
+        calls = []
+
+        @retry_on_locked
+        def write():
+            calls.append(1)
+            raise sqlite3.OperationalError("no such table: habits")
+
+        with self.assertRaises(sqlite3.OperationalError):
+            write()
+        self.assertEqual(len(calls), 1)
+
+    # Test that many processes marking completions at the same time lose no writes
+    @unittest.skipUnless("fork" in multiprocessing.get_all_start_methods(), "requires the fork start method")
+    def test_concurrent_writers(self):
+        manager = HabitManager()
+        manager.create_habit("Shared", "Completed by every worker", "daily")
+        for worker in range(PROCESSES):
+            manager.create_habit(f"Worker {worker}", "Completed by one worker", "daily")
+
+        context = multiprocessing.get_context("fork")
+        processes = [context.Process(target=mark_completions, args=(self.path, worker)) for worker in range(PROCESSES)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+            self.assertEqual(process.exitcode, 0)
+
+        conn = get_connection()
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM completion").fetchone()[0],
+                         2 * PROCESSES * COMPLETIONS_PER_PROCESS)
+        self.assertEqual(conn.execute("SELECT longest_streak FROM habit_streaks WHERE habit_id = 1").fetchone()[0],
+                         PROCESSES * COMPLETIONS_PER_PROCESS)
+        self.assertEqual(get_schema_version(conn), SCHEMA_VERSION)
+
+if __name__ == "__main__":
+    unittest.main()
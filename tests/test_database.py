@@ -0,0 +1,126 @@
+import os
+import sqlite3
+import tempfile
+import threading
+from datetime import date
+import unittest
+from app.database import (Database, bulk_writes, configure_database, get_connection, get_database, get_schema_version,
+                          initialize_database, BULK_SKIPPED_TRIGGERS, INSERT_COMPLETION_SQL, SCHEMA_VERSION, DB_FILE)
+from app.habit_manager import HabitManager
+
+class TestDatabase(unittest.TestCase):
+    # Point the shared pool to a temporary database file before each test.
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'test.db')
+        configure_database(self.path)
+        initialize_database()
+
+    # Restore the default database file after each test.
+    def tearDown(self):
+        configure_database(DB_FILE)
+        self.tmp.cleanup()
+
+    # Test that a thread reuses its connection
+    def test_connection_reused_within_thread(self):
+        self.assertIs(get_connection(), get_connection())
+        self.assertEqual(get_database().path, self.path)
+
+    # Test that every thread gets its own connection
+    def test_connection_per_thread(self):
+        connections = []
+        thread = threading.Thread(target=lambda: connections.append(get_connection()))
+        thread.start()
+        thread.join()
+
+        self.assertIsNot(connections[0], get_connection())
+
+    # Test that the manager writes to the configured database file
+    def test_manager_uses_configured_path(self):
+        HabitManager().create_habit("Exercise", "Daily exercise", "daily")
+
+        other = Database(self.path)
+        cursor = other.connection().execute("SELECT name FROM habits")
+        self.assertEqual(cursor.fetchone()[0], "Exercise")
+        other.close()
+
+    # Test that closing the pool hands out fresh connections afterwards
+    def test_close(self):
+        database = get_database()
+        conn = database.connection()
+        database.close()
+
+        self.assertIsNot(database.connection(), conn)
+
+    # Test that an old database file with duplicate completions is upgraded in place
+    def test_migrate_existing_database(self):
+        configure_database(DB_FILE)
+        path = os.path.join(self.tmp.name, 'old.db')
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE habits (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL UNIQUE, "
+                     "description TEXT, periodicity TEXT NOT NULL, creation_date TEXT NOT NULL)")
+        conn.execute("CREATE TABLE completion (id INTEGER PRIMARY KEY AUTOINCREMENT, habit_id INTEGER NOT NULL, "
+                     "completion_date TEXT NOT NULL)")
+        conn.execute("INSERT INTO habits VALUES (1, 'Exercise', 'Daily exercise', 'daily', '2024-12-09')")
+        conn.executemany("INSERT INTO completion (habit_id, completion_date) VALUES (?, ?)",
+                         [(1, "2024-12-10"), (1, "2024-12-10"), (1, "2024-12-11")])
+        conn.commit()
+        conn.close()
+
+        configure_database(path)
+        initialize_database()
+        conn = get_connection()
+
+        self.assertEqual(get_schema_version(conn), SCHEMA_VERSION)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM completion").fetchone()[0], 2)
+        with self.assertRaises(sqlite3.IntegrityError):
+            conn.execute("INSERT INTO completion (habit_id, completion_date, completion_day) VALUES (1, '2024-12-11', 739231)")
+        # Duplicates written without a day ordinal are dropped by a trigger.
+        conn.execute("INSERT OR IGNORE INTO completion (habit_id, completion_date) VALUES (1, '2024-12-11')")
+        conn.execute("INSERT INTO completion (habit_id, completion_date) VALUES (1, '2024-12-11')")
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM completion").fetchone()[0], 2)
+        self.assertEqual(conn.execute("SELECT completion_day, completion_week FROM completion ORDER BY id").fetchall(),
+                         [(739230, 105604), (739231, 105604)])
+
+    # Test that completions written without a day ordinal get one from the trigger
+    def test_day_ordinal_trigger(self):
+        with get_connection() as conn:
+            conn.execute("INSERT INTO habits (name, description, periodicity, creation_date) "
+                         "VALUES ('Exercise', 'Daily exercise', 'daily', '2024-12-09')")
+            conn.execute("INSERT INTO completion (habit_id, completion_date) VALUES (1, '2024-12-10')")
+            conn.execute("UPDATE completion SET completion_date = '2024-12-12'")
+
+        self.assertEqual(conn.execute("SELECT completion_day FROM completion").fetchone()[0],
+                         date(2024, 12, 12).toordinal())
+
+    # Test that bulk writes drop the insert triggers only inside their transaction, also if it fails
+    def test_bulk_writes_restore_triggers(self):
+        conn = get_connection()
+        with conn:
+            conn.execute("INSERT INTO habits (name, description, periodicity, creation_date) "
+                         "VALUES ('Exercise', 'Daily exercise', 'daily', '2024-12-09')")
+        other = sqlite3.connect(self.path)
+        triggers = "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name IN (?, ?, ?, ?)"
+
+        with self.assertRaises(ValueError):
+            with conn, bulk_writes(conn):
+                conn.execute(INSERT_COMPLETION_SQL, (1, "2024-12-10", date(2024, 12, 10).toordinal()))
+                self.assertEqual(conn.execute(triggers, BULK_SKIPPED_TRIGGERS).fetchone()[0], 0)
+                self.assertEqual(other.execute(triggers, BULK_SKIPPED_TRIGGERS).fetchone()[0], 4)
+                raise ValueError("import failed")
+        other.close()
+
+        self.assertEqual(conn.execute(triggers, BULK_SKIPPED_TRIGGERS).fetchone()[0], 4)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM completion").fetchone()[0], 0)
+
+    # Test that completion lookups by habit use the composite index, which is the only index on completion
+    def test_completion_lookup_uses_index(self):
+        conn = get_connection()
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT completion_day FROM completion WHERE habit_id = ? ORDER BY completion_day",
+            (1,)).fetchall()
+        self.assertIn("COVERING INDEX idx_completion_habit_day", " ".join(row[-1] for row in plan))
+        self.assertEqual([row[1] for row in conn.execute("PRAGMA index_list(completion)")], ["idx_completion_habit_day"])
+
+if __name__ == "__main__":
+    unittest.main()
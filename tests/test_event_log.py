@@ -0,0 +1,102 @@
+import sqlite3
+import time
+import unittest
+from app.database import get_database, initialize_database, reset_database, DB_FILE
+from app.event_log import EventLog
+from app.habit_manager import HabitManager
+from app.streaks import get_streak_summary
+
+class TestEventLog(unittest.TestCase):
+    # Reset the database before each test.
+    def setUp(self):
+        reset_database()
+        initialize_database()
+        self.log = EventLog()
+        self.manager = HabitManager()
+
+    # Returns the id of a habit by its name or None.
+    def habit_id(self, name):
+        row = get_database().connection().execute("SELECT id FROM habits WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    # Test that appended events are only visible after compaction
+    def test_compact(self):
+        self.log.create_habit("Exercise", "Daily exercise", "daily")
+        for day in range(1, 4):
+            self.log.mark_habit_completed("Exercise", f"2024-12-{day:02d}")
+        self.assertIsNone(self.habit_id("Exercise"))
+        self.assertEqual(self.log.pending(), 4)
+
+        self.assertEqual(self.log.compact_all(), {"applied": 4, "failed": 0})
+        habit_id = self.habit_id("Exercise")
+        self.assertEqual(self.manager.get_habit_completions(habit_id), ["2024-12-01", "2024-12-02", "2024-12-03"])
+        self.assertEqual(get_streak_summary(get_database().connection(), habit_id)[2], 3)
+        self.assertEqual(self.log.pending(), 0)
+
+    # Test that events are applied in order, including renames and deletions
+    def test_event_order(self):
+        self.manager.create_habit("Meditate", "Daily meditation", "daily")
+        self.log.create_habit("Read", "Weekly reading", "weekly")
+        self.log.mark_habit_completed("Read", "2024-12-02")
+        self.log.edit_habit("Read", new_name="Reading", new_periodicity="daily")
+        self.log.mark_habit_completed("Reading", "2024-12-03")
+        self.log.unmark_habit_completed("Reading", "2024-12-02")
+        self.log.delete_habit("Meditate")
+        self.log.compact(batch_size=2)
+        self.assertEqual(self.log.pending(), 4)
+        self.log.compact_all(batch_size=2)
+
+        habit_id = self.habit_id("Reading")
+        self.assertIsNone(self.habit_id("Read"))
+        self.assertIsNone(self.habit_id("Meditate"))
+        self.assertEqual(self.manager.get_habit_completions(habit_id), ["2024-12-03"])
+        self.assertEqual(get_streak_summary(get_database().connection(), habit_id)[2], 1)
+
+    # Test that events which cannot be applied are skipped without losing the others
+    def test_failed_events(self):
+        self.log.mark_habit_completed("Unknown", "2024-12-01")
+        self.log.create_habit("Exercise", "Daily exercise", "daily")
+        self.log.create_habit("Exercise", "Daily exercise", "daily")
+        with self.assertRaises(ValueError):
+            self.log.mark_habit_completed("Exercise", "01.12.2024")
+
+        self.assertEqual(self.log.compact_all(), {"applied": 1, "failed": 2})
+        self.assertEqual([(kind, name) for _, kind, name, _ in self.log.failed],
+                         [("complete", "Unknown"), ("create", "Exercise")])
+        self.assertIsNotNone(self.habit_id("Exercise"))
+
+    # Test that deleting a habit cascades to its rows and orphans written without foreign keys are purged
+    def test_cascade_and_purge_orphans(self):
+        habit = self.manager.create_habit("Exercise", "Daily exercise", "daily")
+        self.manager.mark_habit_completed(habit.id, "2024-12-01")
+        self.manager.delete_habit("Exercise")
+        conn = get_database().connection()
+        for table in ("completion", "habit_streaks", "completion_bitmap", "completion_weekly", "completion_monthly"):
+            self.assertEqual(conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0], 0, table)
+
+        # A connection without the pragma does not enforce the foreign keys.
+        raw = sqlite3.connect(DB_FILE)
+        with raw:
+            raw.execute("INSERT INTO completion (habit_id, completion_date, completion_day) VALUES (999, '2024-12-01', 739221)")
+        raw.close()
+        removed = self.log.purge_orphans()
+        self.assertEqual(removed["completion"], 1)
+        self.assertEqual(removed["completion_weekly"], 0)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM completion").fetchone()[0], 0)
+
+    # Test that the background compactor drains the log
+    def test_background_compactor(self):
+        log = EventLog(compact_interval=0.01)
+        try:
+            log.create_habit("Exercise", "Daily exercise", "daily")
+            deadline = time.monotonic() + 5
+            while log.pending() and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(log.pending(), 0)
+            self.assertIsNotNone(self.habit_id("Exercise"))
+        finally:
+            log.stop()
+        self.assertIsNone(log.last_error)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+import sqlite3
+import unittest
+from datetime import date
+from app.database import initialize_database, reset_database
+from database_seeder.generator import generate_dataset
+
+class TestGenerator(unittest.TestCase):
+    # Reset the database before each test.
+    def setUp(self):
+        reset_database()
+        initialize_database()
+
+    # Test that the generator creates the requested habits and a reproducible history
+    def test_generate_dataset(self):
+        counts = generate_dataset(habits=5, years=1, density=0.5, seed=1, end_date=date(2024, 12, 31))
+
+        conn = sqlite3.connect('habits.db')
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM habits")
+        habit_count = cursor.fetchone()[0]
+        cursor.execute("SELECT COUNT(*), MIN(completion_date), MAX(completion_date) FROM completion")
+        completion_count, first_date, last_date = cursor.fetchone()
+        conn.close()
+
+        self.assertEqual(counts["habits"], 5)
+        self.assertEqual(habit_count, 5)
+        self.assertEqual(counts["completions"], completion_count)
+        self.assertGreaterEqual(first_date, "2024-01-01")
+        self.assertLessEqual(last_date, "2024-12-31")
+
+        # The same seed produces the same dataset
+        reset_database()
+        initialize_database()
+        self.assertEqual(generate_dataset(habits=5, years=1, density=0.5, seed=1, end_date=date(2024, 12, 31)), counts)
+
+if __name__ == "__main__":
+    unittest.main()
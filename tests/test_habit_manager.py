@@ -1,7 +1,10 @@
 import unittest
 import sqlite3
+from datetime import date
+from app.habit import Habit, HabitCollection
 from app.habit_manager import HabitManager
 from app.database import initialize_database, reset_database
+from app.streak_engine import HAS_NUMPY
 
 class TestHabitManager(unittest.TestCase):
     @classmethod
@@ -63,6 +66,20 @@ class TestHabitManager(unittest.TestCase):
         habits = self.manager.list_habits()
         self.assertEqual(len(habits), 2)
 
+    # Test that the listed habits are stored column by column and materialized on access
+    def test_list_habits_collection(self):
+        self.manager.create_habit("Exercise", "Daily exercise", "daily")
+        self.manager.create_habit("Read", "Weekly reading", "weekly")
+        habits = self.manager.list_habits()
+
+        self.assertIsInstance(habits, HabitCollection)
+        self.assertEqual(habits.names, ["Exercise", "Read"])
+        self.assertEqual(habits[-1].periodicity, "weekly")
+        self.assertEqual([habit.name for habit in habits[1:]], ["Read"])
+        self.assertEqual([habit.description for habit in habits], ["Daily exercise", "Weekly reading"])
+        with self.assertRaises(AttributeError):
+            habits[0].streak = 1
+
     # Test to create and then mark a habit as completed
     def test_mark_habit_completed(self):
         habit = self.manager.create_habit("Exercise", "Daily exercise", "daily")
@@ -77,6 +94,139 @@ class TestHabitManager(unittest.TestCase):
         self.assertIsNotNone(result)
         self.assertEqual(result[0], "2024-12-10")
 
+    # Test that marking the same completion twice stores it once
+    def test_mark_habit_completed_twice(self):
+        habit = self.manager.create_habit("Exercise", "Daily exercise", "daily")
+        self.manager.mark_habit_completed(habit.id, "2024-12-10")
+        self.manager.mark_habit_completed(habit.id, "2024-12-10")
+
+        self.assertEqual(self.manager.get_habit_completions(habit.id), ["2024-12-10"])
+
+    # Test to import completions in bulk from a generator
+    def test_mark_habits_completed_bulk(self):
+        habit = self.manager.create_habit("Exercise", "Daily exercise", "daily")
+        self.manager.mark_habit_completed(habit.id, "2024-12-10")
+
+        completions = ((habit.id, f"2024-12-{day:02d}") for day in [9, 10, 11, 11, 12])
+        result = self.manager.mark_habits_completed_bulk(completions, chunk_size=2)
+
+        self.assertEqual(result, {"inserted": 3, "skipped": 2})
+        self.assertEqual(self.manager.get_habit_completions(habit.id),
+                         ["2024-12-09", "2024-12-10", "2024-12-11", "2024-12-12"])
+
+    # Test that bulk completions of unknown habits are skipped instead of failing the import
+    def test_mark_habits_completed_bulk_unknown_habit(self):
+        habit = self.manager.create_habit("Exercise", "Daily exercise", "daily")
+        completions = [(habit.id, "2024-12-10"), (habit.id + 1, "2024-12-10"), (habit.id, "2024-12-11")]
+
+        result = self.manager.mark_habits_completed_bulk(completions)
+
+        self.assertEqual(result, {"inserted": 2, "skipped": 1})
+        self.assertEqual(self.manager.get_habit_completions(habit.id + 1), [])
+
+    # Test that completions can be read as day ordinals and invalid dates are rejected
+    def test_completion_days(self):
+        habit = self.manager.create_habit("Exercise", "Daily exercise", "daily")
+        self.manager.mark_habit_completed(habit.id, "2024-12-10")
+        with self.assertRaises(ValueError):
+            self.manager.mark_habit_completed(habit.id, "10.12.2024")
+
+        self.assertEqual(self.manager.get_habit_completions(habit.id, as_days=True), [739230])
+
+    # Test that Habit.mark_completed accepts date objects and day ordinals and updates the streak summary
+    def test_habit_mark_completed_date_types(self):
+        habit = self.manager.create_habit("Exercise", "Daily exercise", "daily")
+        Habit.mark_completed(habit.id, date(2024, 12, 10))
+        Habit.mark_completed(habit.id, 739231)
+
+        self.assertEqual(self.manager.get_habit_completions(habit.id), ["2024-12-10", "2024-12-11"])
+        self.assertEqual(habit.get_longest_streak(), 2)
+
+    # Test range queries of the completions of one and of several habits
+    def test_completion_ranges(self):
+        exercise = self.manager.create_habit("Exercise", "Daily exercise", "daily")
+        read = self.manager.create_habit("Read", "Weekly reading", "weekly")
+        meditate = self.manager.create_habit("Meditate", "Daily meditation", "daily")
+        for day in range(1, 11):
+            self.manager.mark_habit_completed(exercise.id, f"2024-12-{day:02d}")
+        self.manager.mark_habit_completed(read.id, "2024-12-02")
+        self.manager.mark_habit_completed(read.id, "2024-12-09")
+
+        self.assertEqual(self.manager.get_habit_completions(exercise.id, start="2024-12-08"),
+                         ["2024-12-08", "2024-12-09", "2024-12-10"])
+        self.assertEqual(self.manager.get_habit_completions(exercise.id, as_days=True, start=739229, end=739230),
+                         [739229, 739230])
+        self.assertEqual(self.manager.get_completions([read.id, exercise.id, meditate.id], "2024-12-02", "2024-12-03"),
+                         {read.id: ["2024-12-02"], exercise.id: ["2024-12-02", "2024-12-03"], meditate.id: []})
+        self.assertEqual(list(self.manager.iter_completions(end="2024-12-02", as_days=True, batch_size=1)),
+                         [(exercise.id, 739221), (exercise.id, 739222), (read.id, 739222)])
+
+    # Test that completions can be read as NumPy arrays
+    @unittest.skipUnless(HAS_NUMPY, "numpy is not installed")
+    def test_completion_arrays(self):
+        exercise = self.manager.create_habit("Exercise", "Daily exercise", "daily")
+        read = self.manager.create_habit("Read", "Weekly reading", "weekly")
+        for day in range(1, 4):
+            self.manager.mark_habit_completed(exercise.id, f"2024-12-{day:02d}")
+
+        self.assertEqual(self.manager.get_habit_completions(exercise.id, start="2024-12-02", as_array=True).tolist(),
+                         [739222, 739223])
+        arrays = self.manager.get_completions([exercise.id, read.id], as_array=True)
+        self.assertEqual({habit_id: days.tolist() for habit_id, days in arrays.items()},
+                         {exercise.id: [739221, 739222, 739223], read.id: []})
+
+    # Test the completed and pending buckets for daily and weekly habits
+    def test_check_habits_status(self):
+        exercise = self.manager.create_habit("Exercise", "Daily exercise", "daily")
+        read = self.manager.create_habit("Read", "Weekly reading", "weekly")
+        self.manager.create_habit("Walk", "Daily walk", "daily")
+        self.manager.mark_habit_completed(exercise.id, "2024-12-10")
+        self.manager.mark_habit_completed(exercise.id, "2024-12-12")
+        self.manager.mark_habit_completed(read.id, "2024-12-09")
+
+        completed, pending = self.manager.check_habits_status("2024-12-10")
+
+        self.assertEqual(completed, [("Exercise", "daily", "2024-12-12"), ("Read", "weekly", "2024-12-09")])
+        self.assertEqual(pending, [("Walk", "daily", "Never")])
+        self.assertEqual([row[1] for row in self.manager.get_pending_habits("2024-12-16")], ["Exercise", "Read", "Walk"])
+
+    # Test paging through pending habits by name
+    def test_get_pending_habits_paginated(self):
+        for name in ["Exercise", "Read", "Walk"]:
+            self.manager.create_habit(name, "", "daily")
+
+        first_page = self.manager.get_pending_habits("2024-12-10", limit=2)
+        second_page = self.manager.get_pending_habits("2024-12-10", limit=2, after_name=first_page[-1][1])
+
+        self.assertEqual([row[1] for row in first_page], ["Exercise", "Read"])
+        self.assertEqual([row[1] for row in second_page], ["Walk"])
+
+    # Test streaming habits page by page by id and by name
+    def test_iter_habits_paginated(self):
+        for name, periodicity in [("Walk", "daily"), ("Exercise", "daily"), ("Read", "weekly")]:
+            self.manager.create_habit(name, "", periodicity)
+
+        first_page = list(self.manager.iter_habits(limit=2, batch_size=1))
+        second_page = list(self.manager.iter_habits(limit=2, after=first_page[-1].id))
+        by_name = list(self.manager.iter_habits(periodicity="daily", order_by="name"))
+
+        self.assertEqual([habit.name for habit in first_page + second_page], ["Walk", "Exercise", "Read"])
+        self.assertEqual([habit.name for habit in by_name], ["Exercise", "Walk"])
+        with self.assertRaises(ValueError):
+            list(self.manager.iter_habits(order_by="description"))
+
+    # Test streaming habits with details page by page by name
+    def test_iter_habits_with_details(self):
+        exercise = self.manager.create_habit("Exercise", "Daily exercise", "daily")
+        self.manager.create_habit("Read", "Weekly reading", "weekly")
+        self.manager.mark_habit_completed(exercise.id, "2024-12-10")
+
+        first_page = list(self.manager.iter_habits_with_details(limit=1))
+        second_page = list(self.manager.iter_habits_with_details(after_name=first_page[-1][1]))
+
+        self.assertEqual(first_page, [(exercise.id, "Exercise", "Daily exercise", "daily", "2024-12-10")])
+        self.assertEqual([row[1:] for row in second_page], [("Read", "Weekly reading", "weekly", "Never")])
+
 if __name__ == "__main__":
     unittest.main()
     
\ No newline at end of file
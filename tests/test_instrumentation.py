@@ -0,0 +1,77 @@
+import unittest
+from app import analytics, instrumentation
+from app.database import get_database, initialize_database, reset_database
+from app.habit_manager import HabitManager
+from app.instrumentation import Histogram
+
+class TestInstrumentation(unittest.TestCase):
+    # Reset the database and enable the instrumentation before each test.
+    def setUp(self):
+        reset_database()
+        initialize_database()
+        self.create_habit = HabitManager.create_habit
+        instrumentation.enable()
+        instrumentation.reset()
+
+    # Disable the instrumentation after each test.
+    def tearDown(self):
+        instrumentation.disable()
+
+    # Test that method calls and SQL statements are recorded
+    def test_records_calls_and_statements(self):
+        manager = HabitManager()
+        habit = manager.create_habit("Exercise", "Daily exercise", "daily")
+        manager.mark_habit_completed(habit.id, "2024-12-10")
+        list(manager.iter_habits())
+        analytics.longest_streak()
+
+        stats = instrumentation.get_stats()
+        timings = stats["timings"]
+        self.assertEqual(timings["HabitManager.create_habit"]["count"], 1)
+        self.assertEqual(timings["HabitManager.iter_habits"]["count"], 1)
+        self.assertEqual(timings["analytics.streak_leaderboard"]["count"], 1)
+        self.assertTrue(any(name.startswith("sql: INSERT INTO completion") for name in timings))
+        self.assertGreaterEqual(stats["statements"]["sql: COMMIT"], 2)
+
+    # Test that statements run with Connection.execute are timed as well
+    def test_connection_execute(self):
+        get_database().connection().execute("SELECT COUNT(*) FROM habits").fetchone()
+
+        self.assertEqual(instrumentation.get_stats()["timings"]["sql: SELECT COUNT(*) FROM habits"]["count"], 1)
+
+    # Test that statements are counted once per execution under their SQL without the parameter values
+    def test_statement_counts(self):
+        manager = HabitManager()
+        habit = manager.create_habit("Exercise", "Daily exercise", "daily")
+        instrumentation.reset()
+        for day in range(1, 4):
+            manager.mark_habit_completed(habit.id, f"2024-12-{day:02d}")
+        manager.mark_habits_completed_bulk((habit.id, f"2024-11-{day:02d}") for day in range(1, 6))
+
+        statements = instrumentation.get_stats()["statements"]
+        inserts = {key: count for key, count in statements.items() if key.startswith("sql: INSERT INTO completion ")}
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(list(inserts.values()), [8])
+        self.assertFalse(any("2024-12-0" in key for key in statements))
+
+    # Test that disabling restores the original methods and connections
+    def test_disable(self):
+        instrumentation.disable()
+
+        self.assertIs(HabitManager.create_habit, self.create_habit)
+        self.assertIs(type(get_database().connection()), __import__("sqlite3").Connection)
+
+    # Test the histogram statistics
+    def test_histogram(self):
+        histogram = Histogram()
+        for milliseconds in (0.2, 0.3, 4, 40):
+            histogram.record(milliseconds / 1000)
+
+        stats = histogram.to_dict()
+        self.assertEqual(stats["count"], 4)
+        self.assertAlmostEqual(stats["max_ms"], 40)
+        self.assertEqual(stats["p50_ms"], 0.5)
+        self.assertEqual(stats["p99_ms"], 40)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import contextlib
+import io
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+from app.database import (configure_database, get_connection, get_database, get_schema_version, initialize_database,
+                          reset_database, DB_FILE, SCHEMA_VERSION)
+from main import main
+
+class TestMain(unittest.TestCase):
+    # Reset the database before each test.
+    def setUp(self):
+        reset_database()
+        initialize_database()
+
+    # Runs the command line and returns the exit code and the printed output.
+    def run_main(self, *argv):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+            exit_code = main(list(argv))
+        return exit_code, output.getvalue()
+
+    # Test the subcommands with JSON output
+    def test_commands_json(self):
+        self.assertEqual(self.run_main("add", "Read", "--periodicity", "weekly")[0], 0)
+
+        exit_code, output = self.run_main("--json", "done", "Read", "--date", "2024-12-10")
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(json.loads(output), {"name": "Read", "date": "2024-12-10", "inserted": True})
+
+        status = json.loads(self.run_main("--json", "status", "--date", "2024-12-15")[1])
+        self.assertEqual([habit["name"] for habit in status["completed"]], ["Read"])
+        self.assertEqual([habit["name"] for habit in json.loads(self.run_main("--json", "list")[1])], ["Read"])
+        self.assertEqual(json.loads(self.run_main("--json", "streaks")[1])["weekly"][0]["longest"], 1)
+        history = json.loads(self.run_main("--json", "history", "Read", "--start", "2024-12-01")[1])
+        self.assertEqual(history["completions"], ["2024-12-10"])
+
+    # Test that errors are reported with exit code 1
+    def test_unknown_habit(self):
+        exit_code, output = self.run_main("done", "Unknown")
+
+        self.assertEqual(exit_code, 1)
+        self.assertIn("No habit found with name 'Unknown'", output)
+
+    # Test that the benchmarks run on a temporary database and leave the database of --db configured and untouched
+    @mock.patch("benchmarks.run_benchmarks.MIN_ITERATIONS", 1)
+    @mock.patch("benchmarks.run_benchmarks.MIN_SECONDS", 0)
+    def test_bench_keeps_database(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.addCleanup(configure_database, DB_FILE)
+        path = os.path.join(tmp.name, "mine.db")
+
+        exit_code, output = self.run_main("--db", path, "bench", "--sizes", "100")
+
+        self.assertEqual(exit_code, 0)
+        self.assertIn("generate_dataset", output)
+        self.assertEqual(get_database().path, path)
+        conn = sqlite3.connect(path)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM habits").fetchone()[0], 0)
+        conn.close()
+
+    # Test that an up to date database is not initialized again
+    def test_schema_current(self):
+        conn = get_connection()
+        conn.execute("DROP TABLE completion_monthly")
+        initialize_database()
+
+        self.assertEqual(get_schema_version(conn), SCHEMA_VERSION)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'completion_monthly'").fetchone()[0], 0)
+
+if __name__ == "__main__":
+    unittest.main()
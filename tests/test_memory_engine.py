@@ -0,0 +1,123 @@
+import os
+import tempfile
+import time
+import unittest
+from app.database import Database
+from app.habit_manager import HabitManager
+from app.memory_engine import MemoryDatabase
+from app.streaks import get_streak_summary
+
+class TestMemoryEngine(unittest.TestCase):
+    # Create a temporary database file before each test.
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "habits.db")
+        self.engines = []
+
+    # Stop the engines and remove the temporary directory after each test.
+    def tearDown(self):
+        for engine in self.engines:
+            engine.stop()
+        self.tmp.cleanup()
+
+    # Starts an engine without background thread, so the test decides when it flushes.
+    def start(self, **options):
+        engine = MemoryDatabase(self.path, flush_interval=None, **options)
+        self.engines.append(engine)
+        return engine
+
+    # Simulates a crash of an engine.
+    def crash(self, engine):
+        self.engines.remove(engine)
+        engine._abandon()
+
+    # Returns the habits, completions, streak summaries and weekly rollups of a database.
+    def contents(self, database):
+        conn = database.connection()
+        return (
+            conn.execute("SELECT * FROM habits ORDER BY id").fetchall(),
+            conn.execute("SELECT id, habit_id, completion_date, completion_day FROM completion ORDER BY id").fetchall(),
+            [get_streak_summary(conn, habit_id) for habit_id, in conn.execute("SELECT id FROM habits")],
+            conn.execute("SELECT * FROM completion_weekly ORDER BY habit_id, week").fetchall(),
+        )
+
+    # Fills a database with a few habits, completions and changes.
+    def write_history(self, engine):
+        manager = HabitManager(engine)
+        exercise = manager.create_habit("Exercise", "Daily exercise", "daily")
+        read = manager.create_habit("Read", "Weekly reading", "weekly")
+        for day in range(1, 11):
+            manager.mark_habit_completed(exercise.id, f"2024-12-{day:02d}")
+        manager.mark_habit_completed(read.id, "2024-12-02")
+        manager.unmark_habit_completed(exercise.id, "2024-12-05")
+        manager.edit_habit("Read", new_name="Reading", new_description="Read a book")
+
+    # Test that writes stay in memory until they are flushed or written as a snapshot
+    def test_writes_are_persisted_behind(self):
+        engine = self.start()
+        self.write_history(engine)
+        expected = self.contents(engine)
+
+        file_database = Database(self.path)
+        self.assertEqual(self.contents(file_database)[0], [])
+        file_database.close()
+        engine.stop()
+        self.engines.remove(engine)
+
+        # The snapshot replaces the file, so it is opened again.
+        file_database = Database(self.path)
+        self.assertEqual(self.contents(file_database), expected)
+        self.assertFalse(os.path.exists(engine.journal_path))
+        file_database.close()
+
+    # Test that the journal is replayed on the last snapshot after a crash
+    def test_crash_recovery(self):
+        engine = self.start()
+        HabitManager(engine).create_habit("Meditate", "Daily meditation", "daily")
+        engine.snapshot()
+        self.write_history(engine)
+        expected = self.contents(engine)
+        engine.flush()
+        self.crash(engine)
+
+        recovered = self.start()
+        self.assertEqual(self.contents(recovered), expected)
+        self.assertGreater(recovered.replayed, 0)
+        self.assertEqual(os.path.getsize(recovered.journal_path), 0)
+
+        # The recovered engine keeps journaling on top of the recovered state.
+        HabitManager(recovered).delete_habit("Meditate")
+        expected = self.contents(recovered)
+        recovered.flush()
+        self.crash(recovered)
+        self.assertEqual(self.contents(self.start()), expected)
+
+    # Test that changes after the last flush are lost and a torn last journal line is ignored
+    def test_unflushed_changes_and_torn_journal(self):
+        engine = self.start()
+        manager = HabitManager(engine)
+        habit = manager.create_habit("Exercise", "Daily exercise", "daily")
+        manager.mark_habit_completed(habit.id, "2024-12-01")
+        engine.flush()
+        expected = self.contents(engine)
+        manager.mark_habit_completed(habit.id, "2024-12-02")
+        self.crash(engine)
+        with open(engine.journal_path, "a") as file:
+            file.write('[999, "completion", "I", {"id": 7, "habit_')
+
+        self.assertEqual(self.contents(self.start()), expected)
+
+    # Test that the background thread flushes the journal
+    def test_background_flush(self):
+        engine = MemoryDatabase(self.path, flush_interval=0.01)
+        self.engines.append(engine)
+        HabitManager(engine).create_habit("Exercise", "Daily exercise", "daily")
+
+        deadline = time.monotonic() + 5
+        while os.path.getsize(engine.journal_path) == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertGreater(os.path.getsize(engine.journal_path), 0)
+        self.assertIsNone(engine.last_error)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import random
+import unittest
+from datetime import date, timedelta
+from app.habit import Habit
+from app.streak_engine import HAS_NUMPY, summarize_batch, summarize_dates
+
+# Returns a random completion history with gaps, duplicates and unsorted dates.
+def random_dates(rng, count, start=date(2015, 1, 1)):
+    return [(start + timedelta(days=rng.randint(0, count * 2))).isoformat() for _ in range(count)]
+
+class TestStreakEngine(unittest.TestCase):
+    # Test the pure Python engine on a known history
+    def test_python_engine(self):
+        dates = ["2024-12-11", "2024-12-09", "2024-12-10", "2024-12-20", "2024-12-21"]
+        longest, current_start, current_end = summarize_dates(dates, "daily", engine="python")
+
+        self.assertEqual(longest, 3)
+        self.assertEqual(current_end - current_start + 1, 2)
+        self.assertEqual(current_end, date(2024, 12, 21).toordinal())
+
+    # Test weekly streaks across a year boundary
+    def test_weekly_across_year(self):
+        dates = ["2024-12-23", "2024-12-31", "2025-01-02", "2025-01-06"]
+        self.assertEqual(summarize_dates(dates, "weekly", engine="python")[0], 3)
+
+    # Test the calculate_streak API of Habit
+    def test_calculate_streak(self):
+        self.assertEqual(Habit.calculate_streak([]), 0)
+        self.assertEqual(Habit.calculate_streak(["2024-12-10", "2024-12-11", "2024-12-13"]), 2)
+
+    # Test that an unknown engine is rejected
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            summarize_dates(["2024-12-10"], engine="fortran")
+
+    # Test that both engines return the same results for a single habit
+    @unittest.skipUnless(HAS_NUMPY, "numpy is not installed")
+    def test_parity_single_habit(self):
+        rng = random.Random(42)
+        for periodicity in ("daily", "weekly"):
+            for count in (1, 2, 50, 3000):
+                dates = random_dates(rng, count)
+                self.assertEqual(summarize_dates(dates, periodicity, engine="numpy"),
+                                 summarize_dates(dates, periodicity, engine="python"))
+
+    # Test that both engines return the same results for a batch of habits
+    @unittest.skipUnless(HAS_NUMPY, "numpy is not installed")
+    def test_parity_batch(self):
+        rng = random.Random(7)
+        rows = []
+        for habit_id in range(1, 40):
+            periodicity = rng.choice(["daily", "weekly"])
+            rows.extend((habit_id, periodicity, completion_date)
+                        for completion_date in random_dates(rng, rng.randint(1, 400)))
+        rng.shuffle(rows)
+
+        self.assertEqual(summarize_batch(rows, engine="numpy"), summarize_batch(rows, engine="python"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import unittest
+from datetime import date, timedelta
+from app.database import get_connection, initialize_database, reset_database
+from app.habit_manager import HabitManager
+from app.streaks import (current_streak_from_summary, current_streaks, get_streak_summary, period_of,
+                         rebuild_streaks, scan_current_streak)
+
+class TestStreaks(unittest.TestCase):
+    # Reset the database before each test.
+    def setUp(self):
+        reset_database()
+        initialize_database()
+        self.manager = HabitManager()
+
+    # Returns the stored summary row of a habit.
+    def summary(self, habit_id):
+        return get_streak_summary(get_connection(), habit_id)
+
+    # Test that weeks start on Monday
+    def test_period_of_weekly(self):
+        self.assertEqual(period_of("2024-12-09", "weekly"), period_of("2024-12-15", "weekly"))
+        self.assertEqual(period_of("2024-12-16", "weekly"), period_of("2024-12-15", "weekly") + 1)
+
+    # Test that the summary follows completions added in and out of order
+    def test_incremental_daily(self):
+        habit = self.manager.create_habit("Exercise", "Daily exercise", "daily")
+        for day in ["2024-12-01", "2024-12-02", "2024-12-05", "2024-12-06", "2024-12-04", "2024-12-03"]:
+            self.manager.mark_habit_completed(habit.id, day)
+
+        current_start, current_end, longest, last_completion = self.summary(habit.id)
+        self.assertEqual(longest, 6)
+        self.assertEqual(current_end - current_start + 1, 6)
+        self.assertEqual(last_completion, "2024-12-06")
+
+    # Test that two completions in the same week count as one period
+    def test_incremental_weekly(self):
+        habit = self.manager.create_habit("Read", "Weekly reading", "weekly")
+        for day in ["2024-12-09", "2024-12-12", "2024-12-16", "2024-12-30"]:
+            self.manager.mark_habit_completed(habit.id, day)
+
+        self.assertEqual(habit.get_longest_streak(), 2)
+        self.assertEqual(self.summary(habit.id)[0], period_of("2024-12-30", "weekly"))
+
+    # Test that removing a completion splits the run
+    def test_unmark_completion(self):
+        habit = self.manager.create_habit("Exercise", "Daily exercise", "daily")
+        for day in ["2024-12-01", "2024-12-02", "2024-12-03"]:
+            self.manager.mark_habit_completed(habit.id, day)
+        self.manager.unmark_habit_completed(habit.id, "2024-12-02")
+
+        self.assertEqual(habit.get_longest_streak(), 1)
+
+    # Test the current streak of a run that ends today
+    def test_current_streak(self):
+        habit = self.manager.create_habit("Exercise", "Daily exercise", "daily")
+        today = date.today()
+        self.manager.mark_habits_completed_bulk((habit.id, today - timedelta(days=days)) for days in [0, 1, 2, 5])
+
+        self.assertEqual(habit.get_current_streak(), 3)
+        self.assertEqual(habit.get_longest_streak(), 3)
+
+    # Test the backward scan and the batch query of the current streak for daily and weekly habits
+    def test_scan_current_streak(self):
+        today = date(2024, 12, 18)
+        exercise = self.manager.create_habit("Exercise", "Daily exercise", "daily")
+        read = self.manager.create_habit("Read", "Weekly reading", "weekly")
+        expired = self.manager.create_habit("Meditate", "Daily meditation", "daily")
+        empty = self.manager.create_habit("Swim", "Weekly swimming", "weekly")
+        self.manager.mark_habits_completed_bulk(
+            [(exercise.id, today - timedelta(days=days)) for days in [1, 2, 3, 5, 6]]
+            + [(read.id, day) for day in ["2024-11-25", "2024-12-02", "2024-12-04", "2024-12-10", "2024-11-11"]]
+            + [(expired.id, today - timedelta(days=days)) for days in [2, 3]])
+
+        conn = get_connection()
+        expected = {exercise.id: 3, read.id: 3, expired.id: 0, empty.id: 0}
+        for habit in (exercise, read, expired, empty):
+            self.assertEqual(scan_current_streak(conn, habit.id, habit.periodicity, today), expected[habit.id])
+            self.assertEqual(current_streak_from_summary(self.summary(habit.id), habit.periodicity, today),
+                             expected[habit.id])
+        self.assertEqual(current_streaks(conn, today), expected)
+        self.assertEqual(current_streaks(conn, today, habit_ids=[read.id]), {read.id: 3})
+
+    # Test that the current streak is scanned from the completions without writing when the summary row is missing
+    def test_current_streak_without_summary(self):
+        habit = self.manager.create_habit("Exercise", "Daily exercise", "daily")
+        today = date.today()
+        self.manager.mark_habits_completed_bulk((habit.id, today - timedelta(days=days)) for days in [1, 2, 4])
+        conn = get_connection()
+        with conn:
+            conn.execute("DELETE FROM habit_streaks WHERE habit_id = ?", (habit.id,))
+        changes = conn.total_changes
+
+        self.assertEqual(habit.get_current_streak(), 2)
+        self.assertEqual(conn.total_changes, changes)
+        self.assertIsNone(conn.execute("SELECT 1 FROM habit_streaks WHERE habit_id = ?", (habit.id,)).fetchone())
+
+    # Test that a rebuild repairs completions written outside of HabitManager
+    def test_rebuild_streaks(self):
+        habit = self.manager.create_habit("Exercise", "Daily exercise", "daily")
+        self.manager.mark_habit_completed(habit.id, "2024-12-01")
+        with get_connection() as conn:
+            conn.execute("INSERT INTO completion (habit_id, completion_date) VALUES (?, '2024-12-02')", (habit.id,))
+
+        self.assertEqual(habit.get_longest_streak(), 1)
+        self.assertEqual(rebuild_streaks(), 1)
+        self.assertEqual(habit.get_longest_streak(), 2)
+
+if __name__ == "__main__":
+    unittest.main()
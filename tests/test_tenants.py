@@ -0,0 +1,110 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import date, timedelta
+from app.analytics import global_longest_streak
+from app.habit_manager import HabitManager
+from app.tenants import ShardMap
+
+class TestTenants(unittest.TestCase):
+    # Create a shard map in a temporary directory before each test.
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.shards = ShardMap(self.tmp.name, max_open=2)
+
+    # Close the tenant databases after each test.
+    def tearDown(self):
+        self.shards.close()
+        self.tmp.cleanup()
+
+    # Test that every tenant has its own database file
+    def test_tenants_isolated(self):
+        alice = HabitManager(tenant="alice", shard_map=self.shards)
+        bob = HabitManager(tenant="bob", shard_map=self.shards)
+        alice.create_habit("Exercise", "Daily exercise", "daily")
+        bob.create_habit("Exercise", "Daily exercise", "daily")
+        bob.create_habit("Read", "Weekly reading", "weekly")
+
+        self.assertEqual(len(alice.list_habits()), 1)
+        self.assertEqual(len(bob.list_habits()), 2)
+        self.assertEqual(self.shards.tenants(), ["alice", "bob"])
+        self.assertTrue(os.path.exists(os.path.join(self.tmp.name, "alice.db")))
+
+    # Test that only max_open tenant databases stay open and evicted tenants still work
+    def test_lru_of_open_shards(self):
+        managers = [HabitManager(tenant=f"tenant-{number}", shard_map=self.shards) for number in range(3)]
+        for manager in managers:
+            manager.create_habit("Exercise", "Daily exercise", "daily")
+
+        self.assertEqual(self.shards.open_count(), 2)
+        self.assertEqual(managers[0].get_habit_id_by_name("Exercise"), 1)
+
+    # Test that a pool in use by a call is not closed when it is evicted, only after the call is done
+    def test_lru_keeps_leased_shards(self):
+        shards = ShardMap(self.tmp.name, max_open=1)
+        alice = HabitManager(tenant="alice", shard_map=shards)
+        for name in ("Exercise", "Read", "Walk"):
+            alice.create_habit(name, "", "daily")
+
+        habits = alice.iter_habits(batch_size=1)
+        first = next(habits)
+        # Alice's pool is leased by the running iteration, so bob's idle pool is closed instead.
+        HabitManager(tenant="bob", shard_map=shards).create_habit("Exercise", "", "daily")
+        self.assertEqual(shards.open_count(), 1)
+
+        self.assertEqual([habit.name for habit in [first, *habits]], ["Exercise", "Read", "Walk"])
+        self.assertEqual(len(HabitManager(tenant="bob", shard_map=shards).list_habits()), 1)
+        self.assertEqual(shards.open_count(), 1)
+        shards.close()
+
+    # Test that habits of a tenant read their streaks from the tenant database
+    def test_tenant_habit_streaks(self):
+        manager = HabitManager(tenant="alice", shard_map=self.shards)
+        manager.create_habit("Exercise", "Daily exercise", "daily")
+        today = date.today()
+        habit_id = manager.get_habit_id_by_name("Exercise")
+        for days in range(3):
+            manager.mark_habit_completed(habit_id, (today - timedelta(days=days)).isoformat())
+
+        for habit in (manager.get_habit(habit_id), manager.list_habits()[0], next(manager.iter_habits())):
+            self.assertEqual(habit.get_current_streak(), 3)
+            self.assertEqual(habit.get_longest_streak(), 3)
+
+    # Test that tenant ids that are not safe file names are rejected
+    def test_invalid_tenant(self):
+        with self.assertRaises(ValueError):
+            HabitManager(tenant="../alice", shard_map=self.shards).list_habits()
+
+    # Test the longest streak over all tenants
+    def test_global_longest_streak(self):
+        for tenant_id, days in [("alice", 2), ("bob", 3)]:
+            manager = HabitManager(tenant=tenant_id, shard_map=self.shards)
+            habit = manager.create_habit(f"Exercise {tenant_id}", "Daily exercise", "daily")
+            for day in range(days):
+                manager.mark_habit_completed(habit.id, f"2024-12-{10 + day}")
+
+        streaks = global_longest_streak(self.shards)
+
+        self.assertEqual(streaks["daily"], {"tenant": "bob", "name": "Exercise bob", "streak": 3})
+        self.assertEqual(streaks["weekly"]["streak"], 0)
+
+    # Test that shards on an old schema are migrated before the analytics run on them
+    def test_global_longest_streak_old_schema(self):
+        conn = sqlite3.connect(os.path.join(self.tmp.name, "carol.db"))
+        conn.execute("CREATE TABLE habits (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL UNIQUE, "
+                     "description TEXT, periodicity TEXT NOT NULL, creation_date TEXT NOT NULL)")
+        conn.execute("CREATE TABLE completion (id INTEGER PRIMARY KEY AUTOINCREMENT, habit_id INTEGER NOT NULL, "
+                     "completion_date TEXT NOT NULL)")
+        conn.execute("INSERT INTO habits VALUES (1, 'Exercise', 'Daily exercise', 'daily', '2024-12-09')")
+        conn.executemany("INSERT INTO completion (habit_id, completion_date) VALUES (1, ?)",
+                         [("2024-12-10",), ("2024-12-11",)])
+        conn.commit()
+        conn.close()
+
+        streaks = global_longest_streak(self.shards)
+
+        self.assertEqual(streaks["daily"], {"tenant": "carol", "name": "Exercise", "streak": 2})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+from app.database import Database, initialize_database, INSERT_COMPLETION_SQL
+from app.habit_manager import HabitManager
+from app.streaks import get_streak_summary
+from app.transfer import export_data, import_data
+
+class TestTransfer(unittest.TestCase):
+    # Create a source database with habits and completions in a temporary directory before each test.
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.source = self.create_database("source.db")
+        manager = HabitManager(self.source)
+        exercise = manager.create_habit("Exercise", "Daily exercise, 30 minutes", "daily")
+        read = manager.create_habit("Read", "Weekly \"reading\"", "weekly")
+        manager.create_habit("Walk", "", "daily")
+        manager.mark_habits_completed_bulk([(exercise.id, "2024-12-10"), (exercise.id, "2024-12-11"),
+                                            (exercise.id, "2025-03-01"), (read.id, "2024-12-09")])
+
+    def tearDown(self):
+        self.source.close()
+        self.tmp.cleanup()
+
+    def create_database(self, name):
+        database = Database(os.path.join(self.tmp.name, name))
+        initialize_database(database)
+        return database
+
+    # Returns the habits and completions of a database by habit name.
+    def snapshot(self, database):
+        conn = database.connection()
+        habits = conn.execute("SELECT name, description, periodicity, creation_date FROM habits ORDER BY name").fetchall()
+        completions = conn.execute('''
+            SELECT h.name, c.completion_date, c.completion_day FROM completion c JOIN habits h ON h.id = c.habit_id
+            ORDER BY 1, 2
+        ''').fetchall()
+        return habits, completions
+
+    # Test that every format restores the same habits and completions
+    def test_round_trip(self):
+        for fmt in ("csv", "jsonl", "hbt"):
+            with self.subTest(fmt=fmt):
+                path = os.path.join(self.tmp.name, f"export.{fmt}")
+                self.assertEqual(export_data(path, database=self.source), {"habits": 3, "completions": 4})
+
+                target = self.create_database(f"target-{fmt}.db")
+                result = import_data(path, database=target)
+
+                self.assertEqual(result, {"habits": 3, "inserted": 4, "skipped": 0})
+                self.assertEqual(self.snapshot(target), self.snapshot(self.source))
+                exercise = HabitManager(target).get_habit_by_name("Exercise")
+                self.assertEqual(get_streak_summary(target.connection(), exercise.id)[2], 2)
+                target.close()
+
+    # Test that importing into a database with the same habits only adds missing completions
+    def test_import_merges(self):
+        path = os.path.join(self.tmp.name, "export.hbt")
+        export_data(path, database=self.source)
+
+        self.assertEqual(import_data(path, database=self.source), {"habits": 3, "inserted": 0, "skipped": 4})
+
+    # Test that an import interrupted by a lock error is rolled back and read again from the start
+    def test_import_retried(self):
+        path = os.path.join(self.tmp.name, "export.jsonl")
+        export_data(path, database=self.source)
+        insert_chunk = HabitManager._insert_completion_chunk
+        failures = []
+
+        # Fails the first chunk with a lock error after its inserts, so the whole import is rolled back and retried.
+        def locked_once(manager, conn, chunk, new_habit_ids):
+            if not failures:
+                failures.append(chunk)
+                conn.executemany(INSERT_COMPLETION_SQL, chunk)
+                raise sqlite3.OperationalError("database is locked")
+            return insert_chunk(manager, conn, chunk, new_habit_ids)
+
+        target = self.create_database("target.db")
+        with mock.patch.object(HabitManager, "_insert_completion_chunk", locked_once):
+            result = import_data(path, database=target, chunk_size=1)
+
+        self.assertEqual(len(failures), 1)
+        self.assertEqual(result, {"habits": 3, "inserted": 4, "skipped": 0})
+        self.assertEqual(self.snapshot(target), self.snapshot(self.source))
+        target.close()
+
+    # Test that an unknown periodicity stops the import without writing any habit or completion,
+    # also of the habits and chunks before it
+    def test_import_invalid_periodicity(self):
+        path = os.path.join(self.tmp.name, "export.jsonl")
+        export_data(path, database=self.source)
+        with open(path, encoding="utf-8") as file:
+            content = file.read()
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(content.replace('"weekly"', '"monthly"'))
+
+        target = self.create_database("target.db")
+        with self.assertRaisesRegex(ValueError, "unknown periodicity 'monthly'"):
+            import_data(path, database=target, chunk_size=1)
+        self.assertEqual(self.snapshot(target), ([], []))
+        target.close()
+
+    # Test that the binary format is smaller than CSV
+    def test_binary_smaller_than_csv(self):
+        export_data(os.path.join(self.tmp.name, "export.csv"), database=self.source)
+        export_data(os.path.join(self.tmp.name, "export.hbt"), database=self.source)
+
+        self.assertLess(os.path.getsize(os.path.join(self.tmp.name, "export.hbt")),
+                        os.path.getsize(os.path.join(self.tmp.name, "export.csv")) / 2)
+
+if __name__ == "__main__":
+    unittest.main()